@@ -1,7 +1,13 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from utils import load_css, styled_container, styled_title, styled_subheader
+from filters import load_filter_index, sidebar_filters
+from kpis import customers_help, get_kpis
+from aggregates import aggregate_cache, get_aggregates, get_histogram
+from figures import cached_figure, figure_cache
+from sections import ALL_FILTERS, section
+from zonemaps import scan_stats
+from data import column_memory
 
 st.set_page_config(
     page_title="Dashboard - Tendances d'Achat",
@@ -12,13 +18,8 @@ st.set_page_config(
 # Chargement du CSS
 load_css()
 
-# Chargement des données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('shopping_trends.csv')
-    return df
-
-df = load_data()
+# Index des filtres (chaque section charge ses propres données)
+filter_index = load_filter_index()
 
 # Titre principal
 styled_title("📊 Tableau de Bord - Vue d'Ensemble")
@@ -31,205 +32,325 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    selected_category = st.multiselect(
-        "Catégorie de Produits",
-        options=df['Category'].unique(),
-        default=df['Category'].unique()
-    )
-
-    selected_season = st.multiselect(
-        "Saison",
-        options=df['Season'].unique(),
-        default=df['Season'].unique()
-    )
-
-# Filtrage des données
-df_filtered = df[
-    (df['Category'].isin(selected_category)) &
-    (df['Season'].isin(selected_season))
-]
+    selections = sidebar_filters(filter_index)
 
 # Avertissement si aucune donnée n'est sélectionnée
-if df_filtered.empty:
+if filter_index.count(selections) == 0:
     st.warning("⚠️ Aucune donnée disponible pour les filtres sélectionnés. Veuillez modifier vos critères de sélection.")
 
+# Les sections organisent la page et mesurent leur durée de rendu : chaque
+# changement de filtre les réexécute toutes, et chacune lit ses agrégats et
+# figures dans les caches sous les filtres qu'elle déclare (filters)
+
 # KPIs principaux
-styled_subheader("🎯 Indicateurs Clés")
-with styled_container():
-    col1, col2, col3, col4, col5 = st.columns(5)
+@section("Indicateurs Clés", ALL_FILTERS)
+def kpi_section(selections):
+    kpis = get_kpis(selections)
 
-    with col1:
-        total_customers = len(df_filtered['Customer ID'].unique())
-        st.metric("👥 Clients Total", f"{total_customers:,}")
+    styled_subheader("🎯 Indicateurs Clés")
+    with styled_container():
+        col1, col2, col3, col4, col5 = st.columns(5)
+
+        with col1:
+            total_customers = kpis.customers
+            st.metric("👥 Clients Total", f"{total_customers:,}", help=customers_help(kpis))
         
-    with col2:
-        avg_purchase = df_filtered['Purchase Amount (USD)'].mean()
-        st.metric("💰 Panier Moyen", f"${avg_purchase:.2f}")
+        with col2:
+            avg_purchase = kpis.avg_basket
+            st.metric("💰 Panier Moyen", f"${avg_purchase:.2f}")
         
-    with col3:
-        total_purchases = len(df_filtered)
-        st.metric("🛍️ Total Achats", f"{total_purchases:,}")
+        with col3:
+            total_purchases = kpis.purchases
+            st.metric("🛍️ Total Achats", f"{total_purchases:,}")
         
-    with col4:
-        avg_rating = df_filtered['Review Rating'].mean()
-        st.metric("⭐ Note Moyenne", f"{avg_rating:.1f}/5")
+        with col4:
+            avg_rating = kpis.avg_rating
+            st.metric("⭐ Note Moyenne", f"{avg_rating:.1f}/5")
         
-    with col5:
-        subscription_rate = (df_filtered['Subscription Status'] == 'Yes').mean() * 100
-        st.metric("🔄 Taux d'Abonnement", f"{subscription_rate:.1f}%")
+        with col5:
+            subscription_rate = kpis.subscription_rate
+            st.metric("🔄 Taux d'Abonnement", f"{subscription_rate:.1f}%")
+
+
+kpi_section(selections)
 
 # Analyse démographique
-styled_subheader("👥 Analyse Démographique")
-with styled_container():
-    col1, col2 = st.columns(2)
+@section("Analyse Démographique", ALL_FILTERS)
+def demographics_section(selections):
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates(['sales_by_gender'], selections)
 
-    with col1:
-        # Répartition par genre
-        gender_dist = px.pie(
-            df_filtered,
-            names='Gender',
-            title='Répartition par Genre',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1']
-        )
-        gender_dist.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
-        )
-        st.plotly_chart(gender_dist, use_container_width=True)
+    styled_subheader("👥 Analyse Démographique")
+    with styled_container():
+        col1, col2 = st.columns(2)
 
-    with col2:
-        # Distribution des âges
-        age_dist = px.histogram(
-            df_filtered,
-            x='Age',
-            title='Distribution des Âges',
-            nbins=30,
-            color_discrete_sequence=['#1E88E5']
-        )
-        age_dist.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0),
-            xaxis_title="Âge",
-            yaxis_title="Nombre de Clients"
-        )
-        st.plotly_chart(age_dist, use_container_width=True)
+        with col1:
+            # Répartition par genre
+            def build_gender_dist():
+                gender_dist = px.pie(
+                    aggregates['sales_by_gender'],
+                    values='count',
+                    names='Gender',
+                    title='Répartition par Genre',
+                    hole=0.6,
+                    color_discrete_sequence=['#1E88E5', '#5E35B1']
+                )
+                gender_dist.update_layout(
+                    showlegend=True,
+                    legend=dict(orientation="h", y=-0.1),
+                    margin=dict(t=30, l=0, r=0, b=0)
+                )
+                return gender_dist
+
+            st.plotly_chart(
+                cached_figure('Home/gender_dist', selections, build_gender_dist),
+                use_container_width=True
+            )
+
+        with col2:
+            # Distribution des âges
+            def build_age_dist():
+                age_dist = get_histogram('Age', selections, nbins=30).figure(
+                    title='Distribution des Âges',
+                    x='Age',
+                    color_discrete_sequence=['#1E88E5']
+                )
+                age_dist.update_layout(
+                    showlegend=False,
+                    margin=dict(t=30, l=0, r=0, b=0),
+                    xaxis_title="Âge",
+                    yaxis_title="Nombre de Clients"
+                )
+                return age_dist
+
+            st.plotly_chart(
+                cached_figure('Home/age_dist', selections, build_age_dist),
+                use_container_width=True
+            )
+
+
+demographics_section(selections)
 
 # Analyse des ventes
-styled_subheader("💰 Analyse des Ventes")
-with styled_container():
-    col1, col2 = st.columns(2)
+@section("Analyse des Ventes", ALL_FILTERS)
+def sales_section(selections):
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates([
+        'revenue_by_category',
+        'revenue_by_season'
+    ], selections)
 
-    with col1:
-        # Ventes par catégorie
-        sales_by_category = df_filtered.groupby('Category')['Purchase Amount (USD)'].sum().reset_index()
-        fig_category = px.bar(
-            sales_by_category,
-            x='Category',
-            y='Purchase Amount (USD)',
-            title='Ventes par Catégorie',
-            color='Category',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_category.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0),
-            xaxis_title="Catégorie",
-            yaxis_title="Ventes (USD)"
-        )
-        st.plotly_chart(fig_category, use_container_width=True)
+    styled_subheader("💰 Analyse des Ventes")
+    with styled_container():
+        col1, col2 = st.columns(2)
 
-    with col2:
-        # Ventes par saison
-        sales_by_season = df_filtered.groupby('Season')['Purchase Amount (USD)'].sum().reset_index()
-        fig_season = px.bar(
-            sales_by_season,
-            x='Season',
-            y='Purchase Amount (USD)',
-            title='Ventes par Saison',
-            color='Season',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_season.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0),
-            xaxis_title="Saison",
-            yaxis_title="Ventes (USD)"
-        )
-        st.plotly_chart(fig_season, use_container_width=True)
+        with col1:
+            # Ventes par catégorie
+            def build_category():
+                sales_by_category = aggregates['revenue_by_category']
+                fig_category = px.bar(
+                    sales_by_category,
+                    x='Category',
+                    y='Purchase Amount (USD)',
+                    title='Ventes par Catégorie',
+                    color='Category',
+                    color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+                )
+                fig_category.update_layout(
+                    showlegend=False,
+                    margin=dict(t=30, l=0, r=0, b=0),
+                    xaxis_title="Catégorie",
+                    yaxis_title="Ventes (USD)"
+                )
+                return fig_category
+
+            st.plotly_chart(
+                cached_figure('Home/fig_category', selections, build_category),
+                use_container_width=True
+            )
+
+        with col2:
+            # Ventes par saison
+            def build_season():
+                sales_by_season = aggregates['revenue_by_season']
+                fig_season = px.bar(
+                    sales_by_season,
+                    x='Season',
+                    y='Purchase Amount (USD)',
+                    title='Ventes par Saison',
+                    color='Season',
+                    color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+                )
+                fig_season.update_layout(
+                    showlegend=False,
+                    margin=dict(t=30, l=0, r=0, b=0),
+                    xaxis_title="Saison",
+                    yaxis_title="Ventes (USD)"
+                )
+                return fig_season
+
+            st.plotly_chart(
+                cached_figure('Home/fig_season', selections, build_season),
+                use_container_width=True
+            )
+
+
+sales_section(selections)
 
 # Analyse des comportements d'achat
-styled_subheader("🔄 Comportements d'Achat")
-with styled_container():
-    col1, col2 = st.columns(2)
+@section("Comportements d'Achat", ALL_FILTERS)
+def behavior_section(selections):
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates([
+        'sales_by_payment_method',
+        'sales_by_frequency'
+    ], selections)
 
-    with col1:
-        # Distribution des moyens de paiement
-        payment_dist = df_filtered['Payment Method'].value_counts().reset_index()
-        payment_dist.columns = ['Mode de Paiement', 'Nombre']
-        fig_payment = px.pie(
-            payment_dist,
-            values='Nombre',
-            names='Mode de Paiement',
-            title='Répartition des Modes de Paiement',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_payment.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
-        )
-        st.plotly_chart(fig_payment, use_container_width=True)
+    styled_subheader("🔄 Comportements d'Achat")
+    with styled_container():
+        col1, col2 = st.columns(2)
 
-    with col2:
-        # Fréquence d'achat
-        freq_dist = df_filtered['Frequency of Purchases'].value_counts().reset_index()
-        freq_dist.columns = ['Fréquence', 'Nombre']
-        fig_freq = px.pie(
-            freq_dist,
-            values='Nombre',
-            names='Fréquence',
-            title='Répartition des Fréquences d\'Achat',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_freq.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
+        with col1:
+            # Distribution des moyens de paiement
+            def build_payment():
+                payment_dist = aggregates['sales_by_payment_method']
+                payment_dist.columns = ['Mode de Paiement', 'Nombre']
+                fig_payment = px.pie(
+                    payment_dist,
+                    values='Nombre',
+                    names='Mode de Paiement',
+                    title='Répartition des Modes de Paiement',
+                    hole=0.6,
+                    color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+                )
+                fig_payment.update_layout(
+                    showlegend=True,
+                    legend=dict(orientation="h", y=-0.1),
+                    margin=dict(t=30, l=0, r=0, b=0)
+                )
+                return fig_payment
+
+            st.plotly_chart(
+                cached_figure('Home/fig_payment', selections, build_payment),
+                use_container_width=True
+            )
+
+        with col2:
+            # Fréquence d'achat
+            def build_freq():
+                freq_dist = aggregates['sales_by_frequency']
+                freq_dist.columns = ['Fréquence', 'Nombre']
+                fig_freq = px.pie(
+                    freq_dist,
+                    values='Nombre',
+                    names='Fréquence',
+                    title='Répartition des Fréquences d\'Achat',
+                    hole=0.6,
+                    color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+                )
+                fig_freq.update_layout(
+                    showlegend=True,
+                    legend=dict(orientation="h", y=-0.1),
+                    margin=dict(t=30, l=0, r=0, b=0)
+                )
+                return fig_freq
+
+            st.plotly_chart(
+                cached_figure('Home/fig_freq', selections, build_freq),
+                use_container_width=True
+            )
+
+
+behavior_section(selections)
+
+# Tendances saisonnières : la matrice croise elle-même catégories et saisons,
+# les filtres de catégorie et de saison ne s'y appliquent pas (ils la
+# réduiraient à une ligne ou une colonne)
+@section("Tendances Saisonnières", [c for c in ALL_FILTERS if c not in ('Category', 'Season')])
+def seasonal_section(selections):
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates(['category_season_matrix'], selections)
+
+    styled_subheader("📊 Tendances Saisonnières")
+    with styled_container():
+        # Matrice des ventes par catégorie et saison
+        sales_matrix = aggregates['category_season_matrix']
+
+        def build_heatmap():
+            fig_heatmap = sales_matrix.figure(
+                title='Distribution des Ventes par Catégorie et Saison',
+                labels=dict(x="Saison", y="Catégorie", color="Nombre de Ventes"),
+                color_continuous_scale=['#E3F2FD', '#1E88E5']
+            )
+            fig_heatmap.update_layout(margin=dict(t=30, l=0, r=0, b=0))
+            return fig_heatmap
+
+        st.plotly_chart(
+            cached_figure('Home/fig_heatmap', selections, build_heatmap),
+            use_container_width=True
         )
-        st.plotly_chart(fig_freq, use_container_width=True)
+        st.caption(sales_matrix.describe())
 
-# Tendances saisonnières
-styled_subheader("📊 Tendances Saisonnières")
-with styled_container():
-    # Matrice des ventes par catégorie et saison
-    sales_matrix = pd.crosstab(df_filtered['Category'], df_filtered['Season'])
-    fig_heatmap = px.imshow(
-        sales_matrix,
-        title='Distribution des Ventes par Catégorie et Saison',
-        labels=dict(x="Saison", y="Catégorie", color="Nombre de Ventes"),
-        color_continuous_scale=['#E3F2FD', '#1E88E5']
-    )
-    fig_heatmap.update_layout(margin=dict(t=30, l=0, r=0, b=0))
-    st.plotly_chart(fig_heatmap, use_container_width=True)
+
+seasonal_section(selections)
 
 # Insights et opportunités
+@section("Insights : Codes Promo", ALL_FILTERS)
+def promo_insight(selections):
+    # Calcul du pourcentage de clients sans promo
+    no_promo_rate = get_kpis(selections).no_promo_rate
+    st.info(f"🚨 {no_promo_rate:.1f}% des clients n'utilisent pas de code promo - Opportunité marketing !")
+
+
+# La comparaison porte sur les deux groupes d'abonnement : le filtre
+# d'abonnement ne s'y applique pas (il laisserait un seul groupe)
+@section("Insights : Abonnés", [c for c in ALL_FILTERS if c != 'Subscription Status'])
+def subscription_insight(selections):
+    # Calcul de la différence de dépense entre abonnés et non-abonnés
+    kpis = get_kpis(selections)
+    avg_sub = kpis.subscriber_basket
+    avg_non_sub = kpis.non_subscriber_basket
+    diff_percentage = ((avg_sub - avg_non_sub) / avg_non_sub) * 100
+
+    st.info(f"💡 Les clients abonnés dépensent {diff_percentage:.1f}% de plus que les non-abonnés")
+
+
 styled_subheader("� Insights et Opportunités")
 with styled_container():
     col1, col2 = st.columns(2)
 
     with col1:
-        # Calcul du pourcentage de clients sans promo
-        no_promo_rate = (df_filtered['Promo Code Used'] == 'No').mean() * 100
-        st.info(f"🚨 {no_promo_rate:.1f}% des clients n'utilisent pas de code promo - Opportunité marketing !")
+        promo_insight(selections)
 
     with col2:
-        # Calcul de la différence de dépense entre abonnés et non-abonnés
-        avg_sub = df_filtered[df_filtered['Subscription Status'] == 'Yes']['Purchase Amount (USD)'].mean()
-        avg_non_sub = df_filtered[df_filtered['Subscription Status'] == 'No']['Purchase Amount (USD)'].mean()
-        diff_percentage = ((avg_sub - avg_non_sub) / avg_non_sub) * 100
-        
-        st.info(f"💡 Les clients abonnés dépensent {diff_percentage:.1f}% de plus que les non-abonnés")
\ No newline at end of file
+        subscription_insight(selections)
+
+# Suivi des caches partagés entre pages et sessions et du coût de chaque section
+with st.sidebar.expander("⚙️ Performance du cache"):
+    for cache_name, cache in [("Agrégats", aggregate_cache), ("Figures", figure_cache)]:
+        cache_stats = cache.stats()
+        st.caption(
+            f"{cache_name} : {cache_stats['hits']:,} succès / {cache_stats['misses']:,} échecs "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entrées, "
+            f"{cache_stats['bytes'] / 1024:,.0f} Ko / {cache_stats['max_bytes'] / 1024 ** 2:,.0f} Mo, "
+            f"{cache_stats['evictions']:,} évictions"
+        )
+    zone_stats = scan_stats.stats()
+    if zone_stats['queries']:
+        st.caption(
+            f"Zones : {zone_stats['rows_scanned']:,} lignes parcourues sur {zone_stats['rows']:,} "
+            f"({zone_stats['scanned_share']:.0%}) pour {zone_stats['queries']:,} histogrammes, "
+            f"{zone_stats['zones_skipped']:,} zones sautées, "
+            f"{zone_stats['zones_from_stats']:,} lues dans les statistiques"
+        )
+    memory = column_memory.stats()
+    if memory['columns']:
+        st.caption(
+            f"Mémoire : {memory['bytes_per_row']:.1f} octets par ligne pour {len(memory['columns'])} "
+            f"colonnes chargées ({memory['bytes'] / 1024 ** 2:,.1f} Mo)"
+        )
+    section_timings = st.session_state.get('section_timings', {})
+    if section_timings:
+        st.caption("Dernier rendu : " + ", ".join(
+            f"{name} {duration:.0f} ms" for name, duration in section_timings.items()
+        ))
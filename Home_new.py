@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from utils import load_css, styled_container, styled_title, styled_subheader
+from filters import load_filter_index, sidebar_filters
+from kpis import customers_help, get_kpis
+from aggregates import get_aggregates, get_histogram
+from figures import cached_figure
 
 # Configuration de la page
 st.set_page_config(page_title="Tableau de Bord - Vue d'Ensemble", page_icon="📊", layout="wide")
@@ -9,13 +12,8 @@ st.set_page_config(page_title="Tableau de Bord - Vue d'Ensemble", page_icon="
 # Chargement du CSS
 load_css()
 
-# Chargement des données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('shopping_trends.csv')
-    return df
-
-df = load_data()
+# Index des filtres (la page ne lit que des agrégats)
+filter_index = load_filter_index()
 
 # Titre principal
 styled_title("📊 Tableau de Bord - Vue d'Ensemble")
@@ -28,25 +26,20 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    selected_category = st.multiselect(
-        "Catégorie de Produits",
-        options=df['Category'].unique(),
-        default=df['Category'].unique()
-    )
+    selections = sidebar_filters(filter_index)
 
-    selected_season = st.multiselect(
-        "Saison",
-        options=df['Season'].unique(),
-        default=df['Season'].unique()
-    )
+# Indicateurs clés, calculés en un passage sur le cube
+kpis = get_kpis(selections)
 
-# Filtrage des données
-df_filtered = df[
-    (df['Category'].isin(selected_category)) &
-    (df['Season'].isin(selected_season))
-]
+# Agrégats affichés par la page, calculés ensemble avant les graphiques
+aggregates = get_aggregates([
+    'sales_by_gender',
+    'revenue_by_season',
+    'revenue_by_category',
+    'sales_by_payment_method'
+], selections)
 
-if df_filtered.empty:
+if kpis.purchases == 0:
     st.warning("⚠️ Aucune donnée disponible pour les filtres sélectionnés. Veuillez modifier vos critères de sélection.")
     st.stop()
 
@@ -58,27 +51,28 @@ with styled_container():
     with col1:
         st.metric(
             "👥 Clients Total",
-            f"{len(df_filtered['Customer ID'].unique()):,}"
+            f"{kpis.customers:,}",
+            help=customers_help(kpis)
         )
     with col2:
         st.metric(
             "💰 Panier Moyen",
-            f"${df_filtered['Purchase Amount (USD)'].mean():.2f}"
+            f"${kpis.avg_basket:.2f}"
         )
     with col3:
         st.metric(
             "📦 Total Achats",
-            f"{len(df_filtered):,}"
+            f"{kpis.purchases:,}"
         )
     with col4:
         st.metric(
             "⭐ Note Moyenne",
-            f"{df_filtered['Review Rating'].mean():.2f}/5"
+            f"{kpis.avg_rating:.2f}/5"
         )
     with col5:
         st.metric(
             "🔄 Taux d'Abonnement",
-            f"{(df_filtered['Subscription Status'] == 'Yes').mean() * 100:.1f}%"
+            f"{kpis.subscription_rate:.1f}%"
         )
 
 # Section des graphiques
@@ -87,53 +81,70 @@ col1, col2 = st.columns(2)
 with col1:
     with styled_container():
         styled_subheader("👥 Répartition par Genre")
-        fig_gender = px.pie(
-            df_filtered,
-            names='Gender',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1']
-        )
-        fig_gender.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=0, l=0, r=0, b=0)
+        def build_gender():
+            fig_gender = px.pie(
+                aggregates['sales_by_gender'],
+                values='count',
+                names='Gender',
+                hole=0.6,
+                color_discrete_sequence=['#1E88E5', '#5E35B1']
+            )
+            fig_gender.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=0, l=0, r=0, b=0)
+            )
+            return fig_gender
+
+        st.plotly_chart(
+            cached_figure('Home_new/fig_gender', selections, build_gender),
+            use_container_width=True
         )
-        st.plotly_chart(fig_gender, use_container_width=True)
 
 with col2:
     with styled_container():
         styled_subheader("📊 Distribution des Âges")
-        fig_age = px.histogram(
-            df_filtered,
-            x='Age',
-            nbins=30,
-            color_discrete_sequence=['#1E88E5']
-        )
-        fig_age.update_layout(
-            showlegend=False,
-            margin=dict(t=0, l=0, r=0, b=0),
-            xaxis_title="Âge",
-            yaxis_title="Nombre de Clients"
+        def build_age():
+            fig_age = get_histogram('Age', selections, nbins=30).figure(
+                x='Age',
+                color_discrete_sequence=['#1E88E5']
+            )
+            fig_age.update_layout(
+                showlegend=False,
+                margin=dict(t=0, l=0, r=0, b=0),
+                xaxis_title="Âge",
+                yaxis_title="Nombre de Clients"
+            )
+            return fig_age
+
+        st.plotly_chart(
+            cached_figure('Home_new/fig_age', selections, build_age),
+            use_container_width=True
         )
-        st.plotly_chart(fig_age, use_container_width=True)
 
 # Tendances des ventes
 styled_subheader("📈 Tendances des Ventes")
 with styled_container():
-    seasonal_sales = df_filtered.groupby('Season')['Purchase Amount (USD)'].sum().reset_index()
-    fig_season = px.bar(
-        seasonal_sales,
-        x='Season',
-        y='Purchase Amount (USD)',
-        color='Season',
-        color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-    )
-    fig_season.update_layout(
-        showlegend=True,
-        legend=dict(orientation="h", y=-0.1),
-        margin=dict(t=0, l=0, r=0, b=0)
+    def build_season():
+        seasonal_sales = aggregates['revenue_by_season']
+        fig_season = px.bar(
+            seasonal_sales,
+            x='Season',
+            y='Purchase Amount (USD)',
+            color='Season',
+            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+        )
+        fig_season.update_layout(
+            showlegend=True,
+            legend=dict(orientation="h", y=-0.1),
+            margin=dict(t=0, l=0, r=0, b=0)
+        )
+        return fig_season
+
+    st.plotly_chart(
+        cached_figure('Home_new/fig_season', selections, build_season),
+        use_container_width=True
     )
-    st.plotly_chart(fig_season, use_container_width=True)
 
 # Catégories populaires
 styled_subheader("🏷️ Top des Catégories")
@@ -141,38 +152,50 @@ with styled_container():
     col1, col2 = st.columns(2)
     
     with col1:
-        category_sales = df_filtered.groupby('Category')['Purchase Amount (USD)'].sum().reset_index()
-        category_sales = category_sales.sort_values('Purchase Amount (USD)', ascending=True)
-        fig_category = px.bar(
-            category_sales,
-            x='Purchase Amount (USD)',
-            y='Category',
-            orientation='h',
-            color='Category',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_category.update_layout(
-            showlegend=False,
-            margin=dict(t=0, l=0, r=0, b=0),
-            xaxis_title="Montant des Ventes (USD)",
-            yaxis_title="Catégorie"
+        def build_category():
+            category_sales = aggregates['revenue_by_category']
+            category_sales = category_sales.sort_values('Purchase Amount (USD)', ascending=True)
+            fig_category = px.bar(
+                category_sales,
+                x='Purchase Amount (USD)',
+                y='Category',
+                orientation='h',
+                color='Category',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_category.update_layout(
+                showlegend=False,
+                margin=dict(t=0, l=0, r=0, b=0),
+                xaxis_title="Montant des Ventes (USD)",
+                yaxis_title="Catégorie"
+            )
+            return fig_category
+
+        st.plotly_chart(
+            cached_figure('Home_new/fig_category', selections, build_category),
+            use_container_width=True
         )
-        st.plotly_chart(fig_category, use_container_width=True)
     
     with col2:
-        payment_dist = df_filtered['Payment Method'].value_counts().reset_index()
-        payment_dist.columns = ['Méthode', 'Nombre']
-        fig_payment = px.pie(
-            payment_dist,
-            values='Nombre',
-            names='Méthode',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_payment.update_layout(
-            title="Répartition des Méthodes de Paiement",
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
-        )
-        st.plotly_chart(fig_payment, use_container_width=True)
\ No newline at end of file
+        def build_payment():
+            payment_dist = aggregates['sales_by_payment_method']
+            payment_dist.columns = ['Méthode', 'Nombre']
+            fig_payment = px.pie(
+                payment_dist,
+                values='Nombre',
+                names='Méthode',
+                hole=0.6,
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_payment.update_layout(
+                title="Répartition des Méthodes de Paiement",
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_payment
+
+        st.plotly_chart(
+            cached_figure('Home_new/fig_payment', selections, build_payment),
+            use_container_width=True
+        )
\ No newline at end of file
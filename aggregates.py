@@ -0,0 +1,491 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from backend import QUERY_BACKEND, load_categories, query_cells, query_distinct_by, query_value_counts
+from boxplots import BoxStats
+from cube import SKETCH_DIMENSIONS
+from data import (
+    DATA_PATH, DERIVED_COLUMNS, QUANTILE_MODE, data_cache, dataset_version, load_aggregates, load_data, load_zone_map
+)
+from filters import load_filter_index, load_selection
+from histograms import Histogram
+from planner import AggregateSpec, execute
+from quantiles import QUANTILE_COLUMNS, QuantileSketch
+from scatter import ScatterSummary
+from zonemaps import scan_stats
+
+# Modes de calcul des quantiles (data.QUANTILE_MODE)
+QUANTILE_MODES = ('sketch', 'exact')
+
+if QUANTILE_MODE not in QUANTILE_MODES:
+    raise ValueError(f"Mode de quantiles inconnu : {QUANTILE_MODE} (attendu : {', '.join(QUANTILE_MODES)})")
+
+# Budget mémoire du cache d'agrégats partagé par toutes les pages et sessions,
+# en octets (variable d'environnement DASHBOARD_AGGREGATE_CACHE_BYTES, 64 Mo
+# par défaut)
+AGGREGATE_CACHE_BYTES = os.environ.get('DASHBOARD_AGGREGATE_CACHE_BYTES', str(64 * 1024 * 1024))
+
+if not AGGREGATE_CACHE_BYTES.isdigit():
+    raise ValueError(
+        f"Budget du cache d'agrégats invalide : {AGGREGATE_CACHE_BYTES} (attendu : un nombre entier d'octets)"
+    )
+AGGREGATE_CACHE_BYTES = int(AGGREGATE_CACHE_BYTES)
+
+# Registre des agrégats nommés : nom -> AggregateSpec
+AGGREGATES = {}
+
+
+def register_aggregate(name, spec):
+    """
+    Déclare un agrégat nommé par sa spécification (dimensions, mesure,
+    statistique). Le planificateur (planner.py) décide de sa source et le
+    calcule avec les autres agrégats demandés par la page.
+
+    Args:
+        name (str): Nom de l'agrégat, par exemple 'revenue_by_category'
+        spec (AggregateSpec): Dimensions, mesure, statistique et forme du résultat
+    """
+    AGGREGATES[name] = spec
+    return spec
+
+
+# Dimensions exposées sous forme d'agrégats : colonne -> suffixe du nom
+_DIMENSIONS = {
+    'Category': 'category',
+    'Season': 'season',
+    'Gender': 'gender',
+    'Payment Method': 'payment_method',
+    'Shipping Type': 'shipping_type',
+    'Frequency of Purchases': 'frequency'
+}
+
+for _column, _suffix in _DIMENSIONS.items():
+    # Nombre de ventes, trié par ordre décroissant comme value_counts()
+    register_aggregate(f'sales_by_{_suffix}', AggregateSpec((_column,), output='counts'))
+    register_aggregate(f'revenue_by_{_suffix}', AggregateSpec((_column,), 'Purchase Amount (USD)', 'sum'))
+    register_aggregate(f'avg_basket_by_{_suffix}', AggregateSpec((_column,), 'Purchase Amount (USD)', 'mean'))
+
+register_aggregate('category_season_matrix', AggregateSpec(('Category', 'Season'), output='crosstab'))
+register_aggregate('avg_basket_by_season_category', AggregateSpec(
+    ('Season', 'Category'), 'Purchase Amount (USD)', 'mean'
+))
+register_aggregate('promo_impact', AggregateSpec(
+    ('Promo Code Used',), 'Purchase Amount (USD)', ('mean', 'count')
+))
+
+# Dimensions hors du cube : calculées sur les lignes sélectionnées, en un
+# seul comptage pour toutes celles qu'une page demande
+register_aggregate('sales_by_size', AggregateSpec(('Size',), output='counts'))
+register_aggregate('sales_by_color', AggregateSpec(('Color',), output='counts'))
+register_aggregate('sales_by_item', AggregateSpec(('Item Purchased',), output='counts'))
+register_aggregate('size_color_matrix', AggregateSpec(('Size', 'Color'), output='crosstab'))
+register_aggregate('payment_preference_matrix', AggregateSpec(
+    ('Payment Method', 'Preferred Payment Method'), output='crosstab'
+))
+
+
+# Taille approximative d'un résultat, pour le budget mémoire
+def _sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class AggregateCache:
+    """
+    Cache LRU borné en mémoire, avec compteurs de succès/échecs. Sert aux
+    agrégats (aggregate_cache) et aux figures sérialisées (figures.figure_cache).
+
+    Les entrées les moins récemment utilisées sont évincées dès que la taille
+    cumulée des résultats dépasse `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=AGGREGATE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        value = compute()
+        self._store(key, value)
+        return value
+
+    def get_many(self, keys, compute):
+        """
+        Variante groupée de get : `compute(missing)` reçoit la liste des clés
+        absentes du cache et retourne leurs valeurs (dict), calculées ensemble.
+        """
+        values = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values[key] = self._entries[key][0]
+            missing = [key for key in keys if key not in values]
+            self.misses += len(missing)
+        if missing:
+            computed = compute(missing)
+            for key in missing:
+                self._store(key, computed[key])
+                values[key] = computed[key]
+        return values
+
+    def _store(self, key, value):
+        size = _sizeof(value)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.bytes -= evicted
+                    self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        Compteurs à surveiller : succès, échecs, taux de succès, évictions,
+        nombre d'entrées et mémoire occupée.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+# Instance unique du processus, vidée quand les données changent
+aggregate_cache = data_cache(AggregateCache())
+
+
+def get_aggregates(names, selections, path=DATA_PATH):
+    """
+    Retourne les agrégats `names` pour les filtres de la sidebar, calculés
+    ensemble.
+
+    Une page déclare en tête la liste des agrégats qu'elle affiche : ceux qui
+    manquent au cache sont confiés au planificateur (planner.execute), qui les
+    évalue en un passage par source avant qu'aucune figure ne soit construite.
+    Chaque résultat est mis en cache sous (nom, version des données, sélection
+    normalisée) et partagé entre toutes les pages et toutes les sessions. Des
+    copies sont retournées, la page peut donc les modifier librement.
+
+    Args:
+        names (list[str]): Noms d'agrégats du registre AGGREGATES
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        dict: Résultat de chaque agrégat (pandas.DataFrame), par nom
+    """
+    version = dataset_version(path)
+    normalized = load_filter_index(path).normalize(selections)
+    keys = {(name, version, normalized): name for name in names}
+
+    def compute(missing):
+        results = execute({keys[key]: AGGREGATES[keys[key]] for key in missing}, selections, path)
+        return {key: results[keys[key]] for key in missing}
+
+    values = aggregate_cache.get_many(list(keys), compute)
+    results = {}
+    for key, name in keys.items():
+        value = values[key]
+        results[name] = value.copy() if isinstance(value, (pd.DataFrame, pd.Series)) else value
+    return results
+
+
+def get_aggregate(name, selections, path=DATA_PATH):
+    """
+    Retourne l'agrégat `name` pour les filtres de la sidebar (voir
+    get_aggregates, qui en calcule plusieurs à la fois).
+
+    Args:
+        name (str): Nom d'un agrégat du registre AGGREGATES
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        pandas.DataFrame: Le résultat de l'agrégat
+    """
+    return get_aggregates([name], selections, path)[name]
+
+
+# Agrégat calculé sur les lignes sélectionnées (et non sur le cube), mis en
+# cache comme les autres sous (nom, version, sélection normalisée). Avec les
+# autres moteurs (DuckDB, Polars, agrégats d'ingest.py), `query` le calcule
+# sans charger les lignes. `zones`, essayé en premier, le tire des zones de
+# l'instantané quand elles suffisent (None sinon).
+def _get_row_aggregate(name, columns, selections, build, path, query=None, zones=None, sketch=None):
+    filter_index = load_filter_index(path)
+    active = filter_index.normalize(selections)
+    key = (name, dataset_version(path), active)
+
+    def compute():
+        # Raccourcis (zones, sketches) : None quand ils ne couvrent pas la sélection
+        for shortcut in (sketch, zones):
+            if shortcut is not None:
+                result = shortcut(active)
+                if result is not None:
+                    return result
+        if query is not None and QUERY_BACKEND != 'pandas':
+            return query(active)
+        df = load_selection(columns, selections, path)
+        return build(df)
+
+    return aggregate_cache.get(key, compute)
+
+
+def get_histogram(column, selections, nbins=None, color=None, path=DATA_PATH):
+    """
+    Retourne l'histogramme de `column` pour les filtres de la sidebar.
+
+    Les classes sont calculées en NumPy sur les lignes sélectionnées (ou, avec
+    les autres moteurs, sur l'effectif de chaque valeur) puis mises
+    en cache comme les autres agrégats ; la page n'envoie au navigateur que les
+    bornes et les effectifs.
+
+    Sans ventilation et quand seuls des filtres d'intervalle sont actifs, les
+    effectifs sont tirés des zones de l'instantané (zonemaps.ZoneMap) : seules
+    les zones à cheval sur un intervalle sont parcourues.
+
+    Args:
+        column (str): Colonne numérique à répartir
+        selections (dict): Filtres retournés par filters.sidebar_filters
+        nbins (int, optional): Nombre maximal de classes (automatique si None)
+        color (str, optional): Colonne catégorielle de ventilation (barres groupées)
+
+    Returns:
+        Histogram: Bornes et effectifs, avec Histogram.figure() pour l'affichage
+    """
+    return _get_row_aggregate(
+        ('histogram', column, nbins, color),
+        [column] if color is None else [column, color],
+        selections,
+        lambda df: Histogram(df[column], nbins, None if color is None else df[color]),
+        path,
+        query=lambda active: _histogram_from_counts(column, nbins, color, active, path),
+        zones=None if color is not None else lambda active: _histogram_from_zones(column, nbins, active, path)
+    )
+
+
+def _histogram_from_counts(column, nbins, color, active, path):
+    values, groups, weights = query_value_counts(column, color, active, path)
+    return Histogram(values, nbins, groups, weights)
+
+
+# Histogramme tiré des zones de l'instantané, les zones à cheval sur un
+# intervalle étant parcourues sur les colonnes en mémoire (moteur pandas) ;
+# None si les zones ne suffisent pas. Les lignes parcourues sont comptées
+# dans zonemaps.scan_stats.
+def _histogram_from_zones(column, nbins, active, path):
+    zone_map = load_zone_map(path)
+    if zone_map is None or column not in zone_map.counts:
+        return None
+    ranges = dict(active)
+    if not zone_map.covers(ranges):
+        # Filtre sur une colonne textuelle : toutes les lignes sont lues
+        scan_stats.record(zone_map.n_rows, zone_map.n_rows)
+        return None
+    values, counts, partial, skipped = zone_map.value_counts(column, ranges)
+    from_stats = zone_map.n_zones - len(skipped) - len(partial)
+    if len(partial) and QUERY_BACKEND != 'pandas':
+        # Le moteur de requêtes parcourt lui-même les groupes de lignes non
+        # exclus par leurs statistiques Parquet
+        scan_stats.record(zone_map.n_rows, zone_map.n_rows - zone_map.size(skipped), len(skipped))
+        return None
+    if len(partial):
+        counts += zone_map.scan(column, ranges, partial, load_data([column, *ranges], path))
+    scan_stats.record(zone_map.n_rows, zone_map.size(partial), len(skipped), from_stats)
+    observed = counts > 0
+    return Histogram(values[observed], nbins, None, counts[observed])
+
+
+def get_boxplot(column, by, selections, path=DATA_PATH):
+    """
+    Retourne les statistiques de boîtes à moustaches de `column` par `by`.
+
+    Quartiles, moustaches et un échantillon borné des valeurs aberrantes sont
+    calculés en un seul tri des lignes sélectionnées (ou, avec les autres
+    moteurs, de l'effectif de chaque valeur), puis mis en cache.
+
+    Quand les boîtes et les filtres actifs portent sur des dimensions des
+    sketches de quantiles (select_quantile_sketch), les effectifs viennent de
+    la réunion des cellules retenues, sans relire les lignes.
+
+    Args:
+        column (str): Colonne numérique, par exemple 'Purchase Amount (USD)'
+        by (str): Colonne catégorielle définissant les boîtes
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        BoxStats: Statistiques par groupe, avec BoxStats.figure() pour l'affichage
+    """
+    return _get_row_aggregate(
+        ('boxplot', column, by),
+        [column, by],
+        selections,
+        lambda df: BoxStats(df[column], df[by]),
+        path,
+        query=lambda active: _boxplot_from_counts(column, by, active, path),
+        sketch=lambda active: _boxplot_from_sketch(column, by, active, path)
+    )
+
+
+def _boxplot_from_counts(column, by, active, path):
+    values, groups, weights = query_value_counts(column, by, active, path)
+    return BoxStats(values, groups, weights=weights)
+
+
+def _boxplot_from_sketch(column, by, active, path):
+    sketch = select_quantile_sketch(column, by, active, path)
+    if sketch is None:
+        return None
+    values, groups, weights = sketch.value_counts(by, dict(active))
+    return BoxStats(values, groups, weights=weights)
+
+
+@data_cache
+@st.cache_resource
+def _build_quantile_sketch(path, version, column):
+    return QuantileSketch(load_data([column, *SKETCH_DIMENSIONS], path), column, SKETCH_DIMENSIONS)
+
+
+def select_quantile_sketch(column, by, active, path=DATA_PATH):
+    """
+    Retourne le sketch de quantiles de `column` qui répond à une sélection :
+    celui construit une fois par version sur les lignes chargées (pandas) ou
+    celui de l'état d'agrégats (moteur 'aggregates').
+
+    Args:
+        column (str): Colonne de QUANTILE_COLUMNS
+        by (str | None): Dimension des groupes (None pour toute la sélection)
+        active (tuple): Filtres actifs (FilterIndex.normalize)
+
+    Returns:
+        QuantileSketch | None: None en mode exact, avec DuckDB et Polars, ou
+        si `by` ou un filtre actif n'est pas une dimension des sketches
+    """
+    if QUANTILE_MODE != 'sketch' or column not in QUANTILE_COLUMNS:
+        return None
+    if not {*([] if by is None else [by]), *(c for c, _ in active)} <= set(SKETCH_DIMENSIONS):
+        return None
+    if QUERY_BACKEND == 'aggregates':
+        return load_aggregates(path).quantiles[column]
+    if QUERY_BACKEND == 'pandas':
+        return _build_quantile_sketch(path, dataset_version(path), column)
+    return None
+
+
+def get_scatter(x, y, selections, path=DATA_PATH):
+    """
+    Retourne le nuage de points `x` / `y` et sa droite de tendance.
+
+    La régression est calculée en forme fermée avec NumPy et le résultat est
+    mis en cache par sélection ; au-delà de scatter.SCATTER_DENSITY_ROWS
+    points, seule une grille de densité est conservée. Avec les autres
+    moteurs, les points sont les couples (x, y) distincts pondérés par leur
+    effectif.
+
+    Args:
+        x, y (str): Colonnes numériques des deux axes
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        ScatterSummary: Points (ou densité) et ajustement (ScatterSummary.fit)
+    """
+    return _get_row_aggregate(
+        ('scatter', x, y), [x, y], selections,
+        lambda df: ScatterSummary(df[x], df[y]),
+        path,
+        query=lambda active: _scatter_from_counts(x, y, active, path)
+    )
+
+
+def _scatter_from_counts(x, y, active, path):
+    values, groups, weights = query_value_counts(x, y, active, path)
+    return ScatterSummary(values, np.asarray(groups, dtype=np.float64), weights)
+
+
+# Indicateurs par état : clients distincts, achats, chiffre d'affaires,
+# panier moyen et note moyenne
+def _state_rollup(df):
+    return df.groupby(['State_Code', 'Location'], observed=True).agg(
+        customers=('Customer ID', 'nunique'),
+        purchases=('Customer ID', 'size'),
+        revenue=('Purchase Amount (USD)', 'sum'),
+        avg_basket=('Purchase Amount (USD)', 'mean'),
+        rating=('Review Rating', 'mean')
+    ).reset_index()
+
+
+# Même table à partir des cellules par état et des clients distincts par état
+def _state_rollup_from_cells(active, path):
+    amount, rating = 'Purchase Amount (USD)', 'Review Rating'
+    cells = query_cells(['Location'], [amount, rating], active, path)
+    location = pd.Categorical(cells['Location'], categories=load_categories('Location', path))
+    order = np.argsort(location.codes, kind='stable')
+    cells, location = cells.iloc[order], location[order]
+    groups, customers = query_distinct_by('Customer ID', 'Location', active, path)
+    count = cells['count'].to_numpy()
+    _, to_state_code = DERIVED_COLUMNS['State_Code']
+    return pd.DataFrame({
+        'State_Code': to_state_code(pd.Series(location)),
+        'Location': location,
+        'customers': pd.Series(customers, index=groups).reindex(location).to_numpy(dtype=np.int64),
+        'purchases': count.astype(np.int64),
+        'revenue': np.rint(cells[f'sum({amount})'].to_numpy()).astype(np.int64),
+        'avg_basket': cells[f'sum({amount})'].to_numpy() / count,
+        'rating': (cells[f'sum({rating})'].to_numpy() / count).astype(np.float32)
+    })
+
+
+def get_state_rollup(selections, path=DATA_PATH):
+    """
+    Retourne les indicateurs par état pour les filtres de la sidebar.
+
+    Une ligne par état (au plus 50) : la carte et les analyses par état lisent
+    cette table mise en cache au lieu des lignes filtrées.
+
+    Args:
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        pandas.DataFrame: Colonnes State_Code, Location, customers, purchases,
+        revenue, avg_basket et rating
+    """
+    rollup = _get_row_aggregate(
+        ('state_rollup',),
+        ['State_Code', 'Location', 'Customer ID', 'Purchase Amount (USD)', 'Review Rating'],
+        selections, _state_rollup, path,
+        query=lambda active: _state_rollup_from_cells(active, path)
+    )
+    return rollup.copy()
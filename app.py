@@ -1,12 +1,15 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from pages.client_analysis import show_client_analysis
 from pages.product_analysis import show_product_analysis
 from pages.financial_analysis import show_financial_analysis
 from pages.customer_behavior import show_customer_behavior
 from pages.payment_shipping import show_payment_shipping
-from state_codes import STATE_DICT
+from filters import load_filter_index, sidebar_filters
+from kpis import customers_help, get_kpis, get_row_kpis
+from aggregates import get_aggregates, get_histogram, get_scatter, get_state_rollup
+from figures import cached_figure
+from sections import ALL_FILTERS, section
 
 # Configuration de la page
 st.set_page_config(
@@ -15,13 +18,8 @@ st.set_page_config(
     layout="wide"
 )
 
-# Chargement des données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('shopping_trends.csv')
-    return df
-
-df = load_data()
+# Index des filtres (les lignes ne sont chargées que par l'onglet affiché)
+filter_index = load_filter_index()
 
 # Titre principal
 st.title("🛍️ Analyse Détaillée des Tendances d'Achat")
@@ -41,281 +39,412 @@ selected_tab = st.sidebar.radio(
 # Filtres globaux dans la sidebar
 st.sidebar.markdown("---")
 st.sidebar.header("Filtres Globaux")
-selected_category = st.sidebar.multiselect(
-    "Catégorie de Produits",
-    options=df['Category'].unique(),
-    default=df['Category'].unique()
-)
-
-selected_season = st.sidebar.multiselect(
-    "Saison",
-    options=df['Season'].unique(),
-    default=df['Season'].unique()
-)
-
-# Filtrage des données
-df_filtered = df[
-    (df['Category'].isin(selected_category)) &
-    (df['Season'].isin(selected_season))
-]
+with st.sidebar:
+    selections = sidebar_filters(filter_index)
 
 # Avertissement si aucune donnée n'est sélectionnée
-if df_filtered.empty:
+if filter_index.count(selections) == 0:
     st.warning("⚠️ Aucune donnée disponible pour les filtres sélectionnés. Veuillez modifier vos critères de sélection.")
 
-# Affichage conditionnel des sections en fonction de l'onglet sélectionné
-if selected_tab == "👥 Analyse Client":
+# Chaque onglet est une section : seule celle de l'onglet sélectionné est
+# calculée, avec les seuls agrégats qu'elle déclare
+@section("👥 Analyse Client", ALL_FILTERS)
+def client_tab(selections):
+    kpis = get_kpis(selections)
+
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates(['sales_by_frequency'], selections)
+
     st.header("Analyse Client")
     
     # Métriques clés clients
     col1, col2, col3 = st.columns(3)
     with col1:
-        total_customers = len(df_filtered['Customer ID'].unique()) if not df_filtered.empty else 0
-        st.metric("Nombre Total de Clients", f"{total_customers:,}")
+        total_customers = kpis.customers
+        st.metric("Nombre Total de Clients", f"{total_customers:,}", help=customers_help(kpis))
     with col2:
-        avg_age = df_filtered['Age'].mean() if not df_filtered.empty else 0
+        avg_age = kpis.avg_age if kpis.purchases else 0
         st.metric("Âge Moyen", f"{avg_age:.1f} ans")
     with col3:
-        subscription_rate = (df_filtered['Subscription Status'] == 'Yes').mean() * 100 if not df_filtered.empty else 0
+        subscription_rate = kpis.subscription_rate if kpis.purchases else 0
         st.metric("Taux d'Abonnement", f"{subscription_rate:.1f}%")
 
     col1, col2 = st.columns(2)
     
     with col1:
         # Pyramide des âges par genre
-        fig_age_gender = px.histogram(
-            df_filtered,
-            x='Age',
-            color='Gender',
-            barmode='group',
-            title='Distribution des Âges par Genre',
-            labels={'Age': 'Âge', 'count': 'Nombre de Clients'}
+        def build_age_gender():
+            return get_histogram('Age', selections, color='Gender').figure(
+                title='Distribution des Âges par Genre',
+                labels={'Age': 'Âge', 'count': 'Nombre de Clients'},
+                x='Age',
+                color='Gender'
+            )
+
+        st.plotly_chart(
+            cached_figure('app/fig_age_gender', selections, build_age_gender),
+            use_container_width=True
         )
-        st.plotly_chart(fig_age_gender, use_container_width=True)
 
     with col2:
         # Répartition géographique des clients
-        df_filtered['State_Code'] = df_filtered['Location'].map(STATE_DICT)
-        location_counts = df_filtered.groupby('State_Code').size().reset_index()
-        location_counts.columns = ['State_Code', 'Count']
+        def build_geo():
+            state_rollup = get_state_rollup(selections)
         
-        fig_geo = px.choropleth(
-            location_counts,
-            locations='State_Code',
-            locationmode="USA-states",
-            color='Count',
-            scope="usa",
-            color_continuous_scale="Viridis",
-            title='Répartition Géographique des Clients',
-            labels={'Count': 'Nombre de Clients'}
-        )
-        fig_geo.update_layout(
-            geo_scope='usa',
-            margin=dict(l=0, r=0, t=30, b=0)
+            fig_geo = px.choropleth(
+                state_rollup,
+                locations='State_Code',
+                locationmode="USA-states",
+                color='customers',
+                scope="usa",
+                color_continuous_scale="Viridis",
+                title='Répartition Géographique des Clients',
+                hover_name='Location',
+                hover_data={'State_Code': False, 'revenue': ':,.0f', 'avg_basket': ':.2f', 'rating': ':.2f'},
+                labels={
+                    'customers': 'Nombre de Clients',
+                    'revenue': 'Chiffre d\'Affaires ($)',
+                    'avg_basket': 'Panier Moyen ($)',
+                    'rating': 'Note Moyenne'
+                }
+            )
+            fig_geo.update_layout(
+                geo_scope='usa',
+                margin=dict(l=0, r=0, t=30, b=0)
+            )
+            return fig_geo
+
+        st.plotly_chart(
+            cached_figure('app/fig_geo', selections, build_geo),
+            use_container_width=True
         )
-        st.plotly_chart(fig_geo, use_container_width=True)
 
     # Segmentation des clients par fréquence d'achat
-    freq_dist = px.pie(
-        df_filtered,
-        names='Frequency of Purchases',
-        title='Segmentation par Fréquence d\'Achat'
+    def build_freq_dist():
+        return px.pie(
+            aggregates['sales_by_frequency'],
+            values='count',
+            names='Frequency of Purchases',
+            title='Segmentation par Fréquence d\'Achat'
+        )
+
+    st.plotly_chart(
+        cached_figure('app/freq_dist', selections, build_freq_dist),
+        use_container_width=True
     )
-    st.plotly_chart(freq_dist, use_container_width=True)
 
-elif selected_tab == "📦 Analyse Produit":
+
+@section("📦 Analyse Produit", ALL_FILTERS)
+def product_tab(selections):
+    kpis = get_kpis(selections)
+    row_kpis = get_row_kpis(selections)
+
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates([
+        'sales_by_category',
+        'sales_by_item',
+        'size_color_matrix'
+    ], selections)
+
     st.header("Analyse Produit")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        total_products = len(df_filtered['Item Purchased'].unique()) if not df_filtered.empty else 0
+        total_products = row_kpis.distinct_items
         st.metric("Nombre de Produits Uniques", f"{total_products:,}")
     with col2:
-        top_category = df_filtered['Category'].mode().iloc[0] if not df_filtered.empty else "Aucune donnée"
+        top_category = kpis.top_category or "Aucune donnée"
         st.metric("Catégorie la Plus Populaire", top_category)
     with col3:
-        top_color = df_filtered['Color'].mode().iloc[0] if not df_filtered.empty else "Aucune donnée"
+        top_color = row_kpis.top_color or "Aucune donnée"
         st.metric("Couleur la Plus Vendue", top_color)
 
     col1, col2 = st.columns(2)
     
     with col1:
         # Répartition des catégories de produits
-        fig_categories = px.pie(
-            df_filtered,
-            names='Category',
-            title='Répartition des Catégories de Produits',
-            hole=0.3
+        def build_categories():
+            return px.pie(
+                aggregates['sales_by_category'],
+                values='count',
+                names='Category',
+                title='Répartition des Catégories de Produits',
+                hole=0.3
+            )
+
+        st.plotly_chart(
+            cached_figure('app/fig_categories', selections, build_categories),
+            use_container_width=True
         )
-        st.plotly_chart(fig_categories, use_container_width=True)
 
     with col2:
         # Top 10 des produits les plus vendus
-        top_items = df_filtered['Item Purchased'].value_counts().head(10)
-        fig_top_items = px.bar(
-            x=top_items.index,
-            y=top_items.values,
-            title='Top 10 des Produits les Plus Vendus',
-            labels={'x': 'Produit', 'y': 'Nombre de Ventes'}
+        def build_top_items():
+            top_items = aggregates['sales_by_item'].set_index('Item Purchased')['count'].head(10)
+            fig_top_items = px.bar(
+                x=top_items.index,
+                y=top_items.values,
+                title='Top 10 des Produits les Plus Vendus',
+                labels={'x': 'Produit', 'y': 'Nombre de Ventes'}
+            )
+            return fig_top_items
+
+        st.plotly_chart(
+            cached_figure('app/fig_top_items', selections, build_top_items),
+            use_container_width=True
         )
-        st.plotly_chart(fig_top_items, use_container_width=True)
 
     # Matrice des tailles et couleurs
-    size_color_matrix = pd.crosstab(df_filtered['Size'], df_filtered['Color'])
-    fig_matrix = px.imshow(
-        size_color_matrix,
-        title='Matrice Tailles/Couleurs',
-        labels=dict(x='Couleur', y='Taille', color='Nombre de Produits')
+    size_color_matrix = aggregates['size_color_matrix']
+
+    def build_matrix():
+        fig_matrix = size_color_matrix.figure(
+            title='Matrice Tailles/Couleurs',
+            labels=dict(x='Couleur', y='Taille', color='Nombre de Produits')
+        )
+        return fig_matrix
+
+    st.plotly_chart(
+        cached_figure('app/fig_matrix', selections, build_matrix),
+        use_container_width=True
     )
-    st.plotly_chart(fig_matrix, use_container_width=True)
+    st.caption(size_color_matrix.describe())
+
+
+@section("💰 Analyse Financière", ALL_FILTERS)
+def financial_tab(selections):
+    kpis = get_kpis(selections)
+    row_kpis = get_row_kpis(selections)
+
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates([
+        'revenue_by_season',
+        'promo_impact'
+    ], selections)
 
-elif selected_tab == "💰 Analyse Financière":
     st.header("Analyse Financière")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        total_revenue = df_filtered['Purchase Amount (USD)'].sum() if not df_filtered.empty else 0
+        total_revenue = kpis.revenue
         st.metric("Chiffre d'Affaires Total", f"${total_revenue:,.2f}")
     with col2:
-        avg_purchase = df_filtered['Purchase Amount (USD)'].mean() if not df_filtered.empty else 0
+        avg_purchase = kpis.avg_basket if kpis.purchases else 0
         st.metric("Panier Moyen", f"${avg_purchase:.2f}")
     with col3:
-        discount_rate = (df_filtered['Discount Applied'] == 'Yes').mean() * 100 if not df_filtered.empty else 0
+        discount_rate = row_kpis.discount_rate if kpis.purchases else 0
         st.metric("Taux d'Utilisation des Remises", f"{discount_rate:.1f}%")
 
     col1, col2 = st.columns(2)
     
     with col1:
         # Évolution des ventes par saison
-        seasonal_sales = df_filtered.groupby('Season')['Purchase Amount (USD)'].sum().reset_index()
-        fig_seasonal = px.bar(
-            seasonal_sales,
-            x='Season',
-            y='Purchase Amount (USD)',
-            title='Ventes par Saison',
-            color='Season'
+        def build_seasonal():
+            seasonal_sales = aggregates['revenue_by_season']
+            fig_seasonal = px.bar(
+                seasonal_sales,
+                x='Season',
+                y='Purchase Amount (USD)',
+                title='Ventes par Saison',
+                color='Season'
+            )
+            return fig_seasonal
+
+        st.plotly_chart(
+            cached_figure('app/fig_seasonal', selections, build_seasonal),
+            use_container_width=True
         )
-        st.plotly_chart(fig_seasonal, use_container_width=True)
 
     with col2:
         # Distribution des montants d'achat
-        fig_purchase_dist = px.histogram(
-            df_filtered,
-            x='Purchase Amount (USD)',
-            title='Distribution des Montants d\'Achat',
-            nbins=30
+        def build_purchase_dist():
+            return get_histogram('Purchase Amount (USD)', selections, nbins=30).figure(
+                title='Distribution des Montants d\'Achat',
+                x='Purchase Amount (USD)'
+            )
+
+        st.plotly_chart(
+            cached_figure('app/fig_purchase_dist', selections, build_purchase_dist),
+            use_container_width=True
         )
-        st.plotly_chart(fig_purchase_dist, use_container_width=True)
 
     # Impact des promotions sur les ventes
-    promo_impact = df_filtered.groupby('Promo Code Used')['Purchase Amount (USD)'].agg(['mean', 'count']).reset_index()
-    fig_promo = px.bar(
-        promo_impact,
-        x='Promo Code Used',
-        y='mean',
-        title='Impact des Codes Promo sur le Montant Moyen d\'Achat',
-        labels={'mean': 'Montant Moyen d\'Achat ($)'}
+    def build_promo():
+        promo_impact = aggregates['promo_impact']
+        fig_promo = px.bar(
+            promo_impact,
+            x='Promo Code Used',
+            y='mean',
+            title='Impact des Codes Promo sur le Montant Moyen d\'Achat',
+            labels={'mean': 'Montant Moyen d\'Achat ($)'}
+        )
+        return fig_promo
+
+    st.plotly_chart(
+        cached_figure('app/fig_promo', selections, build_promo),
+        use_container_width=True
     )
-    st.plotly_chart(fig_promo, use_container_width=True)
 
-elif selected_tab == "🎯 Comportement Client":
+
+@section("🎯 Comportement Client", ALL_FILTERS)
+def behavior_tab(selections):
+    kpis = get_kpis(selections)
+    row_kpis = get_row_kpis(selections)
+
     st.header("Comportement Client")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        avg_rating = df_filtered['Review Rating'].mean() if not df_filtered.empty else 0
+        avg_rating = kpis.avg_rating if kpis.purchases else 0
         st.metric("Note Moyenne", f"{avg_rating:.2f}/5")
     with col2:
-        avg_purchases = df_filtered['Previous Purchases'].mean() if not df_filtered.empty else 0
+        avg_purchases = row_kpis.avg_previous_purchases if kpis.purchases else 0
         st.metric("Nombre Moyen d'Achats Précédents", f"{avg_purchases:.1f}")
     with col3:
-        returning_rate = (df_filtered['Previous Purchases'] > 0).mean() * 100 if not df_filtered.empty else 0
+        returning_rate = row_kpis.returning_rate if kpis.purchases else 0
         st.metric("Taux de Clients Fidèles", f"{returning_rate:.1f}%")
 
     col1, col2 = st.columns(2)
     
     with col1:
         # Distribution des notes
-        fig_ratings = px.histogram(
-            df_filtered,
-            x='Review Rating',
-            title='Distribution des Notes Client',
-            nbins=20
+        def build_ratings():
+            return get_histogram('Review Rating', selections, nbins=20).figure(
+                title='Distribution des Notes Client',
+                x='Review Rating'
+            )
+
+        st.plotly_chart(
+            cached_figure('app/fig_ratings', selections, build_ratings),
+            use_container_width=True
         )
-        st.plotly_chart(fig_ratings, use_container_width=True)
 
     with col2:
         # Relation entre notes et montant d'achat
-        fig_rating_purchase = px.scatter(
-            df_filtered,
-            x='Review Rating',
-            y='Purchase Amount (USD)',
-            title='Relation entre Notes et Montant d\'Achat',
-            trendline="ols"
+        rating_purchase = get_scatter('Review Rating', 'Purchase Amount (USD)', selections)
+
+        def build_rating_purchase():
+            return rating_purchase.figure(
+                title='Relation entre Notes et Montant d\'Achat',
+                x='Review Rating',
+                y='Purchase Amount (USD)'
+            )
+
+        st.plotly_chart(
+            cached_figure('app/fig_rating_purchase', selections, build_rating_purchase),
+            use_container_width=True
         )
-        st.plotly_chart(fig_rating_purchase, use_container_width=True)
+        st.caption(rating_purchase.fit.describe())
 
     # Analyse des achats précédents
-    fig_previous = px.histogram(
-        df_filtered,
-        x='Previous Purchases',
-        title='Distribution du Nombre d\'Achats Précédents',
-        nbins=30
+    def build_previous():
+        return get_histogram('Previous Purchases', selections, nbins=30).figure(
+            title='Distribution du Nombre d\'Achats Précédents',
+            x='Previous Purchases'
+        )
+
+    st.plotly_chart(
+        cached_figure('app/fig_previous', selections, build_previous),
+        use_container_width=True
     )
-    st.plotly_chart(fig_previous, use_container_width=True)
 
-elif selected_tab == "💳 Paiement & Livraison":
+
+@section("💳 Paiement & Livraison", ALL_FILTERS)
+def payment_tab(selections):
+    kpis = get_kpis(selections)
+
+    # Agrégats de la section, calculés ensemble avant les graphiques
+    aggregates = get_aggregates([
+        'sales_by_payment_method',
+        'sales_by_shipping_type',
+        'avg_basket_by_shipping_type',
+        'payment_preference_matrix'
+    ], selections)
+
     st.header("Analyse des Moyens de Paiement et Livraison")
     
     col1, col2 = st.columns(2)
     with col1:
-        most_used_payment = df_filtered['Payment Method'].mode().iloc[0] if not df_filtered.empty else "Aucune donnée"
+        most_used_payment = kpis.top_payment_method or "Aucune donnée"
         st.metric("Moyen de Paiement le Plus Utilisé", most_used_payment)
     with col2:
-        most_used_shipping = df_filtered['Shipping Type'].mode().iloc[0] if not df_filtered.empty else "Aucune donnée"
+        most_used_shipping = kpis.top_shipping_type or "Aucune donnée"
         st.metric("Mode de Livraison le Plus Populaire", most_used_shipping)
 
     col1, col2 = st.columns(2)
     
     with col1:
         # Répartition des méthodes de paiement
-        fig_payment = px.pie(
-            df_filtered,
-            names='Payment Method',
-            title='Répartition des Méthodes de Paiement',
-            hole=0.3
+        def build_payment():
+            return px.pie(
+                aggregates['sales_by_payment_method'],
+                values='count',
+                names='Payment Method',
+                title='Répartition des Méthodes de Paiement',
+                hole=0.3
+            )
+
+        st.plotly_chart(
+            cached_figure('app/fig_payment', selections, build_payment),
+            use_container_width=True
         )
-        st.plotly_chart(fig_payment, use_container_width=True)
 
     with col2:
         # Répartition des types de livraison
-        fig_shipping = px.pie(
-            df_filtered,
-            names='Shipping Type',
-            title='Répartition des Types de Livraison',
-            hole=0.3
+        def build_shipping():
+            return px.pie(
+                aggregates['sales_by_shipping_type'],
+                values='count',
+                names='Shipping Type',
+                title='Répartition des Types de Livraison',
+                hole=0.3
+            )
+
+        st.plotly_chart(
+            cached_figure('app/fig_shipping', selections, build_shipping),
+            use_container_width=True
         )
-        st.plotly_chart(fig_shipping, use_container_width=True)
 
     # Relation entre type de livraison et montant d'achat
-    shipping_amount = df_filtered.groupby('Shipping Type')['Purchase Amount (USD)'].mean().reset_index()
-    fig_shipping_amount = px.bar(
-        shipping_amount,
-        x='Shipping Type',
-        y='Purchase Amount (USD)',
-        title='Montant Moyen d\'Achat par Type de Livraison',
-        color='Shipping Type'
+    def build_shipping_amount():
+        shipping_amount = aggregates['avg_basket_by_shipping_type']
+        fig_shipping_amount = px.bar(
+            shipping_amount,
+            x='Shipping Type',
+            y='Purchase Amount (USD)',
+            title='Montant Moyen d\'Achat par Type de Livraison',
+            color='Shipping Type'
+        )
+        return fig_shipping_amount
+
+    st.plotly_chart(
+        cached_figure('app/fig_shipping_amount', selections, build_shipping_amount),
+        use_container_width=True
     )
-    st.plotly_chart(fig_shipping_amount, use_container_width=True)
 
     # Préférences de paiement vs méthode utilisée
-    payment_comparison = pd.crosstab(
-        df_filtered['Payment Method'],
-        df_filtered['Preferred Payment Method']
-    )
-    fig_payment_comparison = px.imshow(
-        payment_comparison,
-        title='Méthode de Paiement Utilisée vs. Préférée',
-        labels=dict(x='Méthode Préférée', y='Méthode Utilisée', color='Nombre de Transactions')
+    payment_comparison = aggregates['payment_preference_matrix']
+
+    def build_payment_comparison():
+        fig_payment_comparison = payment_comparison.figure(
+            title='Méthode de Paiement Utilisée vs. Préférée',
+            labels=dict(x='Méthode Préférée', y='Méthode Utilisée', color='Nombre de Transactions')
+        )
+        return fig_payment_comparison
+
+    st.plotly_chart(
+        cached_figure('app/fig_payment_comparison', selections, build_payment_comparison),
+        use_container_width=True
     )
-    st.plotly_chart(fig_payment_comparison, use_container_width=True)
\ No newline at end of file
+    st.caption(payment_comparison.describe())
+
+
+# Seule la section de l'onglet sélectionné est exécutée
+TABS = {
+    "👥 Analyse Client": client_tab,
+    "📦 Analyse Produit": product_tab,
+    "💰 Analyse Financière": financial_tab,
+    "🎯 Comportement Client": behavior_tab,
+    "💳 Paiement & Livraison": payment_tab
+}
+TABS[selected_tab](selections)
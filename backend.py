@@ -0,0 +1,376 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data import (
+    DATA_PATH, QUERY_BACKEND, SCHEMA, SOURCE_ROW, data_cache, dataset_version, ensure_snapshot, load_aggregates,
+    load_partitions, select_partitions
+)
+from filters import RANGE_FILTERS
+
+try:
+    import duckdb
+except ImportError:  # dépendance optionnelle, requise seulement par le moteur DuckDB
+    duckdb = None
+
+try:
+    import polars as pl
+except ImportError:  # dépendance optionnelle, requise seulement par le moteur Polars
+    pl = None
+
+# Moteurs de requêtes disponibles et paquet optionnel requis par chacun
+BACKENDS = {'pandas': None, 'duckdb': duckdb, 'polars': pl, 'aggregates': None}
+
+if QUERY_BACKEND not in BACKENDS:
+    raise ValueError(f"Moteur de requêtes inconnu : {QUERY_BACKEND} (attendu : {', '.join(BACKENDS)})")
+if QUERY_BACKEND in ('duckdb', 'polars') and BACKENDS[QUERY_BACKEND] is None:
+    raise ImportError(f"Le moteur {QUERY_BACKEND} nécessite le paquet {QUERY_BACKEND} : pip install {QUERY_BACKEND}")
+
+# Types SQL imposés à la lecture d'un CSV : les colonnes textuelles restent du
+# texte (Yes/No n'est pas converti en booléen) et les notes sont en float32
+# comme avec pandas ; les colonnes entières sont inférées en types larges,
+# comme data.READ_SCHEMA, pour ne tronquer aucune valeur
+_SQL_TYPES = {'float32': 'FLOAT', 'category': 'VARCHAR'}
+_POLARS_TYPES = {'float32': 'Float32'}
+
+
+# Type des bornes d'un filtre d'intervalle, converties comme le fait
+# FilterIndex : float32 pour les notes, int64 pour les entiers (la colonne a
+# pu garder un type plus large que celui de SCHEMA, voir data.narrow)
+def _bound_type(column):
+    dtype = SCHEMA[column]
+    return dtype if dtype in _POLARS_TYPES else 'int64'
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+class DuckDBQueries:
+    """
+    Requêtes SQL DuckDB sur l'instantané Parquet.
+
+    DuckDB ne lit que les colonnes citées (projection) et évalue les filtres
+    pendant la lecture, en sautant les groupes de lignes exclus par leurs
+    statistiques min/max (prédicats poussés).
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _cursor(self):
+        with self._lock:
+            if self._connection is None:
+                self._connection = duckdb.connect()
+        # Un curseur par requête : la connexion n'est pas partagée entre threads
+        return self._connection.cursor()
+
+    # Lecture d'un fichier Parquet ou CSV, avec le numéro de ligne dans le fichier
+    @staticmethod
+    def _reader(file, parquet):
+        if parquet:
+            return 'read_parquet(?, file_row_number = true)', [file]
+        types = {column: _SQL_TYPES[dtype] for column, dtype in SCHEMA.items() if dtype in _SQL_TYPES}
+        return (
+            '(SELECT *, row_number() OVER () - 1 AS file_row_number FROM read_csv(?, header = true, types = ?))',
+            [file, types]
+        )
+
+    # Table source : l'instantané Parquet, ou le CSV s'il n'a pas pu être
+    # écrit ; pour un répertoire de partitions, les seules partitions retenues
+    # par les filtres actifs, numérotées comme dans le jeu complet (numéro de
+    # ligne dans le CSV d'origine, data.SOURCE_ROW)
+    @classmethod
+    def _source(cls, path, active=()):
+        partitions = select_partitions(path, active)
+        if partitions is None:
+            snapshot = ensure_snapshot(path)
+            return cls._reader(path if snapshot is None else snapshot, snapshot is not None)
+        manifest = load_partitions(path)
+        reads, params = [], []
+        for i in partitions or [0]:
+            partition = manifest['partitions'][i]
+            reader, reader_params = cls._reader(os.path.join(path, partition['file']), manifest['format'] == 'parquet')
+            row = _quote(SOURCE_ROW) if manifest.get('source_rows') else f"file_row_number + {partition['start']}"
+            reads.append(
+                f"SELECT * REPLACE ({row} AS file_row_number) FROM {reader}"
+                + ('' if partitions else ' WHERE FALSE')
+            )
+            params.extend(reader_params)
+        return '(' + ' UNION ALL '.join(reads) + ')', params
+
+    # Filtres actifs traduits en clause WHERE paramétrée : IN pour les listes
+    # de valeurs, BETWEEN inclusif pour les intervalles
+    @staticmethod
+    def _where(active):
+        clauses, params = [], []
+        for column, values in active:
+            if column in RANGE_FILTERS:
+                sql_type = {'int64': 'BIGINT', **_SQL_TYPES}[_bound_type(column)]
+                clauses.append(f'{_quote(column)} BETWEEN CAST(? AS {sql_type}) AND CAST(? AS {sql_type})')
+                params.extend(values)
+            elif values:
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append('FALSE')
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def _query(self, select, active, path, suffix=''):
+        source, source_params = self._source(path, active)
+        where, params = self._where(active)
+        return self._cursor().execute(
+            f'SELECT {select} FROM {source}{where}{suffix}', [*source_params, *params]
+        )
+
+    def categories(self, column, path):
+        result = self._query(
+            f'DISTINCT {_quote(column)} AS value', (), path,
+            f' WHERE {_quote(column)} IS NOT NULL ORDER BY value'
+        ).fetchnumpy()
+        return list(result['value'])
+
+    def cells(self, dimensions, measures, active, path):
+        columns = [_quote(d) for d in dimensions] + ['count(*) AS "count"']
+        for measure in measures:
+            value = f'CAST({_quote(measure)} AS DOUBLE)'
+            columns += [
+                f'sum({value}) AS {_quote(f"sum({measure})")}',
+                f'sum({value} * {value}) AS {_quote(f"sumsq({measure})")}',
+                f'min({value}) AS {_quote(f"min({measure})")}',
+                f'max({value}) AS {_quote(f"max({measure})")}',
+            ]
+        group_by = f" GROUP BY {', '.join(_quote(d) for d in dimensions)}" if dimensions else ''
+        return self._query(', '.join(columns), active, path, group_by).df()
+
+    def distinct(self, column, active, path):
+        return int(self._query(f'count(DISTINCT {_quote(column)})', active, path).fetchone()[0])
+
+    def distinct_by(self, column, by, active, path):
+        result = self._query(
+            f'{_quote(by)} AS grp, count(DISTINCT {_quote(column)}) AS n', active, path, ' GROUP BY grp'
+        ).fetchnumpy()
+        return result['grp'], result['n']
+
+    def value_counts(self, column, by, active, path):
+        if by is None:
+            result = self._query(
+                f'{_quote(column)} AS value, count(*) AS n', active, path, ' GROUP BY value'
+            ).fetchnumpy()
+            return result['value'], None, result['n']
+        source, source_params = self._source(path, active)
+        where, params = self._where(active)
+        result = self._cursor().execute(
+            f'SELECT value, grp, n FROM ('
+            f'SELECT {_quote(column)} AS value, {_quote(by)} AS grp, count(*) AS n, '
+            f'min(file_row_number) AS first FROM {source}{where} GROUP BY value, grp) '
+            f'ORDER BY min(first) OVER (PARTITION BY grp), grp, value',
+            [*source_params, *params]
+        ).fetchnumpy()
+        return result['value'], pd.Series(result['grp'], dtype='category'), result['n']
+
+
+class PolarsQueries:
+    """
+    Requêtes sur des LazyFrame Polars lues depuis l'instantané Parquet.
+
+    Le plan (projection, filtre, group_by) est optimisé puis exécuté sur tous
+    les cœurs ; seul le résultat agrégé, de quelques milliers de lignes au
+    plus, est converti en pandas.
+    """
+
+    # Lecture de fichiers Parquet ou CSV mis bout à bout, numérotés en continu
+    @staticmethod
+    def _scan(files, parquet):
+        if parquet:
+            return pl.scan_parquet(files, row_index_name='file_row_number')
+        return pl.scan_csv(
+            files, row_index_name='file_row_number',
+            schema_overrides={c: getattr(pl, _POLARS_TYPES[t]) for c, t in SCHEMA.items() if t in _POLARS_TYPES}
+        )
+
+    # Table source : l'instantané Parquet, ou le CSV s'il n'a pas pu être
+    # écrit ; pour un répertoire de partitions, les seules partitions retenues
+    # par les filtres actifs, numérotées par leur ligne dans le CSV d'origine
+    # (data.SOURCE_ROW)
+    @classmethod
+    def _source(cls, path, active=()):
+        partitions = select_partitions(path, active)
+        if partitions is None:
+            snapshot = ensure_snapshot(path)
+            return cls._scan(path if snapshot is None else snapshot, snapshot is not None)
+        manifest = load_partitions(path)
+        files = [os.path.join(path, manifest['partitions'][i]['file']) for i in partitions or [0]]
+        frame = cls._scan(files, manifest['format'] == 'parquet')
+        if manifest.get('source_rows'):
+            frame = frame.with_columns(pl.col(SOURCE_ROW).alias('file_row_number'))
+        return frame if partitions else frame.head(0)
+
+    # Filtres actifs traduits en une expression : is_in pour les listes de
+    # valeurs, is_between inclusif pour les intervalles (bornes converties au
+    # type de la colonne, float32 pour les notes)
+    def _filtered(self, active, path):
+        frame = self._source(path, active)
+        for column, values in active:
+            if column in RANGE_FILTERS:
+                dtype = getattr(pl, {'int64': 'Int64', **_POLARS_TYPES}[_bound_type(column)])
+                low, high = (pl.lit(v.item(), dtype=dtype) for v in np.asarray(values, dtype=_bound_type(column)))
+                frame = frame.filter(pl.col(column).is_between(low, high))
+            else:
+                frame = frame.filter(pl.col(column).is_in(list(values)))
+        return frame
+
+    def categories(self, column, path):
+        values = self._source(path).select(
+            pl.col(column).cast(pl.String).drop_nulls().unique().sort()
+        ).collect()
+        return values[column].to_list()
+
+    def cells(self, dimensions, measures, active, path):
+        aggregations = [pl.len().cast(pl.Int64).alias('count')]
+        for measure in measures:
+            value = pl.col(measure).cast(pl.Float64)
+            aggregations += [
+                value.sum().alias(f'sum({measure})'),
+                (value * value).sum().alias(f'sumsq({measure})'),
+                value.min().alias(f'min({measure})'),
+                value.max().alias(f'max({measure})'),
+            ]
+        frame = self._filtered(active, path)
+        if dimensions:
+            # Regroupement sur les codes des catégories, convertis en texte
+            # seulement dans le résultat agrégé
+            frame = frame.group_by(dimensions).agg(aggregations).with_columns(pl.col(dimensions).cast(pl.String))
+        else:
+            frame = frame.select(aggregations)
+        return frame.collect().to_pandas()
+
+    def distinct(self, column, active, path):
+        return int(self._filtered(active, path).select(pl.col(column).drop_nulls().n_unique()).collect().item())
+
+    def distinct_by(self, column, by, active, path):
+        result = (
+            self._filtered(active, path).group_by(pl.col(by).cast(pl.String).alias('grp'))
+            .agg(pl.col(column).drop_nulls().n_unique().alias('n'))
+            .collect()
+        )
+        return result['grp'].to_numpy(), result['n'].to_numpy()
+
+    def value_counts(self, column, by, active, path):
+        frame = self._filtered(active, path)
+        if by is None:
+            result = frame.group_by(pl.col(column).alias('value')).agg(pl.len().alias('n')).collect()
+            return result['value'].to_numpy(), None, result['n'].to_numpy()
+        result = (
+            frame.group_by(pl.col(column).alias('value'), pl.col(by).alias('grp'))
+            .agg(pl.len().alias('n'), pl.col('file_row_number').min().alias('first'))
+            .with_columns(pl.col('first').min().over('grp'), pl.col('grp').cast(pl.String))
+            .sort('first', 'grp', 'value')
+            .collect()
+        )
+        return result['value'].to_numpy(), pd.Series(result['grp'].to_numpy(), dtype='category'), result['n'].to_numpy()
+
+
+class AggregateQueries:
+    """
+    Requêtes servies par les agrégats produits par ingest.py, sans aucune
+    lecture des lignes : chaque requête est une réduction des cellules de la
+    plus petite vue agrégée qui la couvre (ingest.AggregateState).
+
+    Seuls les filtres sur les dimensions du cube sont disponibles
+    (ingest.STATE_FILTERS).
+    """
+
+    def categories(self, column, path):
+        return load_aggregates(path).categories(column)
+
+    def cells(self, dimensions, measures, active, path):
+        return load_aggregates(path).cells(dimensions, measures, active)
+
+    def distinct(self, column, active, path):
+        return load_aggregates(path).distinct(column, active)
+
+    def distinct_by(self, column, by, active, path):
+        return load_aggregates(path).distinct_by(column, by, active)
+
+    def value_counts(self, column, by, active, path):
+        return load_aggregates(path).value_counts(column, by, active)
+
+
+# Requêtes de chaque moteur : les agrégats sont toujours disponibles, les
+# moteurs optionnels s'ils sont installés
+ENGINES = {'aggregates': AggregateQueries()}
+if duckdb is not None:
+    ENGINES['duckdb'] = DuckDBQueries()
+if pl is not None:
+    ENGINES['polars'] = PolarsQueries()
+
+
+@data_cache
+@st.cache_resource
+def _load_categories(path, column, version):
+    return ENGINES[QUERY_BACKEND].categories(column, path)
+
+
+def load_categories(column, path=DATA_PATH):
+    """
+    Modalités d'une colonne textuelle, triées comme les catégories pandas,
+    lues une fois par version du jeu de données.
+    """
+    return _load_categories(path, column, dataset_version(path))
+
+
+def query_cells(dimensions, measures, active, path=DATA_PATH):
+    """
+    Agrège les lignes filtrées par combinaison de `dimensions` en une seule
+    requête (GROUP BY DuckDB ou group_by Polars) sur l'instantané : seules les
+    colonnes citées sont lues et aucune ligne n'est chargée côté pandas. Le
+    moteur 'aggregates' réduit les cellules des agrégats d'ingest.py.
+
+    Args:
+        dimensions (list[str]): Dimensions de regroupement
+        measures (list[str]): Mesures agrégées
+        active (tuple): Filtres actifs, tels que retournés par FilterIndex.normalize
+
+    Returns:
+        pandas.DataFrame: Une ligne par combinaison observée, avec les
+        dimensions, 'count' et, pour chaque mesure m, 'sum(m)', 'sumsq(m)',
+        'min(m)' et 'max(m)'
+    """
+    return ENGINES[QUERY_BACKEND].cells(dimensions, measures, active, path)
+
+
+def query_distinct(column, active, path=DATA_PATH):
+    """
+    Nombre de valeurs distinctes de `column` parmi les lignes filtrées.
+    """
+    return ENGINES[QUERY_BACKEND].distinct(column, active, path)
+
+
+def query_distinct_by(column, by, active, path=DATA_PATH):
+    """
+    Nombre de valeurs distinctes de `column` par modalité de `by` parmi les
+    lignes filtrées.
+
+    Returns:
+        tuple: (modalités, nombres de valeurs distinctes)
+    """
+    return ENGINES[QUERY_BACKEND].distinct_by(column, by, active, path)
+
+
+def query_value_counts(column, by, active, path=DATA_PATH):
+    """
+    Effectif de chaque valeur de `column` (et de chaque modalité de `by`)
+    parmi les lignes filtrées, de quoi construire un Histogram pondéré.
+
+    Les lignes sont rangées par première apparition de la modalité de `by`
+    dans le fichier, pour que la légende suive le même ordre qu'avec pandas.
+
+    Returns:
+        tuple: (valeurs, modalités ou None, effectifs)
+    """
+    return ENGINES[QUERY_BACKEND].value_counts(column, by, active, path)
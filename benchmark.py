@@ -0,0 +1,609 @@
+"""
+Mesures de performance du chargement, du filtrage et de l'agrégation des données.
+
+Usage :
+    python benchmark.py --rows 1000000
+    python benchmark.py --rows 1000000 10000000 --section filters
+    python benchmark.py --rows 1000000 --section backends
+    python benchmark.py --rows 1000000 --section append
+    python benchmark.py --rows 1000000 --section partitions
+    python benchmark.py --rows 1000000 10000000 --section zonemaps
+    python benchmark.py --rows 1000000 --section memory
+    python benchmark.py --rows 1000000 10000000 --section quantiles
+
+Un jeu de données synthétique est généré en rééchantillonnant
+shopping_trends.csv. Les mesures de chargement sont lancées chacune dans un
+processus séparé afin que le pic de mémoire (RSS max du processus, imports
+compris) de l'une ne fausse pas les autres.
+"""
+import argparse
+import json
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import backend
+import data
+import ingest
+import partition
+from aggregates import AGGREGATES
+from boxplots import BoxStats
+from contingency import ContingencyTable
+from cube import CUBE_DIMENSIONS, CUBE_MEASURES, SKETCH_DIMENSIONS, Cube
+from filters import FILTER_COLUMNS, RANGE_FILTERS, SET_FILTERS, FilterIndex
+from histograms import Histogram
+from kpis import DistinctIndex, compute_kpis
+from planner import plan
+from quantiles import QuantileSketch
+from scatter import ScatterSummary
+from sketches import DistinctSketch
+from zonemaps import ZoneMap
+
+
+# DataFrame synthétique de `rows` lignes tirées du CSV d'origine
+def make_frame(rows, seed=0):
+    df = data.read_csv()
+    rng = np.random.default_rng(seed)
+    sample = df.iloc[rng.integers(0, len(df), rows)].reset_index(drop=True)
+    sample['Customer ID'] = np.arange(1, rows + 1, dtype='int32')
+    return sample
+
+
+def make_dataset(rows, directory, seed=0):
+    path = os.path.join(directory, f'shopping_trends_{rows}.csv')
+    make_frame(rows, seed).to_csv(path, index=False)
+    return path
+
+
+# Durée médiane d'un appel, en millisecondes
+def timeit(func, repeat=5):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations)) * 1000
+
+
+def _peak_rss_mb():
+    # Sous Linux, ru_maxrss hérite du pic du processus parent (qui a généré le
+    # jeu de données) : VmHWM est propre au processus mesuré
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    # ru_maxrss est exprimé en kilo-octets sous Linux, en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Cas de chargement mesurés, chacun dans son propre processus
+CASES = {
+    'imports': lambda path: None,
+    # CSV lu sans schéma : chaînes en dtype object et entiers en int64
+    'csv_untyped': lambda path: pd.read_csv(path),
+    'csv': lambda path: data.read_csv(path),
+    'snapshot_build': lambda path: data.build_snapshot(path),
+    'snapshot': lambda path: data.read_snapshot(data.snapshot_path(path)),
+    'snapshot_3_columns': lambda path: data.read_snapshot(
+        data.snapshot_path(path), ['Category', 'Season', 'Purchase Amount (USD)']
+    ),
+    # Ingestion par blocs : le pic de mémoire dépend de la taille des blocs.
+    # Tout le fichier est relu (full), sans quoi le second cas reprendrait
+    # l'état que le premier vient d'écrire sans lire aucune ligne
+    'ingest': lambda path: ingest.ingest(path, full=True),
+    'ingest_20k_rows': lambda path: ingest.ingest(path, 20_000, full=True),
+    'aggregates': lambda path: _read_aggregates(path),
+}
+
+
+def _read_aggregates(path):
+    with open(data.aggregates_path(path), 'rb') as f:
+        return pickle.load(f)
+
+
+def _run_case(case, path):
+    start = time.perf_counter()
+    CASES[case](path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'rss_mb': _peak_rss_mb()}))
+
+
+def measure(case, path):
+    output = subprocess.run(
+        [sys.executable, __file__, '--case', case, '--data', path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def bench_load(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_dataset(rows, directory)
+        print(f'# Chargement ({rows:,} lignes)')
+        print(f"{'cas':<22}{'temps (s)':>12}{'RSS max (Mo)':>14}")
+        for case in CASES:
+            result = measure(case, path)
+            print(f"{case:<22}{result['seconds']:>12.3f}{result['rss_mb']:>14.1f}")
+
+
+def bench_append(rows):
+    # Ajouts successifs de 0,1 %, 1 % et 10 % de lignes à un fichier déjà ingéré
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_dataset(rows, directory)
+        start = time.perf_counter()
+        ingest.ingest(path)
+        full_s = time.perf_counter() - start
+        print(f'# Ingestion incrémentale ({rows:,} lignes ; ingestion complète : {full_s:.2f} s)')
+        print(f"{'lignes ajoutées':<18}{'ajout (s)':>12}{'relecture complète (s)':>24}")
+        total = rows
+        for seed, share in enumerate((0.001, 0.01, 0.1), start=1):
+            added = max(1, int(rows * share))
+            # Nouveaux clients, à la suite des identifiants existants
+            frame = make_frame(added, seed)
+            frame['Customer ID'] += total
+            frame.to_csv(path, mode='a', header=False, index=False)
+            total += added
+            start = time.perf_counter()
+            ingest.ingest(path)
+            append_s = time.perf_counter() - start
+            start = time.perf_counter()
+            ingest.ingest(path, full=True)
+            print(f'{added:<18,}{append_s:>12.3f}{time.perf_counter() - start:>24.2f}')
+
+
+def bench_partitions(rows):
+    # Lecture (sans cache) des colonnes d'un graphique pour une sélection :
+    # instantané unique filtré après lecture, ou seules partitions retenues
+    columns = ['Age', 'Purchase Amount (USD)', 'Item Purchased', 'Color']
+    scenarios = {
+        'toutes': {},
+        'hiver': {'Season': ('Winter',)},
+        'hiver + vêtements': {'Category': ('Clothing',), 'Season': ('Winter',)},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_dataset(rows, directory)
+        snapshot = data.build_snapshot(path)
+        parts = os.path.join(directory, 'parts')
+        partition.write_partitions(path, parts)
+        manifest = data.read_partitions(parts)
+
+        def single_file(selections):
+            df = data.read_snapshot(snapshot, [*columns, *selections])
+            mask = np.ones(len(df), dtype=bool)
+            for column, values in selections.items():
+                mask &= df[column].isin(values).to_numpy()
+            return df[mask]
+
+        def partitioned(selections):
+            return pd.concat([
+                pd.concat([data.read_partition(parts, manifest, i, column) for column in columns], axis=1)
+                for i in data.select_partitions(parts, tuple(sorted(selections.items())))
+            ], ignore_index=True)
+
+        print(f"# Partitions ({rows:,} lignes, {len(manifest['partitions'])} partitions saison x catégorie)")
+        print(f"{'sélection':<22}{'lignes':>12}{'fichier unique (ms)':>22}{'partitions (ms)':>18}")
+        for name, selections in scenarios.items():
+            print(
+                f'{name:<22}{len(partitioned(selections)):>12,}'
+                f'{timeit(lambda: single_file(selections)):>22.1f}'
+                f'{timeit(lambda: partitioned(selections)):>18.1f}'
+            )
+
+
+def bench_memory(rows):
+    # Octets par ligne de chaque colonne : CSV lu sans schéma (chaînes Python,
+    # entiers 64 bits) puis avec data.SCHEMA (catégories, entiers réduits)
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_dataset(rows, directory)
+        before = data.memory_per_row(pd.read_csv(path))
+        typed = data.read_csv(path)
+        after = data.memory_per_row(typed)
+    # Colonnes Oui/Non : le bitmap 'Yes' de FilterIndex suffit à les coder
+    flags = ['Subscription Status', 'Discount Applied', 'Promo Code Used']
+    index = FilterIndex(typed, flags)
+    bitmaps = sum(len(index.bitmaps[column]['Yes']) for column in flags) / rows
+
+    print(f'# Mémoire ({rows:,} lignes)')
+    print(f"{'colonne':<28}{'avant (o/ligne)':>17}{'après (o/ligne)':>17}{'type':>10}")
+    for column in before.index:
+        print(f'{column:<28}{before[column]:>17.2f}{after[column]:>17.2f}{str(typed[column].dtype):>10}')
+    print(f"{'total':<28}{before.sum():>17.2f}{after.sum():>17.2f}")
+    print(f'{rows * (before.sum() - after.sum()) / 1024 ** 2:,.0f} Mo économisés ; colonnes Oui/Non : '
+          f'{after[flags].sum():.2f} o/ligne en catégories, {bitmaps:.3f} en bitmaps (FilterIndex)')
+
+
+def bench_zonemaps(rows):
+    # Histogrammes sous filtres d'intervalle : lignes sélectionnées par l'index
+    # puis comptées, ou zones lues dans les statistiques et zones à cheval
+    # parcourues ; sur le fichier tel quel, puis regroupé par âge
+    scenarios = {
+        'sans filtre': ('Age', {}),
+        'âge 25-34 (âge)': ('Age', {'Age': (25, 34)}),
+        'âge 25-34 (montant)': ('Purchase Amount (USD)', {'Age': (25, 34)}),
+        'âge + note (montant)': ('Purchase Amount (USD)', {'Age': (25, 34), 'Review Rating': (3.0, 4.5)}),
+    }
+    frame = make_frame(rows)
+    for layout, df in [('fichier tel quel', frame), ('regroupé par âge', frame.sort_values('Age', kind='stable'))]:
+        df = df.reset_index(drop=True)
+        index = FilterIndex(df, [], RANGE_FILTERS)
+        zone_map = ZoneMap.from_frame(df)
+
+        def from_zones(column, ranges):
+            values, counts, partial, _ = zone_map.value_counts(column, ranges)
+            counts += zone_map.scan(column, ranges, partial, df)
+            observed = counts > 0
+            return Histogram(values[observed], 30, None, counts[observed]), zone_map.size(partial)
+
+        print(f'# Zones ({rows:,} lignes, {zone_map.n_zones} zones, {layout})')
+        print(f"{'scénario':<24}{'index (ms)':>12}{'zones (ms)':>12}{'lignes parcourues':>20}")
+        for name, (column, ranges) in scenarios.items():
+            scanned = from_zones(column, ranges)[1]
+            print(
+                f'{name:<24}'
+                f'{timeit(lambda: Histogram(index.select(ranges).apply(df)[column], 30)):>12.2f}'
+                f'{timeit(lambda: from_zones(column, ranges)):>12.2f}'
+                f'{scanned:>20,}'
+            )
+
+
+def bench_filters(rows):
+    df = make_frame(rows)
+    columns = [*FILTER_COLUMNS, *SET_FILTERS]
+    start = time.perf_counter()
+    index = FilterIndex(df, columns, RANGE_FILTERS)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    scenarios = {
+        'catégorie + saison': {
+            'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer']
+        },
+        'âge + note': {'Age': (25, 34), 'Review Rating': (3.5, 5.0)},
+        '6 dimensions': {
+            'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer'],
+            'Location': ['California', 'Texas', 'New York'], 'Gender': ['Female'],
+            'Age': (25, 54), 'Review Rating': (3.0, 4.5)
+        },
+    }
+
+    def pandas_filter(selections):
+        mask = np.ones(len(df), dtype=bool)
+        for column, values in selections.items():
+            if column in RANGE_FILTERS:
+                mask &= df[column].between(*values).to_numpy()
+            else:
+                mask &= df[column].isin(values).to_numpy()
+        return df[mask]
+
+    print(f'# Filtres globaux ({rows:,} lignes, index construit en {build_ms:.0f} ms)')
+    print(f"{'scénario':<22}{'pandas (ms)':>14}{'index (ms)':>14}{'index + lignes (ms)':>22}")
+    for name, selections in scenarios.items():
+        print(
+            f'{name:<22}'
+            f'{timeit(lambda: pandas_filter(selections)):>14.2f}'
+            f'{timeit(lambda: index.select(selections).mask()):>14.2f}'
+            f'{timeit(lambda: index.select(selections).apply(df)):>22.2f}'
+        )
+
+
+def bench_cube(rows):
+    df = make_frame(rows)
+    start = time.perf_counter()
+    cube = Cube(df)
+    build_ms = (time.perf_counter() - start) * 1000
+    selections = {'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer']}
+
+    def pandas_rollup():
+        filtered = df[df['Category'].isin(selections['Category']) & df['Season'].isin(selections['Season'])]
+        return filtered.groupby('Payment Method', observed=True)['Purchase Amount (USD)'].mean()
+
+    print(f'# Cube ({rows:,} lignes, {cube.count.size:,} cellules, construit en {build_ms:.0f} ms)')
+    print(f"{'cas':<36}{'temps (ms)':>12}")
+    for case, func in [
+        ('pandas filtre + groupby', pandas_rollup),
+        ('cube rollup', lambda: cube.view(selections).rollup(
+            'Payment Method', 'Purchase Amount (USD)', 'mean')),
+        ('cube crosstab catégorie x saison', lambda: cube.view(selections).crosstab('Category', 'Season')),
+    ]:
+        print(f'{case:<36}{timeit(func):>12.2f}')
+
+
+def bench_histograms(rows):
+    df = make_frame(rows)
+    print(f'# Histogrammes ({rows:,} lignes)')
+    print(f"{'cas':<28}{'temps (ms)':>12}{'JSON (Ko)':>12}")
+    for case, func in [
+        ('px.histogram âge', lambda: px.histogram(df, x='Age', nbins=30)),
+        ('serveur âge', lambda: Histogram(df['Age'], 30).figure(x='Age')),
+        ('px.histogram âge x genre', lambda: px.histogram(df, x='Age', color='Gender', barmode='group')),
+        ('serveur âge x genre', lambda: Histogram(df['Age'], groups=df['Gender']).figure(x='Age', color='Gender')),
+    ]:
+        size_kb = len(func().to_json()) / 1024
+        print(f'{case:<28}{timeit(func, repeat=3):>12.2f}{size_kb:>12.1f}')
+
+
+def bench_boxplots(rows):
+    df = make_frame(rows)
+    print(f'# Boîtes à moustaches ({rows:,} lignes)')
+    print(f"{'cas':<28}{'temps (ms)':>12}{'JSON (Ko)':>12}")
+    for case, func in [
+        ('px.box prix x catégorie', lambda: px.box(df, x='Category', y='Purchase Amount (USD)', color='Category')),
+        ('serveur prix x catégorie', lambda: BoxStats(df['Purchase Amount (USD)'], df['Category']).figure(
+            x='Category', y='Purchase Amount (USD)')),
+    ]:
+        size_kb = len(func().to_json()) / 1024
+        print(f'{case:<28}{timeit(func, repeat=3):>12.2f}{size_kb:>12.1f}')
+
+
+def bench_scatter(rows):
+    df = make_frame(rows)
+    x, y = 'Review Rating', 'Purchase Amount (USD)'
+    print(f'# Nuage note x montant ({rows:,} lignes)')
+    print(f"{'cas':<28}{'temps (ms)':>12}{'JSON (Ko)':>12}")
+    for case, func in [
+        ('px.scatter', lambda: px.scatter(df, x=x, y=y)),
+        ('serveur (MCO + rendu)', lambda: ScatterSummary(df[x], df[y]).figure(x=x, y=y)),
+    ]:
+        size_kb = len(func().to_json()) / 1024
+        print(f'{case:<28}{timeit(func, repeat=3):>12.2f}{size_kb:>12.1f}')
+
+
+def bench_kpis(rows):
+    df = make_frame(rows)
+    cube = Cube(df)
+    index = FilterIndex(df, [*FILTER_COLUMNS, *SET_FILTERS], RANGE_FILTERS)
+    customers = DistinctIndex(df['Customer ID'].to_numpy())
+    # Clients récurrents : un identifiant pour dix achats en moyenne
+    repeated_ids = np.random.default_rng(0).integers(0, max(rows // 10, 1), rows)
+    repeated = DistinctIndex(repeated_ids)
+    start = time.perf_counter()
+    sketch = DistinctSketch(df.assign(**{'Customer ID': repeated_ids}), 'Customer ID', SKETCH_DIMENSIONS)
+    sketch_ms = (time.perf_counter() - start) * 1000
+    selections = {'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer']}
+
+    def pandas_kpis():
+        filtered = index.select(selections).apply(df)
+        amount = filtered['Purchase Amount (USD)']
+        subscribed = filtered['Subscription Status'] == 'Yes'
+        return (
+            filtered['Customer ID'].nunique(), amount.mean(), amount.sum(), amount.max(),
+            filtered['Age'].mean(), filtered['Review Rating'].mean(), subscribed.mean(),
+            (filtered['Promo Code Used'] == 'No').mean(), amount[subscribed].mean(), amount[~subscribed].mean(),
+            filtered['Category'].nunique(), filtered['Category'].mode(), filtered['Payment Method'].mode(),
+            filtered['Shipping Type'].mode()
+        )
+
+    def cube_per_metric():
+        view = cube.view(selections)
+        return (
+            view.total('Purchase Amount (USD)', 'mean'), view.total('Purchase Amount (USD)', 'sum'),
+            view.total('Purchase Amount (USD)', 'max'), view.total('Age', 'mean'),
+            view.total('Review Rating', 'mean'), view.share('Subscription Status', 'Yes'),
+            view.share('Promo Code Used', 'No'),
+            view.where('Subscription Status', ['Yes']).total('Purchase Amount (USD)', 'mean'),
+            view.where('Subscription Status', ['No']).total('Purchase Amount (USD)', 'mean'),
+            view.mode('Category'), view.mode('Payment Method'), view.mode('Shipping Type')
+        )
+
+    print(f'# Indicateurs clés ({rows:,} lignes)')
+    print(f"{'cas':<36}{'temps (ms)':>12}")
+    for case, func in [
+        ('pandas filtre + 14 réductions', pandas_kpis),
+        ('cube, un appel par indicateur', cube_per_metric),
+        ('compute_kpis (un passage)', lambda: compute_kpis(cube.view(selections), 0)),
+        ('clients distincts (1 achat/client)', lambda: customers.count(index.select(selections))),
+        ('clients distincts (10 achats/client)', lambda: repeated.count(index.select(selections))),
+        ('sketches HLL (10 achats/client)', lambda: sketch.count(selections)),
+    ]:
+        print(f'{case:<36}{timeit(func):>12.2f}')
+    exact = repeated.count(index.select(selections))
+    print(f'sketches construits en {sketch_ms:.0f} ms ({sketch.registers.nbytes / 1024:,.0f} Ko) ; '
+          f'estimation {sketch.count(selections):,} pour {exact:,} clients exacts '
+          f'(écart {sketch.count(selections) / exact - 1:+.2%}, erreur type {sketch.error:.2%})')
+
+
+def bench_quantiles(rows):
+    df = make_frame(rows)
+    index = FilterIndex(df, [*FILTER_COLUMNS, *SET_FILTERS], RANGE_FILTERS)
+    column = 'Purchase Amount (USD)'
+    selections = {'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer']}
+    # Montants continus (centimes aléatoires) : plus de MAX_EXACT_VALUES valeurs,
+    # le sketch passe aux intervalles logarithmiques
+    continuous = df.assign(**{column: df[column] * np.random.default_rng(0).uniform(0.9, 1.1, rows)})
+
+    def exact_box(frame):
+        filtered = index.select(selections).apply(frame[[column, 'Category']])
+        return BoxStats(filtered[column], filtered['Category'])
+
+    def sketch_box(sketch):
+        values, groups, weights = sketch.value_counts('Category', selections)
+        return BoxStats(values, groups, weights=weights)
+
+    print(f'# Sketches de quantiles ({rows:,} lignes)')
+    print(f"{'cas':<34}{'construction (ms)':>18}{'mémoire (Ko)':>14}{'médiane (ms)':>14}{'boîtes (ms)':>13}")
+    for name, frame in [('montants entiers', df), ('montants continus', continuous)]:
+        exact_median = index.select(selections).apply(frame[[column]])[column].median()
+        print(f"{'lignes, ' + name:<34}{'':>18}{'':>14}"
+              f"{timeit(lambda: index.select(selections).apply(frame[[column]])[column].median()):>14.2f}"
+              f'{timeit(lambda: exact_box(frame), repeat=3):>13.2f}')
+        start = time.perf_counter()
+        sketch = QuantileSketch(frame, column, SKETCH_DIMENSIONS)
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"{'sketch, ' + name:<34}{build_ms:>18.0f}{sketch.nbytes / 1024:>14,.0f}"
+              f'{timeit(lambda: sketch.quantile(0.5, selections)):>14.2f}'
+              f'{timeit(lambda: sketch_box(sketch), repeat=3):>13.2f}')
+        median = sketch.quantile(0.5, selections)
+        print(f'  médiane {median:.4f} pour {exact_median:.4f} exacte '
+              f'(écart {median / exact_median - 1:+.3%}, borne {sketch.error:.0%})')
+
+    # Fusion des sketches de deux moitiés : identique au sketch de tout le fichier
+    half = rows // 2
+    merged = QuantileSketch(continuous.iloc[:half], column, SKETCH_DIMENSIONS).merge(
+        QuantileSketch(continuous.iloc[half:], column, SKETCH_DIMENSIONS, np.arange(half, rows))
+    )
+    print(f"fusion de deux moitiés : médiane {merged.quantile(0.5, selections):.4f} "
+          f"({'identique' if merged.quantile(0.5, selections) == sketch.quantile(0.5, selections) else 'différente'})")
+
+
+def bench_planner(rows):
+    df = make_frame(rows)
+    cube = Cube(df)
+    index = FilterIndex(df, [*FILTER_COLUMNS, *SET_FILTERS], RANGE_FILTERS)
+    selections = {'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer']}
+    # Agrégats des onglets Produit et Paiement de app.py
+    names = [
+        'sales_by_category', 'sales_by_item', 'size_color_matrix', 'sales_by_payment_method',
+        'sales_by_shipping_type', 'avg_basket_by_shipping_type', 'payment_preference_matrix'
+    ]
+    specs = {name: AGGREGATES[name] for name in names}
+
+    # Avant : un appel pandas (ou au cube) par graphique sur les lignes filtrées
+    def per_chart():
+        filtered = index.select(selections).apply(df)
+        for spec in specs.values():
+            if spec.on_cube:
+                spec.evaluate(cube.view(selections))
+            elif spec.output == 'crosstab':
+                pd.crosstab(filtered[spec.by[0]], filtered[spec.by[1]])
+            else:
+                data.count_values(filtered[spec.by[0]])
+
+    # Après : un lot par source, les dimensions hors cube comptées ensemble
+    def planned():
+        selection = index.select(selections)
+        for batch in plan(specs, lambda column: len(df[column].cat.categories)):
+            if batch.dimensions is None:
+                view = cube.view(selections)
+            else:
+                view = Cube(df, batch.dimensions, batch.measures, rows=selection.rows()).view()
+            for name in batch.names:
+                specs[name].evaluate(view)
+
+    print(f'# Planificateur d\'agrégats ({rows:,} lignes, {len(specs)} agrégats)')
+    print(f"{'cas':<36}{'temps (ms)':>12}")
+    for case, func in [('un calcul par graphique', per_chart), ('planificateur (un passage)', planned)]:
+        print(f'{case:<36}{timeit(func):>12.2f}')
+
+
+def bench_contingency(rows):
+    df = make_frame(rows)
+    index = FilterIndex(df, [*FILTER_COLUMNS, *SET_FILTERS], RANGE_FILTERS)
+    selection = index.select({'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer']})
+    print(f'# Tables de contingence ({rows:,} lignes)')
+    print(f"{'cas':<36}{'temps (ms)':>12}")
+    for name, a, b in [('taille x couleur', 'Size', 'Color'),
+                       ('paiement x préféré', 'Payment Method', 'Preferred Payment Method')]:
+        def crosstab():
+            filtered = selection.apply(df[[a, b]])
+            return pd.crosstab(filtered[a], filtered[b])
+
+        for case, func in [
+            ('pd.crosstab', crosstab),
+            ('bincount + χ²', lambda: ContingencyTable(
+                Cube(df, [a, b], [], rows=selection.rows()).view().crosstab(a, b))),
+        ]:
+            print(f'{f"{name}, {case}":<36}{timeit(func):>12.2f}')
+
+
+def bench_backends(rows):
+    # Les agrégats d'ingest.py ne servent que les filtres sur les dimensions du
+    # cube : leur ingestion est mesurée par la section load
+    engines = {name: engine for name, engine in backend.ENGINES.items() if name != 'aggregates'}
+    if not engines:
+        print('# Moteurs de requêtes : ni duckdb ni polars installé (pip install duckdb polars)')
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_dataset(rows, directory)
+        snapshot = data.build_snapshot(path)
+        start = time.perf_counter()
+        df = data.read_snapshot(snapshot)
+        index = FilterIndex(df, [*FILTER_COLUMNS, *SET_FILTERS], RANGE_FILTERS)
+        load_ms = (time.perf_counter() - start) * 1000
+        customers = DistinctIndex(df['Customer ID'].to_numpy())
+        categories = {d: list(df[d].cat.categories) for d in [*CUBE_DIMENSIONS, 'Size', 'Color']}
+
+        scenarios = {
+            'catégorie + saison': {'Category': ['Clothing', 'Footwear'], 'Season': ['Winter', 'Summer']},
+            'âge + note': {'Age': (25, 34), 'Review Rating': (3.5, 5.0)},
+            'état + genre': {'Location': ['California', 'Texas', 'New York'], 'Gender': ['Female']},
+        }
+
+        # Chaque cas : pandas sur les colonnes en mémoire, puis chaque moteur
+        # installé sur l'instantané
+        def cases(selections):
+            selection = index.select(selections)
+            active = index.normalize(selections)
+
+            def pandas_histogram():
+                filtered = selection.apply(df[['Age', 'Gender']])
+                return Histogram(filtered['Age'], None, filtered['Gender'])
+
+            def query_cube(engine, dimensions, measures):
+                cells = engine.cells(dimensions, measures, active, path)
+                return Cube.from_cells(cells, categories, dimensions, measures)
+
+            def query_histogram(engine):
+                values, groups, weights = engine.value_counts('Age', 'Gender', active, path)
+                return Histogram(values, None, groups, weights)
+
+            return [
+                ('cube', lambda: Cube(df, rows=selection.rows()),
+                 lambda engine: query_cube(engine, CUBE_DIMENSIONS, CUBE_MEASURES)),
+                ('taille x couleur', lambda: Cube(df, ['Size', 'Color'], [], rows=selection.rows()),
+                 lambda engine: query_cube(engine, ['Size', 'Color'], [])),
+                ('clients distincts', lambda: customers.count(selection),
+                 lambda engine: engine.distinct('Customer ID', active, path)),
+                ('histogramme âge x genre', pandas_histogram, query_histogram),
+            ]
+
+        memory_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)
+        print(f'# Moteurs de requêtes ({rows:,} lignes ; pandas : chargement + index en {load_ms:.0f} ms, '
+              f'{memory_mb:.0f} Mo en mémoire ; {", ".join(engines)} : lecture de l\'instantané à chaque requête)')
+        print(f"{'scénario':<22}{'cas':<26}{'pandas (ms)':>14}"
+              + ''.join(f"{f'{name} (ms)':>14}" for name in engines))
+        for name, selections in scenarios.items():
+            for case, pandas_func, query_func in cases(selections):
+                print(f'{name:<22}{case:<26}{timeit(pandas_func):>14.2f}' + ''.join(
+                    f'{timeit(lambda: query_func(engine)):>14.2f}' for engine in engines.values()
+                ))
+
+
+SECTIONS = {
+    'load': bench_load, 'filters': bench_filters, 'cube': bench_cube,
+    'histograms': bench_histograms, 'boxplots': bench_boxplots, 'scatter': bench_scatter,
+    'kpis': bench_kpis, 'planner': bench_planner, 'contingency': bench_contingency,
+    'backends': bench_backends, 'append': bench_append, 'partitions': bench_partitions,
+    'zonemaps': bench_zonemaps, 'memory': bench_memory, 'quantiles': bench_quantiles
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--section', choices=SECTIONS, action='append',
+                        help='section à mesurer (toutes par défaut)')
+    parser.add_argument('--case', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        _run_case(args.case, args.data)
+        return
+
+    for rows in args.rows:
+        for section in args.section or SECTIONS:
+            SECTIONS[section](rows)
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Nombre maximal de valeurs aberrantes transmises par groupe
+MAX_OUTLIERS = 200
+
+
+# Valeur de rang `index` parmi les valeurs triées, chacune répétée autant de
+# fois que son effectif (`ends` : effectifs cumulés, None si tous valent 1)
+def _value_at(sorted_values, ends, index):
+    if ends is None:
+        return sorted_values[index]
+    return sorted_values[np.searchsorted(ends, index, side='right')]
+
+
+# Quantile par interpolation linéaire, comme la méthode 'linear' de Plotly :
+# position p * n - 0.5 dans les valeurs triées de chaque groupe
+def _quantile(sorted_values, ends, starts, counts, p):
+    position = np.clip(p * counts - 0.5, 0, counts - 1)
+    low = np.floor(position).astype(np.intp)
+    high = np.ceil(position).astype(np.intp)
+    frac = position - low
+    return (_value_at(sorted_values, ends, starts + low) * (1 - frac)
+            + _value_at(sorted_values, ends, starts + high) * frac)
+
+
+# Échantillon régulier de `limit` valeurs triées (extrêmes toujours conservés)
+def _sample(values, limit, ends=None):
+    n = len(values) if ends is None else int(ends[-1]) if len(ends) else 0
+    if n <= limit:
+        return values if ends is None else np.repeat(values, np.diff(ends, prepend=0))
+    return _value_at(values, ends, np.linspace(0, n - 1, limit).round().astype(np.intp))
+
+
+class BoxStats:
+    """
+    Statistiques de boîtes à moustaches calculées côté serveur, par groupe.
+
+    Les valeurs sont triées une seule fois par (groupe, valeur) ; quartiles,
+    médiane et moustaches (valeurs extrêmes à moins de 1,5 IQR des quartiles,
+    comme Plotly) s'en déduisent par indexation. Seul un échantillon borné des
+    valeurs aberrantes est conservé, la taille de la figure ne dépend donc pas
+    du nombre de lignes.
+
+    Avec `weights`, chaque valeur compte pour son effectif : les statistiques
+    sont les mêmes que sur les lignes développées, calculées à partir d'une
+    table (valeur, groupe, effectif) sans relire les lignes (backend.py).
+
+    Args:
+        values (array-like): Valeurs numériques
+        groups (pandas.Series): Colonne catégorielle définissant les boîtes
+        max_outliers (int): Nombre maximal de valeurs aberrantes par groupe
+        weights (array-like, optional): Effectif de chaque valeur
+    """
+
+    def __init__(self, values, groups, max_outliers=MAX_OUTLIERS, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        categories = groups.cat.categories
+        codes = groups.cat.codes.to_numpy()
+        # Groupes dans l'ordre d'apparition, comme l'axe de px.box
+        order = pd.unique(codes)
+        self.groups = list(categories[order])
+        remap = np.zeros(len(categories), dtype=np.intp)
+        remap[order] = np.arange(len(order))
+        codes = remap[codes]
+
+        by_value = np.lexsort((values, codes))
+        sorted_values = values[by_value]
+        entries = np.bincount(codes, minlength=len(self.groups))
+        if weights is None:
+            ends = None
+            self.count = entries
+        else:
+            weights = np.asarray(weights, dtype=np.int64)[by_value]
+            ends = np.cumsum(weights)
+            self.count = np.bincount(codes, weights, minlength=len(self.groups)).astype(np.int64)
+        starts = np.concatenate([[0], np.cumsum(self.count)[:-1]]).astype(np.intp)
+        if len(self.groups) == 0:
+            self.q1 = self.median = self.q3 = self.lowerfence = self.upperfence = np.empty(0)
+            self.outliers = []
+            return
+
+        self.q1 = _quantile(sorted_values, ends, starts, self.count, 0.25)
+        self.median = _quantile(sorted_values, ends, starts, self.count, 0.5)
+        self.q3 = _quantile(sorted_values, ends, starts, self.count, 0.75)
+        iqr = self.q3 - self.q1
+        self.lowerfence = np.empty(len(self.groups))
+        self.upperfence = np.empty(len(self.groups))
+        self.outliers = []
+        start = 0
+        for i, count in enumerate(entries):
+            group = sorted_values[start:start + count]
+            low = np.searchsorted(group, self.q1[i] - 1.5 * iqr[i], side='left')
+            high = np.searchsorted(group, self.q3[i] + 1.5 * iqr[i], side='right')
+            self.lowerfence[i] = group[low]
+            self.upperfence[i] = group[high - 1]
+            if ends is None:
+                below, above = None, None
+            else:
+                group_ends = ends[start:start + count] - (ends[start - 1] if start else 0)
+                below = group_ends[:low]
+                above = group_ends[high:] - (group_ends[high - 1] if high else 0)
+            self.outliers.append(np.concatenate([
+                _sample(group[:low], max_outliers // 2, below),
+                _sample(group[high:], max_outliers - max_outliers // 2, above)
+            ]))
+            start += count
+
+    @property
+    def nbytes(self):
+        return 6 * self.count.nbytes + sum(o.nbytes for o in self.outliers)
+
+    def figure(self, title=None, labels=None, x=None, y=None, color_discrete_sequence=None):
+        """
+        Construit une figure équivalente à px.box(df, x=x, y=y, color=x).
+
+        Args:
+            title (str, optional): Titre du graphique
+            labels (dict, optional): Libellés des axes, comme pour Plotly Express
+            x (str, optional): Nom de la colonne des groupes (axe X)
+            y (str, optional): Nom de la colonne des valeurs (axe Y)
+            color_discrete_sequence (list[str], optional): Couleurs des boîtes
+
+        Returns:
+            plotly.graph_objects.Figure: Le graphique créé
+        """
+        labels = labels or {}
+        fig = go.Figure()
+        for i, group in enumerate(self.groups):
+            marker = {}
+            if color_discrete_sequence:
+                marker['color'] = color_discrete_sequence[i % len(color_discrete_sequence)]
+            fig.add_trace(go.Box(
+                x=[group],
+                q1=[self.q1[i]],
+                median=[self.median[i]],
+                q3=[self.q3[i]],
+                lowerfence=[self.lowerfence[i]],
+                upperfence=[self.upperfence[i]],
+                name=str(group),
+                legendgroup=str(group),
+                marker=marker,
+                boxpoints=False
+            ))
+            if len(self.outliers[i]):
+                fig.add_trace(go.Scatter(
+                    x=[group] * len(self.outliers[i]),
+                    y=self.outliers[i],
+                    mode='markers',
+                    name=str(group),
+                    legendgroup=str(group),
+                    marker=marker,
+                    showlegend=False
+                ))
+        fig.update_layout(
+            title=title,
+            xaxis_title=labels.get(x, x),
+            yaxis_title=labels.get(y, y)
+        )
+        return fig
@@ -0,0 +1,113 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from scipy import stats
+
+# Seuil de significativité du test d'indépendance et des cellules
+SIGNIFICANCE_LEVEL = 0.05
+
+# Couleur des marqueurs de cellules significatives
+HIGHLIGHT_COLOR = '#FB8C00'
+
+
+class ContingencyTable:
+    """
+    Table de contingence de deux dimensions et test d'indépendance du χ².
+
+    Les effectifs sont fournis déjà comptés (tranche du cube ou np.bincount sur
+    les codes combinés des deux colonnes, voir planner.py) ; le test ne relit
+    donc aucune ligne. Les effectifs attendus sous indépendance, la statistique
+    du χ² et sa p-valeur sont calculés par scipy.stats.chi2_contingency ; chaque
+    cellule reçoit en plus son résidu standardisé ajusté, qui suit une loi
+    normale centrée réduite sous indépendance. Une cellule est significative
+    quand |résidu| dépasse le quantile 1 - alpha / (2 x nombre de cellules)
+    (correction de Bonferroni : sans elle, une grande table aurait toujours
+    quelques cellules « significatives » par hasard).
+
+    Args:
+        counts (pandas.DataFrame): Effectifs observés (lignes et colonnes non vides)
+        alpha (float): Seuil de significativité
+
+    Attributes:
+        counts (pandas.DataFrame): Effectifs observés, comme pd.crosstab
+        chi2, p_value (float): Statistique du test et p-valeur (NaN si la table
+            a moins de deux lignes ou deux colonnes)
+        dof (int): Degrés de liberté
+        residuals (numpy.ndarray): Résidus standardisés ajustés par cellule
+        significant (numpy.ndarray): Cellules dont le résidu est significatif
+    """
+
+    def __init__(self, counts, alpha=SIGNIFICANCE_LEVEL):
+        self.counts = counts
+        self.alpha = alpha
+        observed = counts.to_numpy(dtype=np.float64)
+        self.chi2 = self.p_value = float('nan')
+        self.dof = 0
+        self.residuals = np.zeros(observed.shape)
+        self.significant = np.zeros(observed.shape, dtype=bool)
+        if min(observed.shape) < 2:
+            return
+
+        result = stats.chi2_contingency(observed, correction=False)
+        self.chi2 = float(result.statistic)
+        self.p_value = float(result.pvalue)
+        self.dof = int(result.dof)
+        n = observed.sum()
+        row_share = observed.sum(axis=1, keepdims=True) / n
+        col_share = observed.sum(axis=0, keepdims=True) / n
+        expected = result.expected_freq
+        self.residuals = (observed - expected) / np.sqrt(expected * (1 - row_share) * (1 - col_share))
+        threshold = stats.norm.ppf(1 - alpha / (2 * observed.size))
+        self.significant = np.abs(self.residuals) > threshold
+
+    @property
+    def nbytes(self):
+        return int(self.counts.memory_usage(deep=True).sum()) + self.residuals.nbytes + self.significant.nbytes
+
+    def describe(self):
+        if np.isnan(self.chi2):
+            return "Test d'indépendance indisponible (moins de deux modalités)"
+        verdict = "dépendance significative" if self.p_value < self.alpha else "pas de dépendance significative"
+        return (
+            f"χ² = {self.chi2:.1f} ({self.dof} ddl), p = {self.p_value:.3g} : {verdict} "
+            f"au seuil de {self.alpha * 100:g} % — ▲/▼ : cellules plus/moins fréquentes "
+            f"qu'attendu ({self.significant.sum()} sur {self.significant.size})"
+        )
+
+    def figure(self, title=None, labels=None, color_continuous_scale=None):
+        """
+        Construit la heatmap des effectifs (px.imshow) et marque d'un triangle
+        les cellules significatives : ▲ sur-représentée, ▼ sous-représentée.
+
+        Args:
+            title (str, optional): Titre du graphique
+            labels (dict, optional): Libellés x, y et color, comme pour px.imshow
+            color_continuous_scale (list[str], optional): Échelle de couleurs
+
+        Returns:
+            plotly.graph_objects.Figure: Le graphique créé
+        """
+        fig = px.imshow(
+            self.counts,
+            title=title,
+            labels=labels or {},
+            color_continuous_scale=color_continuous_scale
+        )
+        rows, cols = np.nonzero(self.significant)
+        if len(rows):
+            residuals = self.residuals[rows, cols]
+            fig.add_trace(go.Scatter(
+                x=self.counts.columns[cols],
+                y=self.counts.index[rows],
+                mode='markers',
+                marker=dict(
+                    symbol=np.where(residuals > 0, 'triangle-up', 'triangle-down'),
+                    color=HIGHLIGHT_COLOR,
+                    size=10,
+                    line=dict(color='white', width=1)
+                ),
+                customdata=residuals,
+                hovertemplate='Résidu ajusté : %{customdata:.2f}<extra></extra>',
+                showlegend=False
+            ))
+        return fig
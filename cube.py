@@ -0,0 +1,436 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from backend import QUERY_BACKEND, load_categories, query_cells
+from data import DATA_PATH, data_cache, dataset_version, load_data, load_partitions, select_partitions
+from filters import FILTER_COLUMNS, SET_FILTERS, load_filter_index, load_selection
+
+# Dimensions à faible cardinalité du cube (toutes les combinaisons sont stockées)
+CUBE_DIMENSIONS = [
+    'Category', 'Season', 'Gender', 'Subscription Status', 'Payment Method',
+    'Shipping Type', 'Frequency of Purchases', 'Promo Code Used'
+]
+
+# Dimensions des sketches (clients distincts, quantiles) : les filtres de la
+# sidebar qui portent sur le cube (4 x 4 x 2 x 2 x 6 cellules)
+SKETCH_DIMENSIONS = [c for c in [*FILTER_COLUMNS, *SET_FILTERS] if c in CUBE_DIMENSIONS]
+
+# Mesures agrégées dans chaque cellule
+CUBE_MEASURES = ['Purchase Amount (USD)', 'Review Rating', 'Age']
+
+# Statistiques stockées par cellule et la façon de les combiner entre cellules
+_STORED = {'sum': np.sum, 'sumsq': np.sum, 'min': np.min, 'max': np.max}
+
+# Valeur d'une cellule vide et fusion de deux cubes, cellule par cellule
+_EMPTY = {'sum': 0, 'sumsq': 0, 'min': np.inf, 'max': -np.inf}
+_MERGE = {'sum': np.add, 'sumsq': np.add, 'min': np.minimum, 'max': np.maximum}
+
+
+class Cube:
+    """
+    Cube d'agrégats sur les dimensions catégorielles du jeu de données.
+
+    Pour chaque combinaison de valeurs des dimensions, le cube conserve le
+    nombre de lignes ainsi que la somme, la somme des carrés, le minimum et le
+    maximum de chaque mesure. Toutes les statistiques usuelles (moyenne,
+    écart-type, ...) s'en déduisent sans relire les lignes.
+    """
+
+    def __init__(self, df, dimensions=CUBE_DIMENSIONS, measures=CUBE_MEASURES, rows=None):
+        self.dimensions = list(dimensions)
+        self.categories = [list(df[d].cat.categories) for d in self.dimensions]
+        self.shape = tuple(len(c) for c in self.categories)
+        size = int(np.prod(self.shape))
+
+        codes = [df[d].cat.codes.to_numpy() for d in self.dimensions]
+        if rows is not None:
+            codes = [c[rows] for c in codes]
+        key = np.ravel_multi_index(codes, self.shape)
+
+        self.count = np.bincount(key, minlength=size).reshape(self.shape)
+        self.stats = {}
+        for measure in measures:
+            values = df[measure].to_numpy(dtype=np.float64)
+            if rows is not None:
+                values = values[rows]
+            minimum = np.full(size, np.inf)
+            maximum = np.full(size, -np.inf)
+            np.minimum.at(minimum, key, values)
+            np.maximum.at(maximum, key, values)
+            self.stats[measure] = {
+                'sum': np.bincount(key, values, minlength=size).reshape(self.shape),
+                'sumsq': np.bincount(key, values * values, minlength=size).reshape(self.shape),
+                'min': minimum.reshape(self.shape),
+                'max': maximum.reshape(self.shape),
+            }
+
+    @classmethod
+    def from_cells(cls, cells, categories, dimensions=CUBE_DIMENSIONS, measures=CUBE_MEASURES):
+        """
+        Construit le cube à partir de cellules déjà agrégées, une ligne par
+        combinaison observée (backend.query_cells) : les cellules absentes
+        restent vides, comme avec np.bincount.
+
+        Args:
+            cells (pandas.DataFrame): Dimensions, 'count' et, par mesure,
+                'sum(m)', 'sumsq(m)', 'min(m)' et 'max(m)'
+            categories (dict): Modalités de chaque dimension, dans l'ordre des
+                catégories pandas
+        """
+        categories = [list(categories[d]) for d in dimensions]
+        shape = tuple(len(c) for c in categories)
+        size = int(np.prod(shape))
+        codes = [pd.Categorical(cells[d], categories=c).codes for d, c in zip(dimensions, categories)]
+        key = np.ravel_multi_index(codes, shape)
+
+        def scatter(column, fill, dtype):
+            array = np.full(size, fill, dtype=dtype)
+            array[key] = cells[column].to_numpy(dtype=dtype)
+            return array.reshape(shape)
+
+        stats = {
+            measure: {
+                stat: scatter(f'{stat}({measure})', _EMPTY[stat], np.float64) for stat in _STORED
+            }
+            for measure in measures
+        }
+        return cls._from_arrays(dimensions, categories, scatter('count', 0, np.int64), stats)
+
+    @classmethod
+    def _from_arrays(cls, dimensions, categories, count, stats):
+        cube = cls.__new__(cls)
+        cube.dimensions = list(dimensions)
+        cube.categories = categories
+        cube.shape = count.shape
+        cube.count = count
+        cube.stats = stats
+        return cube
+
+    # Cube réindexé sur des modalités plus larges (cellules ajoutées vides)
+    def _aligned(self, categories):
+        if categories == self.categories:
+            return self
+        shape = tuple(len(c) for c in categories)
+        positions = []
+        for old, new in zip(self.categories, categories):
+            lookup = {value: i for i, value in enumerate(new)}
+            positions.append(np.array([lookup[value] for value in old], dtype=np.intp))
+        cells = np.ix_(*positions)
+
+        def expand(array, fill):
+            expanded = np.full(shape, fill, dtype=array.dtype)
+            expanded[cells] = array
+            return expanded
+
+        stats = {
+            measure: {stat: expand(array, _EMPTY[stat]) for stat, array in stored.items()}
+            for measure, stored in self.stats.items()
+        }
+        return Cube._from_arrays(self.dimensions, categories, expand(self.count, 0), stats)
+
+    def merge(self, other):
+        """
+        Combine deux cubes de mêmes dimensions et mesures, par exemple ceux de
+        deux blocs de lignes lus l'un après l'autre : les modalités sont
+        réunies, effectifs et sommes additionnés, minima et maxima combinés.
+        Le résultat est le cube qu'on aurait construit sur toutes les lignes.
+
+        Returns:
+            Cube: Le cube fusionné (les deux cubes d'origine sont inchangés)
+        """
+        categories = [sorted(set(a) | set(b)) for a, b in zip(self.categories, other.categories)]
+        left, right = self._aligned(categories), other._aligned(categories)
+        stats = {
+            measure: {
+                stat: _MERGE[stat](array, right.stats[measure][stat]) for stat, array in stored.items()
+            }
+            for measure, stored in left.stats.items()
+        }
+        return Cube._from_arrays(self.dimensions, categories, left.count + right.count, stats)
+
+    def regroup(self, dimension, labels):
+        """
+        Réunit des modalités de `dimension` : la modalité i prend le libellé
+        labels[i], et les cellules qui partagent un libellé sont combinées
+        comme par merge (effectifs et sommes additionnés, minima et maxima
+        combinés).
+
+        Args:
+            dimension (str): Dimension regroupée
+            labels (array-like): Nouveau libellé de chaque modalité, dans
+                l'ordre de self.categories
+
+        Returns:
+            Cube: Le cube regroupé (celui d'origine est inchangé)
+        """
+        axis = self.dimensions.index(dimension)
+        merged, target = np.unique(np.asarray(labels), return_inverse=True)
+        shape = (*self.shape[:axis], len(merged), *self.shape[axis + 1:])
+
+        def combine(array, fill, ufunc):
+            combined = np.full(shape, fill, dtype=array.dtype)
+            ufunc.at(np.moveaxis(combined, axis, 0), target, np.moveaxis(array, axis, 0))
+            return combined
+
+        categories = list(self.categories)
+        categories[axis] = merged.tolist()
+        stats = {
+            measure: {stat: combine(array, _EMPTY[stat], _MERGE[stat]) for stat, array in stored.items()}
+            for measure, stored in self.stats.items()
+        }
+        return Cube._from_arrays(self.dimensions, categories, combine(self.count, 0, np.add), stats)
+
+    def view(self, selections=None):
+        return CubeView(self, selections or {})
+
+
+class CubeView:
+    """
+    Tranche d'un cube restreinte aux valeurs sélectionnées de ses dimensions.
+
+    Les agrégats sont obtenus en sommant (ou en prenant le min/max) sur les
+    cellules de la tranche : le coût dépend du nombre de cellules, pas du
+    nombre de lignes.
+    """
+
+    def __init__(self, cube, selections):
+        self.cube = cube
+        self.selections = selections
+        self.index = []
+        for dimension, categories in zip(cube.dimensions, cube.categories):
+            values = selections.get(dimension)
+            if values is None:
+                self.index.append(np.arange(len(categories)))
+            else:
+                values = set(values)
+                self.index.append(np.array(
+                    [i for i, c in enumerate(categories) if c in values], dtype=np.intp
+                ))
+        self._cells = np.ix_(*self.index)
+        self._sliced = {}
+
+    def where(self, dimension, values):
+        """
+        Restreint la tranche aux valeurs `values` d'une dimension, par exemple
+        view.where('Subscription Status', ['Yes']).total('Purchase Amount (USD)', 'mean').
+        """
+        if dimension in self.selections:
+            values = [v for v in values if v in set(self.selections[dimension])]
+        return CubeView(self.cube, {**self.selections, dimension: values})
+
+    # Cellules d'un tableau du cube (count ou statistique) restreintes à la
+    # tranche ; chaque tableau n'est découpé qu'une fois par vue, si bien que
+    # les agrégats évalués ensemble sur une même vue se partagent le découpage
+    def cells(self, array):
+        sliced = self._sliced.get(id(array))
+        if sliced is None:
+            sliced = self._sliced[id(array)] = array[self._cells]
+        return sliced
+
+    # Part des lignes de la tranche dont la dimension vaut `value`
+    def share(self, dimension, value):
+        total = self.total()
+        return self.where(dimension, [value]).total() / total if total else float('nan')
+
+    # Valeur la plus fréquente d'une dimension (None si la tranche est vide)
+    def mode(self, dimension):
+        counts = self.rollup(dimension)
+        if counts.empty:
+            return None
+        return counts[dimension].iloc[counts['count'].to_numpy().argmax()]
+
+    def _reduce(self, array, axes, combine):
+        sliced = self.cells(array)
+        if not axes:
+            return sliced
+        if sliced.size == 0:
+            shape = [s for i, s in enumerate(sliced.shape) if i not in axes]
+            return np.zeros(shape, dtype=array.dtype)
+        return combine(sliced, axis=axes)
+
+    def _stat(self, stat, measure, axes):
+        count = self._reduce(self.cube.count, axes, np.sum)
+        if stat == 'count':
+            return count
+        stored = self.cube.stats[measure]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if stat in _STORED:
+                return self._reduce(stored[stat], axes, _STORED[stat])
+            total = self._reduce(stored['sum'], axes, np.sum)
+            if stat == 'mean':
+                return total / count
+            sumsq = self._reduce(stored['sumsq'], axes, np.sum)
+            var = np.maximum(sumsq - total * total / count, 0) / (count - 1)
+            if stat == 'var':
+                return var
+            if stat == 'std':
+                return np.sqrt(var)
+        raise ValueError(f"Statistique inconnue : {stat}")
+
+    def rollup(self, by, measure=None, stat='count'):
+        """
+        Agrège la tranche selon les dimensions `by`.
+
+        Équivaut à df.groupby(by, observed=True)[measure].agg(stat).reset_index()
+        sur les lignes sélectionnées.
+
+        Args:
+            by (list[str]): Dimensions conservées
+            measure (str, optional): Mesure agrégée (inutile pour 'count')
+            stat (str | list[str]): 'count', 'sum', 'mean', 'min', 'max',
+                'std', 'var' ou une liste de ces statistiques
+
+        Returns:
+            pandas.DataFrame: Une ligne par combinaison observée de `by`, avec
+            une colonne nommée d'après la mesure (ou 'count'), ou une colonne
+            par statistique si `stat` est une liste
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        positions = [self.cube.dimensions.index(d) for d in by]
+        axes = tuple(i for i in range(len(self.cube.dimensions)) if i not in positions)
+        # Les axes conservés sont remis dans l'ordre de `by`
+        order = np.argsort(np.argsort(positions))
+
+        def values(name):
+            return np.transpose(self._stat(name, measure, axes), order).ravel()
+
+        index = pd.MultiIndex.from_product(
+            [[self.cube.categories[p][i] for i in self.index[p]] for p in positions],
+            names=by
+        )
+        observed = values('count') > 0
+        if isinstance(stat, str):
+            columns = {measure or 'count': values(stat)}
+        else:
+            columns = {name: values(name) for name in stat}
+        result = pd.DataFrame(columns, index=index)[observed].reset_index()
+        for dimension, p in zip(by, positions):
+            result[dimension] = pd.Categorical(
+                result[dimension], categories=self.cube.categories[p]
+            )
+        return result
+
+    def crosstab(self, index, columns):
+        """
+        Table de contingence des dimensions `index` x `columns`, équivalente à
+        pd.crosstab sur les lignes sélectionnées.
+        """
+        rows, cols = (self.cube.dimensions.index(d) for d in (index, columns))
+        axes = tuple(i for i in range(len(self.cube.dimensions)) if i not in (rows, cols))
+        counts = self._reduce(self.cube.count, axes, np.sum)
+        if rows > cols:
+            counts = counts.T
+        # Seules les lignes et colonnes observées sont conservées
+        keep_rows = counts.sum(axis=1) > 0
+        keep_cols = counts.sum(axis=0) > 0
+        labels = [np.array(self.cube.categories[p], dtype=object)[self.index[p]] for p in (rows, cols)]
+        return pd.DataFrame(
+            counts[keep_rows][:, keep_cols],
+            index=pd.Index(labels[0][keep_rows], name=index),
+            columns=pd.Index(labels[1][keep_cols], name=columns)
+        )
+
+    def total(self, measure=None, stat='count'):
+        """
+        Agrégat de toute la tranche (KPI), par exemple total('Age', 'mean').
+        """
+        axes = tuple(range(len(self.cube.dimensions)))
+        count = self._stat('count', None, axes).item()
+        if stat == 'count':
+            return count
+        if count == 0 and stat != 'sum':
+            return float('nan')
+        return float(self._stat(stat, measure, axes))
+
+
+def build_cube(dimensions, measures, active, path=DATA_PATH):
+    """
+    Construit un cube sur les lignes retenues par les filtres actifs, avec le
+    moteur de requêtes du déploiement (backend.QUERY_BACKEND) : un passage
+    np.bincount sur les colonnes chargées en mémoire (pandas) ou une requête
+    GROUP BY sur l'instantané Parquet (DuckDB, Polars).
+
+    Args:
+        dimensions (list[str]): Dimensions du cube
+        measures (list[str]): Mesures agrégées
+        active (tuple): Filtres actifs, tels que retournés par FilterIndex.normalize
+
+    Returns:
+        Cube: Le cube des lignes filtrées
+    """
+    if QUERY_BACKEND != 'pandas':
+        categories = {d: load_categories(d, path) for d in dimensions}
+        return Cube.from_cells(query_cells(dimensions, measures, active, path), categories, dimensions, measures)
+    if select_partitions(path, active) is not None:
+        # Répertoire de partitions : seules les partitions retenues sont lues
+        return Cube(load_selection([*dimensions, *measures], dict(active), path), dimensions, measures)
+    rows = load_filter_index(path).select(dict(active)).rows() if active else None
+    return Cube(load_data([*dimensions, *measures], path), dimensions, measures, rows=rows)
+
+
+@data_cache
+@st.cache_resource
+def _build_cube(path, version):
+    return build_cube(CUBE_DIMENSIONS, CUBE_MEASURES, (), path)
+
+
+# Cube d'une partition, construit sur ses seules lignes
+@data_cache
+@st.cache_resource
+def _build_partition_cube(path, version, partition):
+    return Cube(load_data([*CUBE_DIMENSIONS, *CUBE_MEASURES], path, [partition]))
+
+
+# Cube des partitions retenues : fusion des cubes de partition, de quelques
+# milliers de cellules chacun (sans partition retenue, celui de la première,
+# dont la tranche sera vide)
+def _merge_partition_cubes(path, version, partitions):
+    cubes = [_build_partition_cube(path, version, i) for i in partitions or [0]]
+    cube = cubes[0]
+    for other in cubes[1:]:
+        cube = cube.merge(other)
+    return cube
+
+
+# Cube restreint aux filtres qui ne portent pas sur ses dimensions
+@data_cache
+@st.cache_resource(max_entries=16)
+def _build_residual_cube(path, version, residual):
+    return build_cube(CUBE_DIMENSIONS, CUBE_MEASURES, residual, path)
+
+
+def load_cube_view(selections, path=DATA_PATH):
+    """
+    Retourne la tranche du cube correspondant aux filtres de la sidebar.
+
+    Quand seuls des filtres sur les dimensions du cube sont actifs, le cube
+    global (construit une fois par version) est simplement découpé. Les autres
+    filtres (état, âge, note) imposent un cube construit en un seul passage sur
+    les lignes concernées, mis en cache pour cette sélection.
+
+    Sur un répertoire de partitions, le cube est la fusion des cubes des
+    seules partitions retenues par la sélection, chacun construit une fois
+    par version ; les partitions exclues ne sont jamais lues.
+
+    Args:
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        CubeView: La tranche à agréger
+    """
+    version = dataset_version(path)
+    active = load_filter_index(path).normalize(selections)
+    residual = tuple((c, v) for c, v in active if c not in CUBE_DIMENSIONS)
+    partitions = select_partitions(path, active)
+    if residual and partitions is not None:
+        # Les filtres de partition limitent aussi les lignes lues pour ce cube
+        by = load_partitions(path)['by']
+        residual = tuple((c, v) for c, v in active if c not in CUBE_DIMENSIONS or c in by)
+    if residual:
+        cube = _build_residual_cube(path, version, residual)
+    elif partitions is not None:
+        cube = _merge_partition_cubes(path, version, partitions)
+    else:
+        cube = _build_cube(path, version)
+    return cube.view({c: v for c, v in active if c in CUBE_DIMENSIONS})
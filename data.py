@@ -0,0 +1,642 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from state_codes import STATE_DICT
+from zonemaps import ZONE_ROWS, ZoneMap
+
+# Source du jeu de données (variable d'environnement DASHBOARD_DATA) : un
+# fichier CSV, ou un répertoire de partitions écrit par partition.py
+DATA_PATH = os.environ.get('DASHBOARD_DATA', 'shopping_trends.csv')
+
+# Version du format de l'instantané, enregistrée dans son manifeste : un
+# instantané d'un format antérieur est reconstruit (2 : zones par groupe de
+# lignes, zonemaps.py ; 3 : montants en int16 ; 4 : types réduits seulement
+# si toutes les valeurs y tiennent, voir narrow)
+SNAPSHOT_FORMAT = 4
+
+# Clé des métadonnées Parquet qui portent les zones de l'instantané
+ZONE_MAP_KEY = b'zone_maps'
+
+# Manifeste d'un répertoire de partitions : format, colonnes de partition,
+# catégories de chaque colonne et liste des fichiers avec leur nombre de lignes
+PARTITION_MANIFEST = '_partitions.json'
+
+# Colonne des partitions : numéro de chaque ligne dans le CSV d'origine. Les
+# lignes des partitions lues sont rangées dans cet ordre, si bien que l'ordre
+# de première apparition des modalités (légendes, groupes des boîtes) est le
+# même qu'avec le fichier unique
+SOURCE_ROW = '_source_row'
+
+# Moteur de requêtes du déploiement (variable d'environnement DASHBOARD_BACKEND,
+# voir backend.py) ; avec 'aggregates', le tableau de bord ne lit que les
+# agrégats produits par ingest.py, jamais les lignes
+QUERY_BACKEND = os.environ.get('DASHBOARD_BACKEND', 'pandas')
+
+# Comptage des clients distincts (variable d'environnement DASHBOARD_DISTINCT,
+# voir kpis.py) : 'sketch' réunit les sketches HyperLogLog des cellules
+# retenues, 'exact' relit les identifiants des lignes sélectionnées (audit)
+DISTINCT_MODE = os.environ.get('DASHBOARD_DISTINCT', 'sketch')
+
+# Quantiles des boîtes à moustaches et du panier médian (variable
+# d'environnement DASHBOARD_QUANTILES, voir aggregates.py) : 'sketch' réunit
+# les sketches de quantiles des cellules retenues, 'exact' trie les lignes
+QUANTILE_MODE = os.environ.get('DASHBOARD_QUANTILES', 'sketch')
+
+# Colonnes textuelles à faible cardinalité, stockées en catégories
+CATEGORICAL_COLUMNS = [
+    'Gender', 'Item Purchased', 'Category', 'Location', 'Size', 'Color',
+    'Season', 'Subscription Status', 'Payment Method', 'Shipping Type',
+    'Discount Applied', 'Promo Code Used', 'Preferred Payment Method',
+    'Frequency of Purchases'
+]
+
+# Types visés par colonne (évite les chaînes en dtype object). Les colonnes
+# numériques sont lues en types larges (READ_SCHEMA) puis réduites à ces types
+# seulement si toutes leurs valeurs y tiennent (narrow)
+SCHEMA = {
+    'Customer ID': 'int32',
+    'Age': 'int8',
+    'Purchase Amount (USD)': 'int16',
+    'Review Rating': 'float32',
+    'Previous Purchases': 'int16',
+    **{column: 'category' for column in CATEGORICAL_COLUMNS}
+}
+
+# Types imposés à la lecture du CSV : les seules colonnes textuelles. Les
+# colonnes numériques sont inférées par pandas (int64, ou float64 en présence
+# de décimales ou de valeurs manquantes) : aucune valeur n'est tronquée
+READ_SCHEMA = {column: 'category' for column in CATEGORICAL_COLUMNS}
+
+# Ordre des colonnes du fichier source
+COLUMNS = [
+    'Customer ID', 'Age', 'Gender', 'Item Purchased', 'Category',
+    'Purchase Amount (USD)', 'Location', 'Size', 'Color', 'Season',
+    'Review Rating', 'Subscription Status', 'Payment Method', 'Shipping Type',
+    'Discount Applied', 'Promo Code Used', 'Previous Purchases',
+    'Preferred Payment Method', 'Frequency of Purchases'
+]
+
+# Colonnes dérivées, calculées une fois au chargement : colonne -> (source, conversion)
+# La conversion d'une colonne catégorielle ne porte que sur ses catégories.
+DERIVED_COLUMNS = {
+    'State_Code': ('Location', lambda location: location.map(STATE_DICT))
+}
+
+
+def narrow(series, dtype):
+    """
+    Réduit une colonne numérique lue en type large au type `dtype` de SCHEMA,
+    seulement si toutes ses valeurs y tiennent exactement.
+
+    Sinon la colonne prend le plus petit type entier plus large que `dtype`
+    qui contient son minimum et son maximum, ou float64 si elle a des
+    valeurs non entières (un montant de 19,99) ou manquantes : un montant de
+    40 000 garde sa valeur en int32 au lieu de devenir -25 536 en int16.
+
+    Args:
+        series (pandas.Series): Colonne lue (int64 ou float64)
+        dtype (str): Type visé, entier ou flottant
+
+    Returns:
+        pandas.Series: La colonne convertie
+    """
+    target = np.dtype(dtype)
+    if series.dtype == target:
+        return series
+    if target.kind == 'f':
+        return series.astype(target)
+    values = series.to_numpy()
+    if values.dtype.kind == 'f' and not (np.isfinite(values) & (values == np.floor(values))).all():
+        return series.astype(np.float64)
+    low, high = (values.min(), values.max()) if len(values) else (0, 0)
+    for candidate in map(np.dtype, (np.int8, np.int16, np.int32, np.int64)):
+        info = np.iinfo(candidate)
+        if candidate.itemsize >= target.itemsize and info.min <= low and high <= info.max:
+            return series.astype(candidate)
+    return series.astype(np.float64)
+
+
+# Colonnes numériques d'un DataFrame lu en types larges réduites par narrow
+def narrow_frame(df):
+    return df.assign(**{
+        column: narrow(df[column], SCHEMA[column])
+        for column in df.columns if column in SCHEMA and SCHEMA[column] != 'category'
+    })
+
+
+# Lecture directe du CSV : colonnes textuelles en catégories, colonnes
+# numériques lues en types larges puis réduites
+def read_csv(path=DATA_PATH, columns=None):
+    return narrow_frame(pd.read_csv(path, dtype=READ_SCHEMA, usecols=columns))
+
+
+# Instantané colonnaire Parquet rangé à côté du CSV
+def snapshot_path(path=DATA_PATH):
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+# Agrégats mergeables produits par ingest.py, rangés à côté du CSV
+def aggregates_path(path=DATA_PATH):
+    return os.path.splitext(path)[0] + '.aggregates.pkl'
+
+
+# Empreinte SHA-256 du fichier, lue par blocs pour borner la mémoire
+def file_digest(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# Manifeste JSON d'un fichier dérivé du CSV (None s'il est absent ou illisible)
+def read_manifest(snapshot):
+    try:
+        with open(snapshot + '.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(snapshot, stat, digest):
+    manifest = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest, 'format': SNAPSHOT_FORMAT}
+    tmp = f'{snapshot}.json.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, snapshot + '.json')
+
+
+def build_snapshot(path=DATA_PATH):
+    """
+    Convertit le CSV en instantané Parquet et enregistre l'empreinte de la source.
+
+    L'instantané est découpé en groupes de ZONE_ROWS lignes, chacun avec les
+    min/max de ses colonnes (statistiques Parquet lues par DuckDB et Polars) ;
+    ses métadonnées portent en plus les zones des colonnes numériques
+    (zonemaps.ZoneMap : min, max et histogramme de chaque groupe).
+
+    L'écriture passe par un fichier temporaire puis un renommage atomique, de
+    sorte qu'un autre processus ne lise jamais un instantané incomplet.
+
+    Returns:
+        str: Le chemin de l'instantané
+    """
+    snapshot = snapshot_path(path)
+    stat = os.stat(path)
+    tmp = f'{snapshot}.{os.getpid()}.tmp'
+    df = read_csv(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **table.schema.metadata, ZONE_MAP_KEY: ZoneMap.from_frame(df).to_json()
+    })
+    pq.write_table(table, tmp, row_group_size=ZONE_ROWS)
+    os.replace(tmp, snapshot)
+    _write_manifest(snapshot, stat, file_digest(path))
+    return snapshot
+
+
+def ensure_snapshot(path=DATA_PATH):
+    """
+    Retourne un instantané Parquet à jour, en le reconstruisant si besoin.
+
+    La taille et la date de modification du CSV sont comparées au manifeste ;
+    l'empreinte SHA-256 n'est recalculée que si la date a changé à taille
+    égale (fichier simplement touché ou recopié à l'identique).
+
+    Returns:
+        str | None: Le chemin de l'instantané, ou None s'il ne peut pas être
+        écrit (répertoire en lecture seule)
+    """
+    snapshot = snapshot_path(path)
+    stat = os.stat(path)
+    manifest = read_manifest(snapshot)
+    try:
+        if manifest is not None and manifest.get('format') == SNAPSHOT_FORMAT and os.path.exists(snapshot):
+            if (manifest['size'], manifest['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+                return snapshot
+            if manifest['size'] == stat.st_size and manifest['sha256'] == file_digest(path):
+                _write_manifest(snapshot, stat, manifest['sha256'])
+                return snapshot
+        return build_snapshot(path)
+    except OSError:
+        return None
+
+
+# Lecture des colonnes demandées depuis l'instantané (mappé en mémoire)
+def read_snapshot(snapshot, columns=None):
+    return pd.read_parquet(snapshot, columns=columns, memory_map=True)
+
+
+# Zones enregistrées dans les métadonnées de l'instantané (None si absentes) ;
+# seul le pied du fichier Parquet est lu
+def read_zone_map(snapshot):
+    payload = (pq.read_schema(snapshot).metadata or {}).get(ZONE_MAP_KEY)
+    return None if payload is None else ZoneMap.from_json(payload)
+
+
+# Manifeste d'un répertoire de partitions (None si la source est un fichier)
+def read_partitions(path):
+    if not os.path.isdir(path):
+        return None
+    with open(os.path.join(path, PARTITION_MANIFEST)) as f:
+        manifest = json.load(f)
+    # Les partitions se suivent dans l'ordre du manifeste : chacune occupe un
+    # intervalle de numéros de lignes [start, stop) du jeu de données
+    start = 0
+    for partition in manifest['partitions']:
+        partition['start'], start = start, start + partition['rows']
+        partition['stop'] = start
+    return manifest
+
+
+# Lecture d'une colonne d'une partition, avec les catégories du jeu complet
+# (celles d'un CSV partiel se limitent aux valeurs présentes dans le fichier)
+def read_partition(path, manifest, partition, column):
+    file = os.path.join(path, manifest['partitions'][partition]['file'])
+    if manifest['format'] == 'parquet':
+        series = pd.read_parquet(file, columns=[column])[column]
+    else:
+        series = pd.read_csv(file, usecols=[column], dtype=READ_SCHEMA)[column]
+    categories = manifest['categories'].get(column)
+    if categories is not None and list(series.cat.categories) != categories:
+        series = series.cat.set_categories(categories)
+    elif categories is None and column in SCHEMA:
+        # CSV lu en type large, ou partition écrite avec un schéma plus large
+        series = narrow(series, SCHEMA[column])
+    return series
+
+
+# Caches dépendant du contenu du jeu de données, vidés quand sa version change
+_DATA_CACHES = []
+
+# Dernière version connue par fichier : {path: (((taille, mtime_ns), ...), version)}
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def data_cache(func):
+    """
+    Déclare une fonction en cache (st.cache_data / st.cache_resource) comme
+    dépendante des données : elle est vidée quand le CSV change de contenu.
+
+    La fonction doit aussi recevoir la version du jeu de données en argument,
+    pour qu'aucune session ne relise une entrée calculée sur l'ancienne version.
+    """
+    _DATA_CACHES.append(func)
+    return func
+
+
+def memory_per_row(df):
+    """
+    Mémoire occupée par ligne, colonne par colonne (chaînes comprises).
+
+    Returns:
+        pandas.Series: Colonne -> octets par ligne
+    """
+    return df.memory_usage(deep=True, index=False) / max(len(df), 1)
+
+
+class ColumnMemory:
+    """
+    Mémoire des colonnes gardées en cache par _load_column et
+    _load_partition_column, relevée à leur chargement. Vidée avec les caches
+    de données quand la version du jeu de données change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = {}
+
+    def record(self, path, version, column, partition, series):
+        with self._lock:
+            self._columns[path, version, column, partition] = (
+                int(series.memory_usage(deep=True, index=False)), len(series)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._columns.clear()
+
+    def stats(self, path=DATA_PATH):
+        """
+        Octets par ligne des colonnes chargées pour la version courante ; une
+        colonne lue partition par partition est rapportée aux lignes lues.
+
+        Returns:
+            dict: columns (Colonne -> octets par ligne), bytes_per_row, bytes
+        """
+        version = dataset_version(path)
+        totals = {}
+        with self._lock:
+            for (p, v, column, _), (size, rows) in self._columns.items():
+                if (p, v) == (path, version):
+                    column_bytes, column_rows = totals.get(column, (0, 0))
+                    totals[column] = (column_bytes + size, column_rows + rows)
+        columns = {column: size / max(rows, 1) for column, (size, rows) in totals.items()}
+        return {
+            'columns': columns,
+            'bytes_per_row': sum(columns.values()),
+            'bytes': sum(size for size, _ in totals.values())
+        }
+
+
+# Mémoire des colonnes chargées par le processus, affichée dans la sidebar de Home.py
+column_memory = data_cache(ColumnMemory())
+
+
+def dataset_version(path=DATA_PATH):
+    """
+    Retourne la version (empreinte SHA-256) du contenu du CSV.
+
+    Le coût par exécution de page se limite à un os.stat. Quand la taille ou
+    la date du fichier change, un seul thread met à jour l'instantané et, si le
+    contenu a réellement changé, vide les caches déclarés avec data_cache ;
+    les autres sessions attendent puis réutilisent la nouvelle version.
+
+    Avec le moteur 'aggregates', c'est le fichier d'agrégats qui est surveillé
+    et la version est celle du CSV qu'il résume : le CSV n'est pas relu. Pour
+    un répertoire de partitions, c'est son manifeste, qui porte l'empreinte de
+    l'ensemble des partitions.
+
+    Returns:
+        str: La version du jeu de données
+    """
+    aggregates = aggregates_path(path)
+    partitioned = os.path.isdir(path)
+    if QUERY_BACKEND == 'aggregates':
+        if not os.path.exists(aggregates + '.json'):
+            raise FileNotFoundError(f"Agrégats introuvables : lancer python ingest.py {path}")
+        # Le manifeste est réécrit après l'état : surveiller les deux fichiers
+        # garantit de voir la nouvelle version une fois l'ingestion terminée
+        stats = [os.stat(aggregates), os.stat(aggregates + '.json')]
+    elif partitioned:
+        # partition.py réécrit le manifeste en dernier
+        stats = [os.stat(os.path.join(path, PARTITION_MANIFEST))]
+    else:
+        stats = [os.stat(path)]
+    key = tuple((stat.st_size, stat.st_mtime_ns) for stat in stats)
+    known = _versions.get(path)
+    if known is not None and known[0] == key:
+        return known[1]
+    with _versions_lock:
+        known = _versions.get(path)
+        if known is not None and known[0] == key:
+            return known[1]
+        if QUERY_BACKEND == 'aggregates':
+            version = read_manifest(aggregates)['sha256']
+        elif partitioned:
+            version = read_partitions(path)['sha256']
+        else:
+            snapshot = ensure_snapshot(path)
+            version = file_digest(path) if snapshot is None else read_manifest(snapshot)['sha256']
+        if known is not None and known[1] != version:
+            for cache in _DATA_CACHES:
+                cache.clear()
+        _versions[path] = (key, version)
+        return version
+
+
+# Repli sur le CSV complet quand l'instantané est indisponible
+@data_cache
+@st.cache_resource
+def _load_csv(path, version):
+    return read_csv(path)
+
+
+@data_cache
+@st.cache_resource
+def _load_partitions(path, version):
+    return read_partitions(path)
+
+
+def load_partitions(path=DATA_PATH):
+    """
+    Retourne le manifeste du répertoire de partitions (lu une fois par
+    version), ou None si le jeu de données est un fichier unique.
+
+    Chaque partition du manifeste porte, outre son fichier et ses valeurs de
+    partition, l'intervalle [start, stop) de ses lignes dans l'ordre du
+    manifeste ; leurs numéros dans le jeu de données sont donnés par
+    partition_rows.
+    """
+    return _load_partitions(path, dataset_version(path))
+
+
+# Numéros, dans le jeu de données, des lignes d'une partition : leurs numéros
+# dans le CSV d'origine (colonne SOURCE_ROW), ou leurs positions dans l'ordre
+# du manifeste pour un répertoire écrit sans cette colonne
+@data_cache
+@st.cache_resource
+def _load_partition_rows(path, partition, version):
+    manifest = _load_partitions(path, version)
+    if manifest.get('source_rows'):
+        return read_partition(path, manifest, partition, SOURCE_ROW).to_numpy(dtype=np.int64)
+    return np.arange(manifest['partitions'][partition]['start'], manifest['partitions'][partition]['stop'])
+
+
+def partition_rows(partitions, path=DATA_PATH):
+    """
+    Numéros de lignes du jeu de données couverts par des partitions.
+
+    Args:
+        partitions (list[int]): Partitions, par exemple retournées par
+            select_partitions
+
+    Returns:
+        tuple: (numéros croissants, permutation qui range dans cet ordre les
+        lignes des partitions mises bout à bout)
+    """
+    version = dataset_version(path)
+    rows = np.concatenate([_load_partition_rows(path, i, version) for i in partitions] or [np.empty(0, np.int64)])
+    order = np.argsort(rows, kind='stable')
+    return rows[order], order
+
+
+# Lignes des partitions mises bout à bout rangées dans l'ordre du CSV d'origine
+def _in_source_order(data, path, partitions):
+    _, order = partition_rows(partitions, path)
+    if (order[1:] > order[:-1]).all():
+        return data
+    return data.take(order).reset_index(drop=True)
+
+
+# Colonne vide avec son type : catégories du manifeste, type de SCHEMA pour
+# les colonnes numériques, conversion des colonnes dérivées
+def _empty_column(manifest, column):
+    if column in DERIVED_COLUMNS:
+        source, convert = DERIVED_COLUMNS[column]
+        return convert(_empty_column(manifest, source)).rename(column)
+    categories = manifest['categories'].get(column)
+    dtype = SCHEMA[column] if categories is None else pd.CategoricalDtype(categories)
+    return pd.Series([], dtype=dtype, name=column)
+
+
+def select_partitions(path, active):
+    """
+    Partitions à lire pour des filtres actifs : une partition dont la valeur de
+    saison ou de catégorie est exclue par la sélection n'est pas lue.
+
+    Args:
+        active (tuple): Filtres actifs, tels que retournés par FilterIndex.normalize
+
+    Returns:
+        list[int] | None: Numéros des partitions retenues, dans l'ordre du
+        manifeste, ou None si le jeu de données est un fichier unique
+    """
+    manifest = load_partitions(path)
+    if manifest is None:
+        return None
+    active = dict(active)
+    return [
+        i for i, partition in enumerate(manifest['partitions'])
+        if all(value in active[column] for column, value in partition['values'].items() if column in active)
+    ]
+
+
+# Une colonne d'une partition, chargée une seule fois par version
+@data_cache
+@st.cache_resource
+def _load_partition_column(path, partition, column, version):
+    if column in DERIVED_COLUMNS:
+        source, convert = DERIVED_COLUMNS[column]
+        series = convert(_load_partition_column(path, partition, source, version)).rename(column)
+    else:
+        series = read_partition(path, _load_partitions(path, version), partition, column)
+    column_memory.record(path, version, column, partition, series)
+    return series
+
+
+# Une colonne chargée une seule fois par version, partagée par toutes les pages
+@data_cache
+@st.cache_resource
+def _load_column(path, column, version):
+    manifest = _load_partitions(path, version)
+    if column in DERIVED_COLUMNS:
+        source, convert = DERIVED_COLUMNS[column]
+        series = convert(_load_column(path, source, version)).rename(column)
+    elif manifest is not None:
+        # Lecture directe, sans garder chaque partition en double dans le cache
+        partitions = range(len(manifest['partitions']))
+        series = _in_source_order(
+            pd.concat([read_partition(path, manifest, i, column) for i in partitions], ignore_index=True),
+            path, partitions
+        )
+    else:
+        snapshot = ensure_snapshot(path)
+        if snapshot is None:
+            series = _load_csv(path, version)[column]
+        else:
+            series = read_snapshot(snapshot, [column])[column]
+    column_memory.record(path, version, column, None, series)
+    return series
+
+
+@data_cache
+@st.cache_resource
+def _load_frame(path, columns, version):
+    return pd.concat([_load_column(path, column, version) for column in columns], axis=1)
+
+
+def load_data(columns=None, path=DATA_PATH, partitions=None):
+    """
+    Charge le jeu de données une seule fois par processus avec un schéma typé.
+
+    Les colonnes sont lues depuis l'instantané Parquet (reconstruit
+    automatiquement quand le CSV change) et mises en cache une par une :
+    deux pages qui demandent des colonnes différentes partagent les colonnes
+    communes. Le cache est indexé par la version du jeu de données, si bien
+    qu'un CSV remplacé est pris en compte sans redémarrer le serveur. Le
+    DataFrame retourné est partagé entre toutes les pages et toutes les
+    sessions : il doit être considéré comme en lecture seule.
+
+    Les colonnes dérivées (DERIVED_COLUMNS, par exemple State_Code, le code
+    postal de l'état) sont calculées une seule fois par version.
+
+    La source peut aussi être un répertoire de partitions (partition.py). Avec
+    `partitions`, seuls les fichiers de ces partitions sont lus ; chacune est
+    mise en cache colonne par colonne et le DataFrame retourné, propre à
+    l'appel, range leurs lignes dans l'ordre du CSV d'origine (SOURCE_ROW).
+
+    Args:
+        columns (list[str], optional): Colonnes utilisées par la page
+            (toutes par défaut)
+        partitions (list[int], optional): Partitions à lire, par exemple
+            retournées par select_partitions (toutes par défaut)
+
+    Returns:
+        pandas.DataFrame: Le DataFrame typé
+    """
+    available = [*COLUMNS, *DERIVED_COLUMNS]
+    columns = available if columns is None else [c for c in available if c in columns]
+    version = dataset_version(path)
+    if partitions is None:
+        return _load_frame(path, tuple(columns), version)
+    if not partitions:
+        # Aucune partition retenue : un DataFrame vide, typé sans rien lire
+        manifest = _load_partitions(path, version)
+        return pd.concat([_empty_column(manifest, column) for column in columns], axis=1)
+    return _in_source_order(pd.concat([
+        pd.concat([_load_partition_column(path, i, column, version) for column in columns], axis=1)
+        for i in partitions
+    ], ignore_index=True), path, partitions)
+
+
+def load_column_categories(column, path=DATA_PATH):
+    """
+    Modalités triées d'une colonne catégorielle : lues dans le manifeste d'un
+    répertoire de partitions, sans charger la colonne, sinon sur la colonne
+    chargée.
+    """
+    manifest = load_partitions(path)
+    if manifest is not None and column in manifest['categories']:
+        return pd.Index(manifest['categories'][column])
+    return load_data([column], path)[column].cat.categories
+
+
+@data_cache
+@st.cache_resource
+def _load_zone_map(path, version):
+    if QUERY_BACKEND == 'aggregates' or os.path.isdir(path):
+        return None
+    snapshot = ensure_snapshot(path)
+    return None if snapshot is None else read_zone_map(snapshot)
+
+
+def load_zone_map(path=DATA_PATH):
+    """
+    Retourne les zones de l'instantané (zonemaps.ZoneMap), lues une fois par
+    version, ou None sans instantané (CSV en lecture seule, répertoire de
+    partitions, moteur 'aggregates').
+    """
+    return _load_zone_map(path, dataset_version(path))
+
+
+@data_cache
+@st.cache_resource
+def _load_aggregates(path, version):
+    with open(aggregates_path(path), 'rb') as f:
+        return pickle.load(f)
+
+
+def load_aggregates(path=DATA_PATH):
+    """
+    Retourne l'état d'agrégats (ingest.AggregateState) produit par ingest.py,
+    chargé une fois par version : c'est la seule donnée lue par le moteur
+    'aggregates'.
+    """
+    return _load_aggregates(path, dataset_version(path))
+
+
+# Comptage des valeurs sans les catégories absentes de la sélection
+def count_values(series):
+    counts = series.value_counts()
+    return counts[counts > 0]
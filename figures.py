@@ -0,0 +1,56 @@
+import json
+import os
+
+import plotly.graph_objects as go
+import streamlit as st
+
+from aggregates import AggregateCache
+from data import DATA_PATH, data_cache, dataset_version
+from filters import load_filter_index
+
+# Budget mémoire du cache des figures (JSON sérialisé), en octets
+# (variable d'environnement DASHBOARD_FIGURE_CACHE_BYTES, 32 Mo par défaut)
+FIGURE_CACHE_BYTES = os.environ.get('DASHBOARD_FIGURE_CACHE_BYTES', str(32 * 1024 * 1024))
+
+if not FIGURE_CACHE_BYTES.isdigit():
+    raise ValueError(
+        f"Budget du cache des figures invalide : {FIGURE_CACHE_BYTES} (attendu : un nombre entier d'octets)"
+    )
+FIGURE_CACHE_BYTES = int(FIGURE_CACHE_BYTES)
+
+# Instance unique du processus, vidée quand les données changent
+figure_cache = data_cache(AggregateCache(FIGURE_CACHE_BYTES))
+
+
+# Thème d'affichage courant ('light' / 'dark'), qui fait partie de la clé
+def _theme():
+    try:
+        return st.context.theme.type
+    except AttributeError:
+        return None
+
+
+def cached_figure(chart_id, selections, build, path=DATA_PATH):
+    """
+    Retourne la figure `chart_id` depuis le cache, ou la construit avec `build`.
+
+    La figure est conservée sous forme de JSON sérialisé, sous la clé
+    (identifiant du graphique, version des données, sélection normalisée,
+    thème). Tant que ni les données ni les filtres ne changent, une nouvelle
+    exécution de la page ne reconstruit pas la figure (px.bar, update_layout,
+    ...) : elle est relue depuis le JSON.
+
+    Args:
+        chart_id (str): Identifiant unique du graphique, par exemple
+            '04_Analyse_Panier/fig_avg_amount'
+        selections (dict): Filtres retournés par filters.sidebar_filters
+        build (callable): Fonction sans argument qui construit la figure
+
+    Returns:
+        plotly.graph_objects.Figure: La figure à passer à st.plotly_chart
+    """
+    key = (chart_id, dataset_version(path), load_filter_index(path).normalize(selections), _theme())
+    figure_json = figure_cache.get(key, lambda: build().to_json())
+    # Le JSON a été produit par Plotly à partir d'une figure déjà validée :
+    # la validation attribut par attribut n'est pas refaite à la lecture
+    return go.Figure(json.loads(figure_json), _validate=False)
@@ -0,0 +1,347 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data import (
+    DATA_PATH, QUERY_BACKEND, data_cache, dataset_version, load_aggregates, load_data, load_partitions,
+    partition_rows, select_partitions
+)
+
+# Filtres globaux proposés dans la sidebar : colonne -> libellé
+FILTER_COLUMNS = {
+    'Category': 'Catégorie de Produits',
+    'Season': 'Saison'
+}
+
+# Filtres avancés par liste de valeurs (laisser vide pour ne pas filtrer)
+SET_FILTERS = {
+    'Location': 'État',
+    'Gender': 'Genre',
+    'Subscription Status': 'Abonnement',
+    'Payment Method': 'Moyen de Paiement'
+}
+
+# Filtres avancés par intervalle : colonne -> (libellé, pas du curseur)
+RANGE_FILTERS = {
+    'Age': ('Âge', 1),
+    'Review Rating': ('Note Client', 0.1)
+}
+
+# Nombre de bits à 1 pour chaque octet (comptage des lignes d'un bitmap)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class Selection:
+    """
+    Sélection de lignes issue de FilterIndex.select.
+
+    Les lignes retenues sont représentées par un bitmap compressé
+    (np.packbits) ; `bits` vaut None quand aucun filtre n'est restrictif,
+    ce qui évite toute copie du DataFrame dans le cas par défaut.
+    """
+
+    def __init__(self, bits, n_rows):
+        self.bits = bits
+        self.n_rows = n_rows
+
+    @property
+    def all(self):
+        return self.bits is None
+
+    def __len__(self):
+        if self.all:
+            return self.n_rows
+        return int(_POPCOUNT[self.bits].sum())
+
+    # Masque booléen d'une valeur par ligne, des lignes start à stop (exclu)
+    def mask(self, start=0, stop=None):
+        stop = self.n_rows if stop is None else stop
+        if self.all:
+            return np.ones(stop - start, dtype=bool)
+        first = start // 8
+        bits = np.unpackbits(self.bits[first:(stop + 7) // 8]).view(bool)
+        return bits[start - first * 8:stop - first * 8]
+
+    # Masque booléen des lignes `rows` (numéros quelconques), lu bit à bit
+    def mask_rows(self, rows):
+        if self.all:
+            return np.ones(len(rows), dtype=bool)
+        return (self.bits[rows >> 3] >> (7 - (rows & 7)).astype(np.uint8) & 1).astype(bool)
+
+    # Numéros des lignes retenues
+    def rows(self):
+        if self.all:
+            return np.arange(self.n_rows)
+        return np.flatnonzero(self.mask())
+
+    def apply(self, df):
+        """
+        Retourne les lignes sélectionnées de `df`.
+
+        Le DataFrame partagé est retourné tel quel quand tous les filtres
+        couvrent toutes les valeurs ; sinon seules les lignes retenues sont
+        extraites, sans réévaluer de comparaison sur les colonnes texte.
+        """
+        if self.all:
+            return df
+        return df.take(self.rows())
+
+
+class FilterIndex:
+    """
+    Index des colonnes filtrables, construit une fois par version des données.
+
+    Chaque valeur d'une colonne catégorielle dispose de son bitmap de lignes ;
+    une sélection combine les bitmaps par OU au sein d'une colonne et par ET
+    entre colonnes, sur n/8 octets au lieu de comparer n chaînes de caractères.
+
+    Les colonnes numériques sont indexées par tri : les bornes d'un intervalle
+    sont localisées par recherche dichotomique (O(log n)) et seules les lignes
+    de l'intervalle, ou de son complément s'il est plus petit, sont parcourues :
+    leurs bits sont posés directement dans le bitmap compressé (n/8 octets).
+
+    Avec le moteur 'aggregates', l'index est construit sans lignes
+    (from_summary) : il ne connaît que les valeurs proposées et compte les
+    lignes retenues sur les agrégats.
+    """
+
+    def __init__(self, df, columns, range_columns=()):
+        self.n_rows = len(df)
+        self._count = None
+        self.options = {}
+        self.bitmaps = {}
+        for column in columns:
+            codes = df[column].cat.codes.to_numpy()
+            categories = df[column].cat.categories
+            # Valeurs dans l'ordre d'apparition, comme df[column].unique()
+            order = pd.unique(codes)
+            order = order[order >= 0]
+            self.options[column] = list(categories[order])
+            self.bitmaps[column] = {
+                categories[code]: np.packbits(codes == code) for code in order
+            }
+        # Index trié : numéros de lignes dans l'ordre croissant des valeurs
+        self.sorted_values = {}
+        self.sorted_rows = {}
+        for column in range_columns:
+            values = df[column].to_numpy()
+            order = np.argsort(values, kind='stable').astype(np.int32)
+            self.sorted_rows[column] = order
+            self.sorted_values[column] = values[order]
+
+    @classmethod
+    def from_summary(cls, options, count):
+        """
+        Index sans lignes, pour un jeu de données connu par ses seuls agrégats.
+
+        Args:
+            options (dict): Colonne -> valeurs proposées, dans l'ordre d'apparition
+            count (callable): Nombre de lignes retenues par des filtres normalisés
+        """
+        index = cls.__new__(cls)
+        index.n_rows = None
+        index._count = count
+        index.options = options
+        index.bitmaps = {}
+        index.sorted_values = {}
+        index.sorted_rows = {}
+        return index
+
+    # Valeurs minimale et maximale d'une colonne indexée par tri
+    def bounds(self, column):
+        values = self.sorted_values[column]
+        return values[0].item(), values[-1].item()
+
+    def active(self, selections):
+        """
+        Retourne uniquement les filtres qui excluent réellement des lignes.
+
+        Un multiselect où toutes les valeurs sont cochées, ou un intervalle qui
+        couvre toute la colonne, n'est pas retenu.
+        """
+        active = {}
+        for column, values in selections.items():
+            if column in self.sorted_values:
+                low, high = self.bounds(column)
+                if values[0] <= low and values[1] >= high:
+                    continue
+            elif set(self.options[column]) <= set(values):
+                continue
+            active[column] = values
+        return active
+
+    def normalize(self, selections):
+        """
+        Clé hashable et canonique des filtres actifs : l'ordre des colonnes et
+        des valeurs cochées n'a pas d'importance, les filtres non restrictifs
+        sont ignorés. Sert de clé de cache pour les agrégats d'une sélection.
+        """
+        return tuple(sorted(
+            (column, tuple(values) if column in self.sorted_values else tuple(sorted(values)))
+            for column, values in self.active(selections).items()
+        ))
+
+    def _range_bits(self, column, low, high):
+        values = self.sorted_values[column]
+        rows = self.sorted_rows[column]
+        # Bornes converties au type de la colonne (float32 pour les notes)
+        low, high = np.asarray([low, high], dtype=values.dtype)
+        start = np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, high, side='right')
+        if start == 0 and stop == self.n_rows:
+            return None
+        # Bits posés directement dans le bitmap compressé, pour les seules
+        # lignes de l'intervalle ou de son complément
+        if stop - start <= self.n_rows // 2:
+            bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            inside = rows[start:stop]
+            np.bitwise_or.at(bits, inside >> 3, (128 >> (inside & 7)).astype(np.uint8))
+        else:
+            bits = np.full((self.n_rows + 7) // 8, 255, dtype=np.uint8)
+            if self.n_rows % 8:
+                # Bits de remplissage du dernier octet à 0, comme np.packbits
+                bits[-1] = (255 << (8 - self.n_rows % 8)) & 255
+            outside = np.concatenate([rows[:start], rows[stop:]])
+            np.bitwise_and.at(bits, outside >> 3, ~(128 >> (outside & 7)).astype(np.uint8))
+        return bits
+
+    def _set_bits(self, column, values):
+        bitmaps = self.bitmaps[column]
+        values = [value for value in values if value in bitmaps]
+        if len(values) == len(bitmaps):
+            return None
+        bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            np.bitwise_or(bits, bitmaps[value], out=bits)
+        return bits
+
+    def select(self, selections):
+        """
+        Combine les index des filtres sélectionnés.
+
+        Args:
+            selections (dict): Colonne -> liste des valeurs retenues, ou
+                tuple (min, max) inclusif pour une colonne indexée par tri
+
+        Returns:
+            Selection: Les lignes qui satisfont tous les filtres
+        """
+        if self.n_rows is None:
+            raise ValueError("Index construit sans lignes (moteur 'aggregates') : utiliser count")
+        bits = None
+        for column, values in selections.items():
+            if column in self.sorted_values:
+                column_bits = self._range_bits(column, *values)
+            else:
+                column_bits = self._set_bits(column, values)
+            if column_bits is None:
+                continue
+            bits = column_bits if bits is None else np.bitwise_and(bits, column_bits, out=bits)
+        return Selection(bits, self.n_rows)
+
+    # Nombre de lignes qui satisfont tous les filtres
+    def count(self, selections):
+        if self._count is not None:
+            return self._count(self.normalize(selections))
+        return len(self.select(selections))
+
+
+@data_cache
+@st.cache_resource
+def _build_filter_index(path, version):
+    if QUERY_BACKEND == 'aggregates':
+        state = load_aggregates(path)
+        return FilterIndex.from_summary(state.filter_options(), state.count)
+    columns = [*FILTER_COLUMNS, *SET_FILTERS]
+    df = load_data([*columns, *RANGE_FILTERS], path)
+    return FilterIndex(df, columns, RANGE_FILTERS)
+
+
+# Index des filtres de la version courante, partagé par toutes les pages
+def load_filter_index(path=DATA_PATH):
+    return _build_filter_index(path, dataset_version(path))
+
+
+def load_selection(columns, selections, path=DATA_PATH):
+    """
+    Retourne les lignes sélectionnées des colonnes `columns`.
+
+    Sur un répertoire de partitions, les partitions exclues par les filtres de
+    saison ou de catégorie ne sont pas lues : seules les partitions retenues
+    sont chargées, puis filtrées par le bitmap de la sélection restreint à
+    leurs lignes. Le coût de lecture et de filtrage suit alors le volume
+    sélectionné plutôt que la taille du jeu de données.
+
+    Args:
+        columns (list[str]): Colonnes à charger
+        selections (dict): Filtres retournés par sidebar_filters
+
+    Returns:
+        pandas.DataFrame: Les lignes retenues (en lecture seule)
+    """
+    index = load_filter_index(path)
+    selection = index.select(selections)
+    manifest = load_partitions(path)
+    partitions = select_partitions(path, index.normalize(selections))
+    if partitions is None or len(partitions) == len(manifest['partitions']):
+        return selection.apply(load_data(columns, path))
+    df = load_data(columns, path, partitions)
+    if selection.all or not partitions:
+        return df
+    # Lignes des partitions, dans l'ordre du DataFrame (celui du CSV d'origine)
+    rows, _ = partition_rows(partitions, path)
+    keep = selection.mask_rows(rows)
+    return df if keep.all() else df.take(np.flatnonzero(keep))
+
+
+def sidebar_filters(index):
+    """
+    Affiche les filtres globaux dans la sidebar.
+
+    Catégorie et saison sont des multiselects où toutes les valeurs sont
+    cochées par défaut ; les filtres avancés (état, genre, abonnement, moyen
+    de paiement, âge, note) sont regroupés dans un expander et n'excluent
+    aucune ligne tant qu'ils ne sont pas modifiés. Les filtres que l'index ne
+    sert pas (moteur 'aggregates') ne sont pas proposés.
+
+    Args:
+        index (FilterIndex): L'index qui fournit les valeurs proposées
+
+    Returns:
+        dict: Colonne -> valeurs sélectionnées, ou (min, max) pour un intervalle
+    """
+    selections = {
+        column: st.multiselect(
+            label,
+            options=index.options[column],
+            default=index.options[column]
+        )
+        for column, label in FILTER_COLUMNS.items()
+    }
+    with st.expander("Filtres avancés"):
+        for column, (label, step) in RANGE_FILTERS.items():
+            if column not in index.sorted_values:
+                continue
+            low, high = index.bounds(column)
+            selections[column] = st.slider(
+                label,
+                min_value=low,
+                max_value=high,
+                value=(low, high),
+                step=step
+            )
+        for column, label in SET_FILTERS.items():
+            if column not in index.options:
+                continue
+            values = st.multiselect(
+                label,
+                options=sorted(index.options[column]),
+                placeholder="Toutes les valeurs"
+            )
+            if values:
+                selections[column] = values
+        missing = [label for column, (label, _) in RANGE_FILTERS.items() if column not in index.sorted_values]
+        missing += [label for column, label in SET_FILTERS.items() if column not in index.options]
+        if missing:
+            st.caption(f"Filtres indisponibles avec les agrégats : {', '.join(missing)}")
+    return selections
@@ -0,0 +1,187 @@
+import math
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Tolérance relative sur les bornes (valeurs décimales comme 3.0 = 2.4 + 3 x 0.2)
+_EDGE_FUZZ = 1e-9
+
+
+# Arrondi à une largeur « ronde » (2, 5 ou 10 x 10^k) strictement supérieure,
+# comme les graduations automatiques de Plotly (une largeur brute de 2 devient
+# 5) ; le logarithme est calculé comme en JavaScript (log(x) / ln 10)
+def nice_bin_size(raw):
+    magnitude = 10 ** math.floor(math.log(raw) / math.log(10))
+    for factor in (2, 5):
+        if factor * magnitude > raw:
+            return factor * magnitude
+    return 10 * magnitude
+
+
+# Nombre de valeurs vérifiant `mask`, chaque valeur comptant pour son poids
+def _count(mask, weights):
+    return np.count_nonzero(mask) if weights is None else weights[mask].sum()
+
+
+# Largeur minimale sans nbins : écart minimal entre deux valeurs distinctes,
+# arrondi par défaut à 0.9, 1.9, 4.9 ou 9.9 x 10^k
+def _min_size(min_diff):
+    magnitude = 10 ** math.floor(math.log(min_diff) / math.log(10))
+    ratio = min_diff / magnitude
+    return magnitude * max([f for f in (0.9, 1.9, 4.9, 9.9) if f <= ratio] or [0.9])
+
+
+# Largeur des classes comme l'auto-binning de Plotly : au plus `nbins` classes,
+# ou sans nbins une largeur dérivée de l'écart-type (de la population) et de
+# l'écart minimal entre deux valeurs distinctes
+def _bin_size(values, nbins, weights=None):
+    low, high = values.min(), values.max()
+    if nbins:
+        raw = (high - low) / nbins
+    else:
+        distinct = np.unique(values)
+        min_diff = np.diff(distinct).min() if len(distinct) > 1 else 1
+        if weights is None:
+            n, std = len(values), values.std()
+        else:
+            n = weights.sum()
+            mean = (weights * values).sum() / n
+            std = np.sqrt((weights * (values - mean) ** 2).sum() / n)
+        raw = max(_min_size(min_diff), 2 * std / n ** 0.4)
+    return nice_bin_size(raw) if raw > 0 else 1
+
+
+# Première borne des classes, selon les règles de décalage de Plotly : bornes
+# aux demi-entiers pour des entiers, décalage d'une demi-classe quand beaucoup
+# de valeurs tombent exactement sur les bornes
+def _bin_start(values, size, weights=None):
+    low, high = values.min(), values.max()
+    start = math.ceil(low / size - _EDGE_FUZZ) * size - size
+    if np.all(values % 1 == 0):
+        if size < 1:
+            return low - size / 2
+        start -= 0.5
+        return start + size if start + size < low else start
+
+    def on_edge(v):
+        return (1 + (v - start) * 100 / size) % 100 < 2
+
+    n = len(values) if weights is None else weights.sum()
+    edges = _count(on_edge(values), weights)
+    centers = _count(on_edge(values + size / 2), weights)
+    if centers < n * 0.1 and (edges > n * 0.3 or on_edge(low) or on_edge(high)):
+        start += size / 2 if start + size / 2 < low else -size / 2
+    return start
+
+
+class Histogram:
+    """
+    Histogramme calculé côté serveur : bornes des classes et effectifs.
+
+    Seuls les bornes et les effectifs sont envoyés au navigateur, la taille
+    de la figure ne dépend donc plus du nombre de lignes. Avec `groups`, les
+    effectifs sont ventilés par modalité (par exemple l'âge par genre) en un
+    seul np.bincount sur (groupe, classe).
+
+    La largeur et la position des classes reprennent l'auto-binning de
+    Plotly (nbinsx), pour des graphiques identiques à px.histogram.
+
+    Avec `weights`, chaque valeur compte pour son poids : l'histogramme peut
+    ainsi être construit à partir d'une table (valeur, groupe, effectif)
+    calculée par une requête sur l'instantané (backend.py), sans les lignes.
+
+    Args:
+        values (array-like): Valeurs numériques à répartir
+        nbins (int, optional): Nombre maximal de classes (automatique si None)
+        groups (pandas.Series, optional): Colonne catégorielle de ventilation
+        weights (array-like, optional): Effectif de chaque valeur
+    """
+
+    def __init__(self, values, nbins=None, groups=None, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.int64)
+        if groups is None:
+            codes = np.zeros(len(values), dtype=np.intp)
+            self.groups = [None]
+        else:
+            categories = groups.cat.categories
+            codes = groups.cat.codes.to_numpy()
+            # Modalités dans l'ordre d'apparition, comme la légende de px.histogram
+            order = pd.unique(codes)
+            self.groups = list(categories[order])
+            remap = np.zeros(len(categories), dtype=np.intp)
+            remap[order] = np.arange(len(order))
+            codes = remap[codes]
+
+        if len(values) == 0:
+            self.size = 1.0
+            self.edges = np.array([0.0, 1.0])
+            self.counts = np.zeros((len(self.groups), 1), dtype=np.int64)
+            return
+
+        high = values.max()
+        self.size = _bin_size(values, nbins, weights)
+        start = _bin_start(values, self.size, weights)
+        n_bins = int(math.floor((high - start) / self.size + _EDGE_FUZZ)) + 1
+        self.edges = start + self.size * np.arange(n_bins + 1)
+
+        bins = np.floor((values - start) / self.size + _EDGE_FUZZ).astype(np.intp)
+        bins = np.clip(bins, 0, n_bins - 1)
+        self.counts = np.bincount(
+            codes * n_bins + bins, weights, minlength=len(self.groups) * n_bins
+        ).astype(np.int64).reshape(len(self.groups), n_bins)
+
+    @property
+    def centers(self):
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    @property
+    def nbytes(self):
+        return self.edges.nbytes + self.counts.nbytes
+
+    def figure(self, title=None, labels=None, x=None, color=None, color_discrete_sequence=None):
+        """
+        Construit une figure en barres équivalente à px.histogram.
+
+        Args:
+            title (str, optional): Titre du graphique
+            labels (dict, optional): Libellés des axes, comme pour Plotly Express
+                ('count' pour l'axe des effectifs)
+            x (str, optional): Nom de la colonne représentée (axe X)
+            color (str, optional): Nom de la colonne de ventilation (légende)
+            color_discrete_sequence (list[str], optional): Couleurs des groupes
+
+        Returns:
+            plotly.graph_objects.Figure: Le graphique créé
+        """
+        labels = labels or {}
+        fig = go.Figure()
+        ranges = np.column_stack([self.edges[:-1], self.edges[1:]])
+        # Plotly déduit la largeur des barres de l'écart entre les centres ;
+        # elle n'est imposée que pour une classe unique
+        width = self.size if len(ranges) == 1 else None
+        for i, group in enumerate(self.groups):
+            marker = {}
+            if color_discrete_sequence:
+                marker['color'] = color_discrete_sequence[i % len(color_discrete_sequence)]
+            fig.add_trace(go.Bar(
+                x=self.centers,
+                y=self.counts[i],
+                width=width,
+                name=None if group is None else str(group),
+                marker=marker,
+                customdata=ranges,
+                hovertemplate='%{customdata[0]:.4~g} – %{customdata[1]:.4~g}<br>%{y}<extra>%{fullData.name}</extra>'
+            ))
+        fig.update_layout(
+            title=title,
+            barmode='group',
+            bargap=0,
+            showlegend=self.groups != [None],
+            legend_title_text=labels.get(color, color),
+            xaxis_title=labels.get(x, x),
+            yaxis_title=labels.get('count', 'count')
+        )
+        return fig
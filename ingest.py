@@ -0,0 +1,526 @@
+"""
+Ingestion du CSV par blocs en agrégats mergeables.
+
+Usage :
+    python ingest.py
+    python ingest.py shopping_trends.csv --chunk-rows 100000
+    python ingest.py shopping_trends.csv --full
+
+Le fichier est lu par blocs de `--chunk-rows` lignes ; chaque bloc est résumé
+en cubes (effectifs, sommes, sommes des carrés, minima et maxima par cellule)
+ainsi qu'en sketches HyperLogLog des clients distincts (sketches.py) et en
+sketches de quantiles des montants et des notes (quantiles.py), puis
+fusionné dans l'état courant avant d'être libéré. Le pic de mémoire dépend
+donc de la taille d'un bloc et du nombre de cellules, pas de la taille du
+fichier. L'état est enregistré à côté du CSV (data.aggregates_path) et sert le
+tableau de bord lancé avec DASHBOARD_BACKEND=aggregates. Relancée après l'ajout
+de lignes à la fin du fichier, l'ingestion ne lit que ces nouvelles lignes.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_DIMENSIONS, CUBE_MEASURES, Cube
+from data import CATEGORICAL_COLUMNS, DATA_PATH, READ_SCHEMA, aggregates_path, narrow_frame, read_manifest
+from filters import FILTER_COLUMNS, SET_FILTERS
+from quantiles import QUANTILE_COLUMNS, QuantileSketch, representative
+from sketches import HLL_PRECISION, DistinctSketch
+
+# Nombre de lignes lues par bloc
+CHUNK_ROWS = 100_000
+
+# Mesure technique : numéro de ligne dans le fichier (son minimum par cellule
+# donne la première apparition, pour ordonner les légendes comme pandas)
+ROW = '_row'
+
+# Filtres de la sidebar servis par les agrégats : ceux qui portent sur une
+# dimension du cube. Chaque vue est croisée avec tous ces filtres.
+STATE_FILTERS = [c for c in [*FILTER_COLUMNS, *SET_FILTERS] if c in CUBE_DIMENSIONS]
+
+# Vues agrégées : nom -> (dimensions, mesures). Les colonnes numériques
+# utilisées comme dimensions (histogrammes, boîtes, nuage de points) sont
+# comptées par valeur exacte dans la limite de MAX_AXIS_VALUES valeurs
+# (voir _bounded).
+STATE_VIEWS = {
+    'cube': (CUBE_DIMENSIONS, CUBE_MEASURES),
+    'size_color': (['Size', 'Color'], []),
+    'items': (['Item Purchased'], []),
+    'preferred_payment': (['Preferred Payment Method'], []),
+    'discount': (['Discount Applied'], []),
+    'states': (['Location'], ['Purchase Amount (USD)', 'Review Rating']),
+    'age': (['Age', 'Gender'], [ROW]),
+    'amount': (['Purchase Amount (USD)'], [ROW]),
+    'rating': (['Review Rating'], [ROW]),
+    'previous': (['Previous Purchases'], [ROW]),
+    'rating_amount': (['Review Rating', 'Purchase Amount (USD)'], []),
+}
+
+# Sketches HyperLogLog des clients distincts : nom -> (dimensions, précision),
+# croisés comme les vues avec tous les filtres. Le sketch par état compte
+# 50 fois plus de cellules : sa précision est réduite (erreur type 6,5 %).
+SKETCH_VIEWS = {
+    'customers': ([], HLL_PRECISION),
+    'customers_by_state': (['Location'], 8),
+}
+
+# Nombre maximal de valeurs par axe numérique d'une vue : au-delà, chaque
+# valeur est remplacée par le représentant de son intervalle logarithmique
+# (quantiles.representative, à 1 % près), et les intervalles sont élargis
+# d'un facteur 2 sur toute l'échelle tant qu'ils restent trop nombreux. La vue qui croise deux colonnes numériques (nuage
+# de points) est limitée à MAX_GRID_VALUES valeurs par axe.
+MAX_AXIS_VALUES = 256
+MAX_GRID_VALUES = 96
+
+# Nombre maximal de Customer ID conservés (8 octets chacun) pour compter
+# exactement les clients distincts : au-delà, l'ensemble est abandonné et le
+# compte est estimé par le sketch HyperLogLog des clients
+MAX_EXACT_CUSTOMERS = 1_000_000
+
+# Version du format de l'état enregistré : un état d'un format antérieur est
+# reconstruit par une relecture complète (2 : sketches des clients distincts,
+# 3 : sketches de quantiles ; 4 : types réduits seulement si les valeurs y
+# tiennent, voir data.narrow ; 5 : axes numériques bornés, voir _bounded ;
+# 6 : ensemble trié des Customer ID au lieu d'un bitmap indexé par leur valeur ;
+# 7 : axes numériques bornés par élargissement uniforme des intervalles)
+STATE_FORMAT = 7
+
+# Statistiques stockées par cellule, dans l'ordre des colonnes de query_cells
+_CELL_STATS = ['sum', 'sumsq', 'min', 'max']
+
+
+# Dimensions d'une vue : les siennes puis les filtres qu'elle n'a pas déjà
+def _view_dimensions(dimensions):
+    return [*dimensions, *(f for f in STATE_FILTERS if f not in dimensions)]
+
+
+# Axes numériques d'une vue et nombre de valeurs gardées par axe
+def _numeric_axes(dimensions):
+    numeric = [d for d in dimensions if d not in CATEGORICAL_COLUMNS]
+    return numeric, MAX_AXIS_VALUES if len(numeric) < 2 else MAX_GRID_VALUES
+
+
+# Valeurs ramenées à au plus `limit` libellés distincts : représentants des
+# intervalles logarithmiques, élargis uniformément (gamma, gamma², gamma⁴, ...)
+# jusqu'à ce qu'il en reste au plus `limit`
+def _limit_values(values, limit):
+    values = np.asarray(values, dtype=np.float64)
+    scale = 1
+    labels = representative(values)
+    while len(np.unique(labels)) > limit:
+        scale *= 2
+        labels = representative(values, scale)
+    return labels
+
+
+# Cube d'une vue dont chaque axe numérique garde au plus MAX_AXIS_VALUES
+# valeurs (MAX_GRID_VALUES s'il y en a deux) : la taille de la vue ne dépend
+# plus du nombre de valeurs distinctes, ni donc du nombre de lignes
+def _bounded(cube):
+    numeric, limit = _numeric_axes(cube.dimensions)
+    for dimension in numeric:
+        values = cube.categories[cube.dimensions.index(dimension)]
+        if len(values) > limit:
+            cube = cube.regroup(dimension, _limit_values(values, limit))
+    return cube
+
+
+# Réunion de deux ensembles triés de Customer ID, et présence d'un identifiant
+# commun aux deux ; None si l'un est inconnu ou si la réunion dépasse
+# MAX_EXACT_CUSTOMERS
+def _merge_customers(left, right):
+    if left is None or right is None:
+        return None, False
+    found = np.searchsorted(left, right)
+    common = found < len(left)
+    common[common] = left[found[common]] == right[common]
+    merged = np.insert(left, found[~common], right[~common])
+    return (merged if len(merged) <= MAX_EXACT_CUSTOMERS else None), bool(common.any())
+
+
+class AggregateState:
+    """
+    Agrégats mergeables de tout le fichier, construits bloc par bloc.
+
+    Chaque vue de STATE_VIEWS est un Cube : deux états se fusionnent cellule
+    par cellule (Cube.merge), si bien que l'état d'un fichier est la fusion des
+    états de ses blocs. L'état répond aux requêtes du moteur 'aggregates'
+    (backend.py) avec la même interface que DuckDB et Polars, pour les filtres
+    de STATE_FILTERS.
+
+    La taille de l'état est bornée quel que soit le nombre de lignes : les
+    vues ont au plus MAX_AXIS_VALUES valeurs par axe numérique (MAX_GRID_VALUES
+    pour le nuage de points), les sketches ont un nombre fixe de registres et
+    au plus MAX_BUCKETS intervalles, par cellule des 384 combinaisons de
+    filtres, et l'ensemble des clients au plus MAX_EXACT_CUSTOMERS
+    identifiants (8 Mo). Cela fait au plus 90 Mo environ, contre 21 Mo pour
+    les 3 900 lignes de shopping_trends.csv, dont les valeurs restent exactes.
+
+    Attributes:
+        n_rows (int): Nombre de lignes résumées
+        views (dict[str, Cube]): Cube de chaque vue, par nom
+        first_rows (dict): Filtre -> {valeur: numéro de sa première ligne}
+        customers (numpy.ndarray | None): Customer ID rencontrés, triés et
+            sans doublon ; None au-delà de MAX_EXACT_CUSTOMERS
+        repeated_customers (bool): Vrai si un client apparaît sur plusieurs
+            lignes (ou si on ne peut plus l'exclure, l'ensemble abandonné)
+        sketches (dict[str, DistinctSketch]): Sketch de chaque vue de
+            SKETCH_VIEWS, par nom
+        quantiles (dict[str, QuantileSketch]): Sketch de quantiles de chaque
+            colonne de QUANTILE_COLUMNS, par cellule des filtres
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.views = {}
+        self.first_rows = {column: {} for column in STATE_FILTERS}
+        self.customers = np.zeros(0, dtype=np.int64)
+        self.repeated_customers = False
+        self.sketches = {}
+        self.quantiles = {}
+
+    @classmethod
+    def from_chunk(cls, chunk, offset=0):
+        """
+        Résume un bloc de lignes lu avec data.READ_SCHEMA puis data.narrow_frame.
+
+        Args:
+            chunk (pandas.DataFrame): Le bloc
+            offset (int): Numéro, dans le fichier, de la première ligne du bloc
+
+        Returns:
+            AggregateState: L'état du bloc
+
+        Raises:
+            ValueError: Si un Customer ID est manquant ou non entier
+        """
+        if chunk['Customer ID'].dtype.kind not in 'iu':
+            raise ValueError(
+                f"Customer ID manquant ou non entier entre les lignes {offset} et {offset + len(chunk) - 1}"
+            )
+        state = cls()
+        state.n_rows = len(chunk)
+        chunk = chunk.assign(**{ROW: np.arange(offset, offset + len(chunk), dtype=np.float64)})
+        for name, (dimensions, measures) in STATE_VIEWS.items():
+            dimensions = _view_dimensions(dimensions)
+            frame = chunk[[*dimensions, *measures]]
+            # Colonnes numériques bornées (avant le comptage, qui croise leurs
+            # valeurs) puis converties en catégories le temps du comptage
+            numeric, limit = _numeric_axes(dimensions)
+            frame = frame.assign(**{
+                d: _limit_values(frame[d], limit) for d in numeric if frame[d].nunique() > limit
+            })
+            frame = frame.astype({d: 'category' for d in dimensions if frame[d].dtype != 'category'})
+            state.views[name] = Cube(frame, dimensions, measures)
+        for column in STATE_FILTERS:
+            codes = chunk[column].cat.codes.to_numpy()
+            found, first = np.unique(codes, return_index=True)
+            categories = chunk[column].cat.categories
+            state.first_rows[column] = {
+                categories[code]: offset + int(row) for code, row in zip(found, first) if code >= 0
+            }
+        ids = np.unique(chunk['Customer ID'].to_numpy(dtype=np.int64))
+        state.customers = ids if len(ids) <= MAX_EXACT_CUSTOMERS else None
+        state.repeated_customers = len(ids) < len(chunk)
+        state.sketches = {
+            name: DistinctSketch(chunk, 'Customer ID', _view_dimensions(dimensions), precision)
+            for name, (dimensions, precision) in SKETCH_VIEWS.items()
+        }
+        rows = np.arange(offset, offset + len(chunk), dtype=np.int64)
+        state.quantiles = {
+            column: QuantileSketch(chunk, column, STATE_FILTERS, rows) for column in QUANTILE_COLUMNS
+        }
+        return state
+
+    def merge(self, other):
+        """
+        Fusionne l'état `other`, qui résume les lignes suivantes du fichier
+        (ses numéros de ligne sont déjà absolus).
+
+        Returns:
+            AggregateState: L'état fusionné (les deux états d'origine sont inchangés)
+        """
+        state = AggregateState()
+        state.n_rows = self.n_rows + other.n_rows
+        state.views = {
+            name: _bounded(self.views[name].merge(cube)) if name in self.views else cube
+            for name, cube in other.views.items()
+        }
+        for column in STATE_FILTERS:
+            first_rows = dict(other.first_rows[column])
+            for value, row in self.first_rows[column].items():
+                first_rows[value] = min(row, first_rows.get(value, row))
+            state.first_rows[column] = first_rows
+        state.customers, common = _merge_customers(self.customers, other.customers)
+        state.repeated_customers = (
+            self.repeated_customers or other.repeated_customers or common
+            or self.customers is None or other.customers is None
+        )
+        state.sketches = {
+            name: self.sketches[name].merge(sketch) if name in self.sketches else sketch
+            for name, sketch in other.sketches.items()
+        }
+        state.quantiles = {
+            column: self.quantiles[column].merge(sketch) if column in self.quantiles else sketch
+            for column, sketch in other.quantiles.items()
+        }
+        return state
+
+    def update(self, chunk):
+        """
+        Ajoute un bloc de lignes placé après celles déjà résumées.
+
+        Returns:
+            AggregateState: L'état fusionné
+        """
+        return self.merge(AggregateState.from_chunk(chunk, self.n_rows))
+
+    # Valeurs proposées par chaque filtre, dans l'ordre d'apparition
+    def filter_options(self):
+        return {
+            column: sorted(first_rows, key=first_rows.get)
+            for column, first_rows in self.first_rows.items()
+        }
+
+    # Tranche de la plus petite vue qui couvre les colonnes, les mesures et
+    # les filtres actifs
+    def _view(self, columns, measures, active):
+        needed = {*columns, *(column for column, _ in active)}
+        candidates = [
+            cube for cube in self.views.values()
+            if needed <= set(cube.dimensions) and set(measures) <= set(cube.stats)
+        ]
+        if not candidates:
+            raise ValueError(f"Aucun agrégat ne couvre {sorted(needed)} : voir ingest.STATE_VIEWS")
+        cube = min(candidates, key=lambda c: c.count.size)
+        return cube.view({column: values for column, values in active})
+
+    def categories(self, column):
+        cube = min((c for c in self.views.values() if column in c.dimensions), key=lambda c: c.count.size)
+        return list(cube.categories[cube.dimensions.index(column)])
+
+    def count(self, active):
+        return self._view([], [], active).total()
+
+    def cells(self, dimensions, measures, active):
+        view = self._view(dimensions, measures, active)
+        result = view.rollup(list(dimensions))
+        for measure in measures:
+            stats = view.rollup(list(dimensions), measure, _CELL_STATS)
+            for stat in _CELL_STATS:
+                result[f'{stat}({measure})'] = stats[stat].to_numpy()
+        return result
+
+    # Plus petit sketch des clients distincts qui garde les dimensions `by`
+    def _sketch(self, by=()):
+        candidates = [s for s in self.sketches.values() if set(by) <= set(s.dimensions)]
+        if not candidates:
+            raise ValueError(f"Aucun sketch ne couvre {list(by)} : voir ingest.SKETCH_VIEWS")
+        return min(candidates, key=lambda s: s.registers.size)
+
+    # Erreur relative type du nombre de clients distincts (0 s'il est exact)
+    def distinct_error(self, active):
+        estimated = self.repeated_customers and (active or self.customers is None)
+        return self._sketch().error if estimated else 0.0
+
+    def distinct(self, column, active):
+        """
+        Nombre de clients distincts des lignes filtrées : exact quand chaque
+        client n'apparaît qu'une fois (c'est alors le nombre de lignes) ou sans
+        filtre tant que l'ensemble des clients est conservé ; sinon estimé par
+        l'union des sketches HyperLogLog des cellules retenues (erreur type :
+        distinct_error).
+        """
+        if column != 'Customer ID':
+            raise ValueError(f"Valeurs distinctes non agrégées : {column}")
+        if not self.repeated_customers:
+            return self.count(active)
+        if not active and self.customers is not None:
+            return len(self.customers)
+        # Un client distinct a au moins un achat : l'estimation est bornée
+        return min(self._sketch().count(dict(active)), self.count(active))
+
+    def distinct_by(self, column, by, active):
+        if column != 'Customer ID':
+            raise ValueError(f"Valeurs distinctes non agrégées : {column}")
+        counts = self._view([by], [], active).rollup([by])
+        values = counts['count'].to_numpy()
+        if self.repeated_customers:
+            groups, estimates = self._sketch([by]).count_by(by, dict(active))
+            values = np.minimum(pd.Series(estimates, index=groups).reindex(counts[by].to_numpy()).to_numpy(), values)
+        return counts[by].to_numpy(), values
+
+    def value_counts(self, column, by, active):
+        if by is None:
+            counts = self._view([column], [], active).rollup([column])
+            return counts[column].to_numpy(), None, counts['count'].to_numpy()
+        view = self._view([column, by], [], active)
+        if ROW in view.cube.stats:
+            counts = view.rollup([column, by], ROW, ['count', 'min'])
+            first = counts.groupby(by, observed=True)['min'].transform('min').to_numpy()
+        else:
+            counts = view.rollup([column, by])
+            first = np.zeros(len(counts))
+        # Groupes par première apparition, puis valeurs croissantes
+        order = np.lexsort((counts[column].cat.codes, counts[by].cat.codes, first))
+        counts = counts.iloc[order]
+        return (
+            counts[column].to_numpy(),
+            pd.Series(counts[by].to_numpy(), dtype='category'),
+            counts['count'].to_numpy()
+        )
+
+
+class _ByteRange(io.RawIOBase):
+    """
+    Octets [start, stop) d'un fichier, lus en flux par pd.read_csv : seules
+    les lignes complètes présentes au début de l'ingestion sont lues, même si
+    le fichier continue de grossir. L'empreinte des octets lus est calculée au
+    passage, chaînée à `seed`.
+    """
+
+    def __init__(self, path, start, stop, seed=b''):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._left = stop - start
+        self.sha = hashlib.sha256(seed)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._file.readinto(memoryview(buffer)[:self._left])
+        self.sha.update(memoryview(buffer)[:n])
+        self._left -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+# Taille du fichier limitée à sa dernière ligne complète (une ligne en cours
+# d'écriture sera lue à la prochaine ingestion)
+def _complete_size(path, size, block=1 << 16):
+    with open(path, 'rb') as f:
+        stop = size
+        while stop > 0:
+            start = max(0, stop - block)
+            f.seek(start)
+            newline = f.read(stop - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            stop = start
+    return 0
+
+
+# Empreintes du début et de la fin des `size` premiers octets : si elles
+# n'ont pas changé, le fichier n'a reçu que des lignes ajoutées après `size`
+def _edges(path, size, block=1 << 16):
+    with open(path, 'rb') as f:
+        head = f.read(min(block, size))
+        f.seek(max(0, size - block))
+        tail = f.read(size - max(0, size - block))
+    return hashlib.sha256(head).hexdigest(), hashlib.sha256(tail).hexdigest()
+
+
+def _write_manifest(aggregates, manifest):
+    tmp = f'{aggregates}.json.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, aggregates + '.json')
+
+
+# État enregistré et position de fin de la dernière ingestion, si le fichier
+# n'a reçu depuis que des lignes ajoutées ; None sinon
+def _previous(path, size):
+    aggregates = aggregates_path(path)
+    manifest = read_manifest(aggregates)
+    if manifest is None or not os.path.exists(aggregates) or manifest['size'] > size:
+        return None
+    if manifest.get('format') != STATE_FORMAT:
+        return None
+    if _edges(path, manifest['size']) != (manifest.get('head_sha256'), manifest.get('tail_sha256')):
+        return None
+    with open(aggregates, 'rb') as f:
+        return pickle.load(f), manifest
+
+
+def ingest(path=DATA_PATH, chunk_rows=CHUNK_ROWS, full=False):
+    """
+    Lit le CSV par blocs et enregistre ses agrégats.
+
+    Quand des agrégats existent déjà et que le fichier n'a reçu que des lignes
+    ajoutées à la fin (début et fin de la partie déjà lue inchangés), seules
+    les nouvelles lignes sont lues, à partir de la position enregistrée dans
+    le manifeste, et fusionnées dans l'état : le coût dépend du nombre de
+    lignes ajoutées, pas de la taille du fichier. Sinon (ou avec `full`), tout
+    le fichier est relu.
+
+    L'état est écrit dans un fichier temporaire puis renommé (data.py surveille
+    ce fichier et son manifeste). Le manifeste porte la version du jeu de
+    données : l'empreinte SHA-256 des octets lus, chaînée d'une ingestion à
+    la suivante.
+
+    Args:
+        path (str): Fichier CSV à ingérer
+        chunk_rows (int): Nombre de lignes lues par bloc
+        full (bool): Relire tout le fichier même s'il n'a reçu que des ajouts
+
+    Returns:
+        AggregateState: L'état enregistré
+    """
+    stat = os.stat(path)
+    size = _complete_size(path, stat.st_size)
+    previous = None if full else _previous(path, size)
+    if previous is not None and previous[1]['size'] == size:
+        return previous[0]
+    if previous is None:
+        state, start, seed, header = AggregateState(), 0, b'', 0
+        names = None
+    else:
+        state, manifest = previous
+        start, seed, header = manifest['size'], bytes.fromhex(manifest['sha256']), None
+        names = list(pd.read_csv(path, nrows=0).columns)
+    reader = _ByteRange(path, start, size, seed)
+    with io.BufferedReader(reader) as f:
+        for chunk in pd.read_csv(f, header=header, names=names, dtype=READ_SCHEMA, chunksize=chunk_rows):
+            state = state.update(narrow_frame(chunk))
+    aggregates = aggregates_path(path)
+    tmp = f'{aggregates}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, aggregates)
+    head, tail = _edges(path, size)
+    _write_manifest(aggregates, {
+        'size': size, 'mtime_ns': stat.st_mtime_ns, 'sha256': reader.sha.hexdigest(),
+        'rows': state.n_rows, 'head_sha256': head, 'tail_sha256': tail, 'format': STATE_FORMAT
+    })
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', nargs='?', default=DATA_PATH)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--full', action='store_true', help='relire tout le fichier')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    state = ingest(args.path, args.chunk_rows, args.full)
+    size_mb = os.path.getsize(aggregates_path(args.path)) / (1024 * 1024)
+    print(f'{state.n_rows:,} lignes agrégées, à jour en {time.perf_counter() - start:.1f} s '
+          f'-> {aggregates_path(args.path)} ({size_mb:.1f} Mo)')
+
+
+if __name__ == '__main__':
+    # Passer par le module importé : l'état enregistré doit référencer
+    # ingest.AggregateState, et non __main__.AggregateState
+    import ingest
+    ingest.main()
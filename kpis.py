@@ -0,0 +1,337 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from aggregates import aggregate_cache, select_quantile_sketch
+from backend import QUERY_BACKEND, load_categories, query_cells, query_distinct, query_value_counts
+from cube import SKETCH_DIMENSIONS, load_cube_view
+from data import DATA_PATH, DISTINCT_MODE, data_cache, dataset_version, load_aggregates, load_data
+from filters import load_filter_index, load_selection
+from quantiles import weighted_quantile
+from sketches import DistinctSketch
+
+# Modes de comptage des clients distincts (data.DISTINCT_MODE)
+DISTINCT_MODES = ('sketch', 'exact')
+
+if DISTINCT_MODE not in DISTINCT_MODES:
+    raise ValueError(f"Mode de comptage inconnu : {DISTINCT_MODE} (attendu : {', '.join(DISTINCT_MODES)})")
+
+
+class Kpis(NamedTuple):
+    """
+    Indicateurs clés d'une sélection (moyennes et taux à NaN si elle est vide).
+    Les taux sont exprimés en pourcentage ; customers_error est l'erreur
+    relative type du nombre de clients et median_basket_error l'erreur
+    relative maximale du panier médian (0 s'ils sont exacts).
+    """
+    purchases: int
+    customers: int
+    customers_error: float
+    revenue: float
+    avg_basket: float
+    median_basket: float
+    median_basket_error: float
+    max_basket: float
+    avg_age: float
+    avg_rating: float
+    subscription_rate: float
+    no_promo_rate: float
+    subscriber_basket: float
+    non_subscriber_basket: float
+    n_categories: int
+    top_category: Optional[str]
+    top_payment_method: Optional[str]
+    top_shipping_type: Optional[str]
+
+
+class RowKpis(NamedTuple):
+    """
+    Indicateurs qui portent sur des colonnes hors du cube (onglets de app.py).
+    """
+    distinct_items: int
+    top_color: Optional[str]
+    discount_rate: float
+    avg_previous_purchases: float
+    returning_rate: float
+
+
+class DistinctIndex:
+    """
+    Index de comptage des valeurs distinctes d'une colonne (Customer ID).
+
+    Les valeurs sont codées une fois par version en entiers denses 0..k-1.
+    Quand chaque ligne porte une valeur différente (un achat par client), le
+    nombre de valeurs distinctes d'une sélection est son nombre de lignes, lu
+    sur le bitmap sans aucun parcours ; sinon les codes des lignes retenues
+    sont marqués dans un tableau de k booléens.
+    """
+
+    def __init__(self, values):
+        self.codes, uniques = pd.factorize(values)
+        self.n_distinct = len(uniques)
+        self.unique_per_row = self.n_distinct == len(self.codes)
+
+    def count(self, selection):
+        if self.unique_per_row:
+            return len(selection)
+        if selection.all:
+            return self.n_distinct
+        seen = np.zeros(self.n_distinct, dtype=bool)
+        seen[self.codes[selection.rows()]] = True
+        return int(np.count_nonzero(seen))
+
+
+@data_cache
+@st.cache_resource
+def _build_customer_index(path, version):
+    return DistinctIndex(load_data(['Customer ID'], path)['Customer ID'].to_numpy())
+
+
+def load_customer_index(path=DATA_PATH):
+    return _build_customer_index(path, dataset_version(path))
+
+
+@data_cache
+@st.cache_resource
+def _build_customer_sketch(path, version):
+    df = load_data(['Customer ID', *SKETCH_DIMENSIONS], path)
+    return DistinctSketch(df, 'Customer ID', SKETCH_DIMENSIONS)
+
+
+# Sketches HyperLogLog des clients par cellule, construits une fois par version
+def load_customer_sketch(path=DATA_PATH):
+    return _build_customer_sketch(path, dataset_version(path))
+
+
+# Nombre de clients distincts de la sélection et son erreur relative type,
+# selon le moteur de requêtes et le mode de comptage : les sketches ne
+# servent que si un client peut apparaître sur plusieurs lignes et que les
+# filtres portent sur leurs dimensions (sinon le comptage exact est gratuit
+# ou seul possible)
+def _count_customers(filter_index, selections, path):
+    active = filter_index.normalize(selections)
+    if QUERY_BACKEND == 'aggregates':
+        customers = query_distinct('Customer ID', active, path)
+        return customers, load_aggregates(path).distinct_error(active) if customers else 0.0
+    if QUERY_BACKEND != 'pandas':
+        return query_distinct('Customer ID', active, path), 0.0
+    index = load_customer_index(path)
+    if (DISTINCT_MODE == 'sketch' and active and not index.unique_per_row
+            and all(column in SKETCH_DIMENSIONS for column, _ in active)):
+        sketch = load_customer_sketch(path)
+        customers = sketch.count(dict(active))
+        return customers, sketch.error if customers else 0.0
+    return index.count(filter_index.select(selections)), 0.0
+
+
+# Panier médian de la sélection et son erreur relative maximale : médiane des
+# sketches de quantiles des cellules retenues quand ils couvrent les filtres,
+# sinon médiane exacte des lignes (ou des effectifs du moteur de requêtes)
+def _median_basket(filter_index, selections, path):
+    column = 'Purchase Amount (USD)'
+    active = filter_index.normalize(selections)
+    sketch = select_quantile_sketch(column, None, active, path)
+    if sketch is not None:
+        median = sketch.quantile(0.5, dict(active))
+        return median, 0.0 if np.isnan(median) else sketch.error
+    if QUERY_BACKEND != 'pandas':
+        values, _, weights = query_value_counts(column, None, active, path)
+        return weighted_quantile(values, weights, 0.5), 0.0
+    return float(load_selection([column], selections, path)[column].median()), 0.0
+
+
+def median_help(kpis):
+    """Infobulle du panier médian : son erreur maximale quand il est estimé."""
+    if not kpis.median_basket_error:
+        return None
+    return (f"Estimation par sketch de quantiles, à ± {kpis.median_basket_error:.0%} près "
+            f"(DASHBOARD_QUANTILES=exact pour un calcul exact)")
+
+
+def customers_help(kpis):
+    """Infobulle du nombre de clients : son erreur type quand il est estimé."""
+    if not kpis.customers_error:
+        return None
+    return (f"Estimation HyperLogLog, erreur type ± {kpis.customers_error:.1%} "
+            f"(DASHBOARD_DISTINCT=exact pour un comptage exact)")
+
+
+# Part (en %) des lignes dont la dimension vaut `value`, à partir des effectifs
+def _share(counts, categories, index, value, total):
+    positions = [i for i, code in enumerate(index) if categories[code] == value]
+    if not total:
+        return float('nan')
+    return float(counts[positions].sum()) / total * 100 if positions else 0.0
+
+
+# Modalité la plus fréquente (None si la tranche est vide)
+def _top(counts, categories, index):
+    if not counts.sum():
+        return None
+    return categories[index[int(counts.argmax())]]
+
+
+def compute_kpis(view, customers, customers_error=0.0, median_basket=float('nan'), median_basket_error=0.0):
+    """
+    Calcule tous les indicateurs d'une tranche du cube en un seul passage.
+
+    Les tableaux du cube sont découpés une fois ; chaque indicateur est
+    ensuite une réduction de ces quelques milliers de cellules, sans relire
+    les lignes.
+
+    Args:
+        view (CubeView): Tranche du cube pour la sélection
+        customers (int): Nombre de clients distincts de la sélection
+        customers_error (float): Erreur relative type de ce nombre (0 s'il est exact)
+        median_basket (float): Montant médian de la sélection (hors du cube)
+        median_basket_error (float): Erreur relative maximale de ce montant
+
+    Returns:
+        Kpis: Les indicateurs clés
+    """
+    cube = view.cube
+    axes = {d: i for i, d in enumerate(cube.dimensions)}
+    count = view.cells(cube.count)
+    amount = {stat: view.cells(cube.stats['Purchase Amount (USD)'][stat]) for stat in ('sum', 'max')}
+    total = int(count.sum())
+
+    def marginal(array, dimension):
+        axis = axes[dimension]
+        return array.sum(axis=tuple(i for i in range(array.ndim) if i != axis))
+
+    def labels(dimension):
+        return cube.categories[axes[dimension]], view.index[axes[dimension]]
+
+    def mean(array, weights):
+        return float(array.sum() / weights.sum()) if weights.sum() else float('nan')
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        by_subscription = marginal(count, 'Subscription Status')
+        amount_by_subscription = marginal(amount['sum'], 'Subscription Status')
+        categories, index = labels('Subscription Status')
+        subscriber = np.array([categories[code] == 'Yes' for code in index], dtype=bool)
+        by_category = marginal(count, 'Category')
+
+        return Kpis(
+            purchases=total,
+            # Un client a au moins un achat : une estimation est bornée
+            customers=min(customers, total),
+            customers_error=customers_error,
+            revenue=float(amount['sum'].sum()),
+            avg_basket=mean(amount['sum'], count),
+            median_basket=median_basket,
+            median_basket_error=median_basket_error,
+            max_basket=float(amount['max'].max()) if total else float('nan'),
+            avg_age=mean(view.cells(cube.stats['Age']['sum']), count),
+            avg_rating=mean(view.cells(cube.stats['Review Rating']['sum']), count),
+            subscription_rate=_share(by_subscription, categories, index, 'Yes', total),
+            no_promo_rate=_share(marginal(count, 'Promo Code Used'), *labels('Promo Code Used'), 'No', total),
+            subscriber_basket=mean(amount_by_subscription[subscriber], by_subscription[subscriber]),
+            non_subscriber_basket=mean(amount_by_subscription[~subscriber], by_subscription[~subscriber]),
+            n_categories=int(np.count_nonzero(by_category)),
+            top_category=_top(by_category, *labels('Category')),
+            top_payment_method=_top(marginal(count, 'Payment Method'), *labels('Payment Method')),
+            top_shipping_type=_top(marginal(count, 'Shipping Type'), *labels('Shipping Type'))
+        )
+
+
+def compute_row_kpis(df):
+    """
+    Calcule en un passage les indicateurs portant sur des colonnes hors du
+    cube : chaque colonne catégorielle est comptée par un seul np.bincount
+    sur ses codes, d'où l'on tire à la fois le nombre de valeurs distinctes,
+    la valeur la plus fréquente et les taux.
+
+    Args:
+        df (pandas.DataFrame): Lignes sélectionnées (Item Purchased, Color,
+            Discount Applied, Previous Purchases)
+
+    Returns:
+        RowKpis: Les indicateurs
+    """
+    def counts(column):
+        series = df[column]
+        return pd.Series(
+            np.bincount(series.cat.codes.to_numpy() + 1, minlength=len(series.cat.categories) + 1)[1:],
+            index=series.cat.categories
+        )
+
+    previous = df['Previous Purchases'].to_numpy()
+    return _row_kpis(
+        counts('Item Purchased'), counts('Color'), counts('Discount Applied'),
+        previous, np.ones(len(previous), dtype=np.int64)
+    )
+
+
+# Indicateurs hors cube à partir des effectifs par modalité (Series indexées
+# par les catégories triées) et des valeurs d'achats précédents pondérées
+def _row_kpis(items, colors, discount, previous, weights):
+    n = int(weights.sum())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return RowKpis(
+            distinct_items=int(np.count_nonzero(items.to_numpy())),
+            top_color=colors.index[colors.to_numpy().argmax()] if n else None,
+            discount_rate=float(discount['Yes'] / n * 100) if 'Yes' in discount.index else 0.0,
+            avg_previous_purchases=float(previous @ weights / n) if n else float('nan'),
+            returning_rate=float(weights[previous > 0].sum() / n * 100) if n else float('nan')
+        )
+
+
+# Mêmes indicateurs à partir des effectifs retournés par le moteur de requêtes
+def _row_kpis_from_counts(active, path):
+    def counts(column):
+        cells = query_cells([column], [], active, path)
+        return pd.Series(cells['count'].to_numpy(), index=cells[column].to_numpy()).reindex(
+            load_categories(column, path), fill_value=0
+        )
+
+    previous, _, weights = query_value_counts('Previous Purchases', None, active, path)
+    return _row_kpis(
+        counts('Item Purchased'), counts('Color'), counts('Discount Applied'),
+        np.asarray(previous), np.asarray(weights, dtype=np.int64)
+    )
+
+
+def get_kpis(selections, path=DATA_PATH):
+    """
+    Retourne les indicateurs clés pour les filtres de la sidebar.
+
+    Tous les indicateurs d'une page sont calculés ensemble à partir de la
+    tranche du cube ; le nombre de clients distincts vient de l'index
+    DistinctIndex ou, si des clients reviennent, de l'union des sketches
+    HyperLogLog des cellules retenues (d'une requête backend.query_distinct
+    avec les autres moteurs), le panier médian des sketches de quantiles.
+    Le résultat est mis en cache avec les autres agrégats.
+
+    Args:
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        Kpis: Les indicateurs clés
+    """
+    filter_index = load_filter_index(path)
+    key = (('kpis',), dataset_version(path), filter_index.normalize(selections))
+    return aggregate_cache.get(key, lambda: compute_kpis(
+        load_cube_view(selections, path),
+        *_count_customers(filter_index, selections, path),
+        *_median_basket(filter_index, selections, path)
+    ))
+
+
+def get_row_kpis(selections, path=DATA_PATH):
+    """
+    Retourne les indicateurs hors cube (produits, couleurs, remises, achats
+    précédents), calculés en un passage sur les lignes sélectionnées (ou sur
+    les effectifs retournés par le moteur de requêtes) et mis en cache.
+
+    Returns:
+        RowKpis: Les indicateurs
+    """
+    filter_index = load_filter_index(path)
+    key = (('row_kpis',), dataset_version(path), filter_index.normalize(selections))
+    columns = ['Item Purchased', 'Color', 'Discount Applied', 'Previous Purchases']
+    if QUERY_BACKEND != 'pandas':
+        return aggregate_cache.get(key, lambda: _row_kpis_from_counts(key[2], path))
+    return aggregate_cache.get(key, lambda: compute_row_kpis(load_selection(columns, selections, path)))
@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from utils import load_css, styled_container, styled_title, styled_subheader
+from filters import load_filter_index, sidebar_filters
+from kpis import customers_help, get_kpis
+from aggregates import get_aggregates, get_histogram
+from figures import cached_figure
 
 # Configuration de la page
 st.set_page_config(page_title="Analyse Client", page_icon="👥", layout="wide")
@@ -9,13 +12,8 @@ st.set_page_config(page_title="Analyse Client", page_icon="👥", layout="wide")
 # Chargement du CSS
 load_css()
 
-# Chargement des données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('shopping_trends.csv')
-    return df
-
-df = load_data()
+# Index des filtres (la page ne lit que des agrégats)
+filter_index = load_filter_index()
 
 # Titre de la page
 styled_title("👥 Analyse Client")
@@ -28,35 +26,30 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    selected_category = st.multiselect(
-        "Catégorie de Produits",
-        options=df['Category'].unique(),
-        default=df['Category'].unique()
-    )
-
-    selected_season = st.multiselect(
-        "Saison",
-        options=df['Season'].unique(),
-        default=df['Season'].unique()
-    )
-
-# Filtrage des données
-df_filtered = df[
-    (df['Category'].isin(selected_category)) &
-    (df['Season'].isin(selected_season))
-]
+    selections = sidebar_filters(filter_index)
+
+# Indicateurs clés, calculés en un passage sur le cube
+kpis = get_kpis(selections)
+
+# Agrégats affichés par la page, calculés ensemble avant les graphiques
+aggregates = get_aggregates([
+    'sales_by_gender',
+    'sales_by_size',
+    'sales_by_color',
+    'sales_by_frequency'
+], selections)
 
 # Métriques clés
 with styled_container():
     col1, col2, col3 = st.columns(3)
     with col1:
-        total_customers = len(df_filtered['Customer ID'].unique()) if not df_filtered.empty else 0
-        st.metric("Nombre Total de Clients", f"{total_customers:,}")
+        total_customers = kpis.customers
+        st.metric("Nombre Total de Clients", f"{total_customers:,}", help=customers_help(kpis))
     with col2:
-        avg_age = df_filtered['Age'].mean() if not df_filtered.empty else 0
+        avg_age = kpis.avg_age if kpis.purchases else 0
         st.metric("Âge Moyen", f"{avg_age:.1f} ans")
     with col3:
-        subscription_rate = (df_filtered['Subscription Status'] == 'Yes').mean() * 100 if not df_filtered.empty else 0
+        subscription_rate = kpis.subscription_rate if kpis.purchases else 0
         st.metric("Taux d'Abonnement", f"{subscription_rate:.1f}%")
 
 # Distribution démographique
@@ -66,40 +59,50 @@ with styled_container():
     
     with col1:
         # Pyramide des âges par genre
-        fig_age_gender = px.histogram(
-            df_filtered,
-            x='Age',
-            color='Gender',
-            barmode='group',
-            title='Distribution des Âges par Genre',
-            labels={'Age': 'Âge', 'count': 'Nombre de Clients'},
-            color_discrete_sequence=['#1E88E5', '#5E35B1']
-        )
-        fig_age_gender.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_age_gender():
+            fig_age_gender = get_histogram('Age', selections, color='Gender').figure(
+                title='Distribution des Âges par Genre',
+                labels={'Age': 'Âge', 'count': 'Nombre de Clients'},
+                x='Age',
+                color='Gender',
+                color_discrete_sequence=['#1E88E5', '#5E35B1']
+            )
+            fig_age_gender.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_age_gender
+
+        st.plotly_chart(
+            cached_figure('01_Analyse_Client/fig_age_gender', selections, build_age_gender),
+            use_container_width=True, key="age_gender_hist"
         )
-        st.plotly_chart(fig_age_gender, use_container_width=True, key="age_gender_hist")
 
     with col2:
         # Répartition par genre
-        gender_dist = df_filtered['Gender'].value_counts().reset_index()
-        gender_dist.columns = ['Genre', 'Nombre']
-        fig_gender = px.pie(
-            gender_dist,
-            values='Nombre',
-            names='Genre',
-            title='Répartition par Genre',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1']
-        )
-        fig_gender.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_gender():
+            gender_dist = aggregates['sales_by_gender']
+            gender_dist.columns = ['Genre', 'Nombre']
+            fig_gender = px.pie(
+                gender_dist,
+                values='Nombre',
+                names='Genre',
+                title='Répartition par Genre',
+                hole=0.6,
+                color_discrete_sequence=['#1E88E5', '#5E35B1']
+            )
+            fig_gender.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_gender
+
+        st.plotly_chart(
+            cached_figure('01_Analyse_Client/fig_gender', selections, build_gender),
+            use_container_width=True, key="gender_pie"
         )
-        st.plotly_chart(fig_gender, use_container_width=True, key="gender_pie")
 
 # Analyse des préférences
 styled_subheader("🎯 Préférences Client")
@@ -108,58 +111,76 @@ with styled_container():
     
     with col1:
         # Taille préférée
-        size_dist = df_filtered['Size'].value_counts().reset_index()
-        size_dist.columns = ['Taille', 'Nombre']
-        fig_size = px.pie(
-            size_dist,
-            values='Nombre',
-            names='Taille',
-            title='Répartition des Tailles',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_size.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_size():
+            size_dist = aggregates['sales_by_size']
+            size_dist.columns = ['Taille', 'Nombre']
+            fig_size = px.pie(
+                size_dist,
+                values='Nombre',
+                names='Taille',
+                title='Répartition des Tailles',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_size.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_size
+
+        st.plotly_chart(
+            cached_figure('01_Analyse_Client/fig_size', selections, build_size),
+            use_container_width=True, key="size_pie"
         )
-        st.plotly_chart(fig_size, use_container_width=True, key="size_pie")
 
     with col2:
         # Couleur préférée
-        color_dist = df_filtered['Color'].value_counts().reset_index()
-        color_dist.columns = ['Couleur', 'Nombre']
-        fig_color = px.pie(
-            color_dist,
-            values='Nombre',
-            names='Couleur',
-            title='Répartition des Couleurs',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_color.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_color():
+            color_dist = aggregates['sales_by_color']
+            color_dist.columns = ['Couleur', 'Nombre']
+            fig_color = px.pie(
+                color_dist,
+                values='Nombre',
+                names='Couleur',
+                title='Répartition des Couleurs',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_color.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_color
+
+        st.plotly_chart(
+            cached_figure('01_Analyse_Client/fig_color', selections, build_color),
+            use_container_width=True, key="color_pie"
         )
-        st.plotly_chart(fig_color, use_container_width=True, key="color_pie")
 
 # Analyse comportementale
 styled_subheader("🔄 Comportement d'Achat")
 with styled_container():
     # Fréquence d'achat
-    purchase_freq = df_filtered['Frequency of Purchases'].value_counts().reset_index()
-    purchase_freq.columns = ['Fréquence', 'Nombre']
-    fig_freq = px.bar(
-        purchase_freq,
-        x='Fréquence',
-        y='Nombre',
-        title='Fréquence des Achats',
-        color='Fréquence',
-        color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-    )
-    fig_freq.update_layout(
-        showlegend=False,
-        margin=dict(t=30, l=0, r=0, b=0),
-        xaxis_title="Fréquence d'Achat",
-        yaxis_title="Nombre de Clients"
-    )
-    st.plotly_chart(fig_freq, use_container_width=True, key="freq_bar")
\ No newline at end of file
+    def build_freq():
+        purchase_freq = aggregates['sales_by_frequency']
+        purchase_freq.columns = ['Fréquence', 'Nombre']
+        fig_freq = px.bar(
+            purchase_freq,
+            x='Fréquence',
+            y='Nombre',
+            title='Fréquence des Achats',
+            color='Fréquence',
+            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+        )
+        fig_freq.update_layout(
+            showlegend=False,
+            margin=dict(t=30, l=0, r=0, b=0),
+            xaxis_title="Fréquence d'Achat",
+            yaxis_title="Nombre de Clients"
+        )
+        return fig_freq
+
+    st.plotly_chart(
+        cached_figure('01_Analyse_Client/fig_freq', selections, build_freq),
+        use_container_width=True, key="freq_bar"
+    )
\ No newline at end of file
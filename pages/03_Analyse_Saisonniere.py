@@ -1,7 +1,9 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from utils import load_css, styled_container, styled_title, styled_subheader
+from filters import load_filter_index, sidebar_filters
+from aggregates import get_aggregates, get_boxplot
+from figures import cached_figure
 
 # Configuration de la page
 st.set_page_config(page_title="Analyse Saisonnière", page_icon="🌤️", layout="wide")
@@ -9,13 +11,8 @@ st.set_page_config(page_title="Analyse Saisonnière", page_icon="🌤️", layou
 # Chargement du CSS
 load_css()
 
-# Chargement des données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('shopping_trends.csv')
-    return df
-
-df = load_data()
+# Index des filtres (la page ne lit que des agrégats)
+filter_index = load_filter_index()
 
 # Titre de la page
 styled_title("🌤️ Analyse Saisonnière")
@@ -28,33 +25,26 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    selected_category = st.multiselect(
-        "Catégorie de Produits",
-        options=df['Category'].unique(),
-        default=df['Category'].unique()
-    )
-
-    selected_season = st.multiselect(
-        "Saison",
-        options=df['Season'].unique(),
-        default=df['Season'].unique()
-    )
+    selections = sidebar_filters(filter_index)
 
-# Filtrage des données
-df_filtered = df[
-    (df['Category'].isin(selected_category)) &
-    (df['Season'].isin(selected_season))
-]
+# Agrégats affichés par la page, calculés ensemble avant les graphiques
+aggregates = get_aggregates([
+    'avg_basket_by_season',
+    'sales_by_season',
+    'revenue_by_season',
+    'category_season_matrix',
+    'avg_basket_by_season_category'
+], selections)
 
 # Métriques clés par saison
 with styled_container():
-    seasons = df_filtered['Season'].unique()
+    season_means = aggregates['avg_basket_by_season'].set_index('Season')
+    seasons = [season for season in filter_index.options['Season'] if season in season_means.index]
     cols = st.columns(len(seasons))
     
     for idx, season in enumerate(seasons):
         with cols[idx]:
-            season_data = df_filtered[df_filtered['Season'] == season]
-            avg_amount = season_data['Purchase Amount (USD)'].mean()
+            avg_amount = season_means.loc[season, 'Purchase Amount (USD)']
             st.metric(f"Moyenne {season}", f"${avg_amount:,.2f}")
 
 # Tendances saisonnières
@@ -64,53 +54,72 @@ with styled_container():
     
     with col1:
         # Volume de ventes par saison
-        season_sales = df_filtered['Season'].value_counts().reset_index()
-        season_sales.columns = ['Saison', 'Nombre de Ventes']
-        fig_season = px.bar(
-            season_sales,
-            x='Saison',
-            y='Nombre de Ventes',
-            title='Volume de Ventes par Saison',
-            color='Saison',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_season.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_season():
+            season_sales = aggregates['sales_by_season']
+            season_sales.columns = ['Saison', 'Nombre de Ventes']
+            fig_season = px.bar(
+                season_sales,
+                x='Saison',
+                y='Nombre de Ventes',
+                title='Volume de Ventes par Saison',
+                color='Saison',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_season.update_layout(
+                showlegend=False,
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_season
+
+        st.plotly_chart(
+            cached_figure('03_Analyse_Saisonniere/fig_season', selections, build_season),
+            use_container_width=True
         )
-        st.plotly_chart(fig_season, use_container_width=True)
 
     with col2:
         # Revenus par saison
-        season_revenue = df_filtered.groupby('Season')['Purchase Amount (USD)'].sum().reset_index()
-        season_revenue.columns = ['Saison', 'Revenus']
-        fig_revenue = px.bar(
-            season_revenue,
-            x='Saison',
-            y='Revenus',
-            title='Revenus par Saison (USD)',
-            color='Saison',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_revenue.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_revenue():
+            season_revenue = aggregates['revenue_by_season']
+            season_revenue.columns = ['Saison', 'Revenus']
+            fig_revenue = px.bar(
+                season_revenue,
+                x='Saison',
+                y='Revenus',
+                title='Revenus par Saison (USD)',
+                color='Saison',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_revenue.update_layout(
+                showlegend=False,
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_revenue
+
+        st.plotly_chart(
+            cached_figure('03_Analyse_Saisonniere/fig_revenue', selections, build_revenue),
+            use_container_width=True
         )
-        st.plotly_chart(fig_revenue, use_container_width=True)
 
 # Analyse des catégories par saison
 styled_subheader("🎯 Performance des Catégories par Saison")
 with styled_container():
     # Heatmap des ventes par catégorie et saison
-    category_season = pd.crosstab(df_filtered['Category'], df_filtered['Season'])
-    fig_heatmap = px.imshow(
-        category_season,
-        title='Distribution des Ventes par Catégorie et Saison',
-        labels=dict(x="Saison", y="Catégorie", color="Nombre de Ventes"),
-        color_continuous_scale=['#E3F2FD', '#1E88E5']
+    category_season = aggregates['category_season_matrix']
+
+    def build_heatmap():
+        fig_heatmap = category_season.figure(
+            title='Distribution des Ventes par Catégorie et Saison',
+            labels=dict(x="Saison", y="Catégorie", color="Nombre de Ventes"),
+            color_continuous_scale=['#E3F2FD', '#1E88E5']
+        )
+        fig_heatmap.update_layout(margin=dict(t=30, l=0, r=0, b=0))
+        return fig_heatmap
+
+    st.plotly_chart(
+        cached_figure('03_Analyse_Saisonniere/fig_heatmap', selections, build_heatmap),
+        use_container_width=True
     )
-    fig_heatmap.update_layout(margin=dict(t=30, l=0, r=0, b=0))
-    st.plotly_chart(fig_heatmap, use_container_width=True)
+    st.caption(category_season.describe())
 
 # Analyse des prix par saison
 styled_subheader("💰 Analyse des Prix Saisonniers")
@@ -119,34 +128,44 @@ with styled_container():
     
     with col1:
         # Distribution des prix par saison
-        fig_price_dist = px.box(
-            df_filtered,
-            x='Season',
-            y='Purchase Amount (USD)',
-            title='Distribution des Prix par Saison',
-            color='Season',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_price_dist.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_price_dist():
+            fig_price_dist = get_boxplot('Purchase Amount (USD)', 'Season', selections).figure(
+                title='Distribution des Prix par Saison',
+                x='Season',
+                y='Purchase Amount (USD)',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_price_dist.update_layout(
+                showlegend=False,
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_price_dist
+
+        st.plotly_chart(
+            cached_figure('03_Analyse_Saisonniere/fig_price_dist', selections, build_price_dist),
+            use_container_width=True
         )
-        st.plotly_chart(fig_price_dist, use_container_width=True)
 
     with col2:
         # Prix moyen par saison et catégorie
-        avg_price = df_filtered.groupby(['Season', 'Category'])['Purchase Amount (USD)'].mean().reset_index()
-        fig_avg_price = px.bar(
-            avg_price,
-            x='Season',
-            y='Purchase Amount (USD)',
-            color='Category',
-            title='Prix Moyen par Saison et Catégorie',
-            barmode='group',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_avg_price.update_layout(
-            legend=dict(orientation="h", y=-0.2),
-            margin=dict(t=30, l=0, r=0, b=0)
-        )
-        st.plotly_chart(fig_avg_price, use_container_width=True)
\ No newline at end of file
+        def build_avg_price():
+            avg_price = aggregates['avg_basket_by_season_category']
+            fig_avg_price = px.bar(
+                avg_price,
+                x='Season',
+                y='Purchase Amount (USD)',
+                color='Category',
+                title='Prix Moyen par Saison et Catégorie',
+                barmode='group',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_avg_price.update_layout(
+                legend=dict(orientation="h", y=-0.2),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_avg_price
+
+        st.plotly_chart(
+            cached_figure('03_Analyse_Saisonniere/fig_avg_price', selections, build_avg_price),
+            use_container_width=True
+        )
\ No newline at end of file
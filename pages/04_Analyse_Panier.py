@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from utils import load_css, styled_container, styled_title, styled_subheader
+from filters import load_filter_index, sidebar_filters
+from kpis import get_kpis, median_help
+from aggregates import get_aggregates, get_boxplot
+from figures import cached_figure
 
 # Configuration de la page
 st.set_page_config(page_title="Analyse Panier", page_icon="🛒", layout="wide")
@@ -9,13 +12,8 @@ st.set_page_config(page_title="Analyse Panier", page_icon="🛒", layout="wide")
 # Chargement du CSS
 load_css()
 
-# Chargement des données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('shopping_trends.csv')
-    return df
-
-df = load_data()
+# Index des filtres (la page ne lit que des agrégats)
+filter_index = load_filter_index()
 
 # Titre de la page
 styled_title("🛒 Analyse du Panier")
@@ -28,39 +26,39 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    selected_category = st.multiselect(
-        "Catégorie de Produits",
-        options=df['Category'].unique(),
-        default=df['Category'].unique()
-    )
-
-    selected_season = st.multiselect(
-        "Saison",
-        options=df['Season'].unique(),
-        default=df['Season'].unique()
-    )
-
-# Filtrage des données
-df_filtered = df[
-    (df['Category'].isin(selected_category)) &
-    (df['Season'].isin(selected_season))
-]
+    selections = sidebar_filters(filter_index)
+
+# Indicateurs clés, calculés en un passage sur le cube
+kpis = get_kpis(selections)
+
+# Agrégats affichés par la page, calculés ensemble avant les graphiques
+aggregates = get_aggregates([
+    'avg_basket_by_category',
+    'sales_by_frequency',
+    'avg_basket_by_frequency',
+    'sales_by_payment_method',
+    'avg_basket_by_payment_method'
+], selections)
 
 # Métriques clés
 with styled_container():
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        avg_basket = df_filtered['Purchase Amount (USD)'].mean()
+        avg_basket = kpis.avg_basket
         st.metric("Panier Moyen", f"${avg_basket:,.2f}")
     
     with col2:
-        total_sales = df_filtered['Purchase Amount (USD)'].sum()
+        total_sales = kpis.revenue
         st.metric("Ventes Totales", f"${total_sales:,.2f}")
     
     with col3:
-        max_basket = df_filtered['Purchase Amount (USD)'].max()
+        max_basket = kpis.max_basket
         st.metric("Panier Maximum", f"${max_basket:,.2f}")
+    
+    with col4:
+        median_basket = kpis.median_basket
+        st.metric("Panier Médian", f"${median_basket:,.2f}", help=median_help(kpis))
 
 # Analyse du panier par catégorie
 styled_subheader("📊 Performance par Catégorie")
@@ -69,37 +67,47 @@ with styled_container():
     
     with col1:
         # Distribution des montants d'achat par catégorie
-        fig_amount_dist = px.box(
-            df_filtered,
-            x='Category',
-            y='Purchase Amount (USD)',
-            title='Distribution des Montants par Catégorie',
-            color='Category',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_amount_dist.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_amount_dist():
+            fig_amount_dist = get_boxplot('Purchase Amount (USD)', 'Category', selections).figure(
+                title='Distribution des Montants par Catégorie',
+                x='Category',
+                y='Purchase Amount (USD)',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_amount_dist.update_layout(
+                showlegend=False,
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_amount_dist
+
+        st.plotly_chart(
+            cached_figure('04_Analyse_Panier/fig_amount_dist', selections, build_amount_dist),
+            use_container_width=True
         )
-        st.plotly_chart(fig_amount_dist, use_container_width=True)
 
     with col2:
         # Montant moyen par catégorie
-        avg_amount = df_filtered.groupby('Category')['Purchase Amount (USD)'].mean().reset_index()
-        avg_amount.columns = ['Catégorie', 'Montant Moyen']
-        fig_avg_amount = px.bar(
-            avg_amount,
-            x='Catégorie',
-            y='Montant Moyen',
-            title='Montant Moyen par Catégorie',
-            color='Catégorie',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_avg_amount.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_avg_amount():
+            avg_amount = aggregates['avg_basket_by_category']
+            avg_amount.columns = ['Catégorie', 'Montant Moyen']
+            fig_avg_amount = px.bar(
+                avg_amount,
+                x='Catégorie',
+                y='Montant Moyen',
+                title='Montant Moyen par Catégorie',
+                color='Catégorie',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_avg_amount.update_layout(
+                showlegend=False,
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_avg_amount
+
+        st.plotly_chart(
+            cached_figure('04_Analyse_Panier/fig_avg_amount', selections, build_avg_amount),
+            use_container_width=True
         )
-        st.plotly_chart(fig_avg_amount, use_container_width=True)
 
 # Analyse des fréquences d'achat
 styled_subheader("🔄 Fréquence d'Achat")
@@ -108,39 +116,51 @@ with styled_container():
     
     with col1:
         # Distribution des fréquences d'achat
-        freq_dist = df_filtered['Frequency of Purchases'].value_counts().reset_index()
-        freq_dist.columns = ['Fréquence', 'Nombre']
-        fig_freq = px.pie(
-            freq_dist,
-            values='Nombre',
-            names='Fréquence',
-            title='Répartition des Fréquences d\'Achat',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_freq.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.2),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_freq():
+            freq_dist = aggregates['sales_by_frequency']
+            freq_dist.columns = ['Fréquence', 'Nombre']
+            fig_freq = px.pie(
+                freq_dist,
+                values='Nombre',
+                names='Fréquence',
+                title='Répartition des Fréquences d\'Achat',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_freq.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.2),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_freq
+
+        st.plotly_chart(
+            cached_figure('04_Analyse_Panier/fig_freq', selections, build_freq),
+            use_container_width=True
         )
-        st.plotly_chart(fig_freq, use_container_width=True)
 
     with col2:
         # Montant moyen par fréquence d'achat
-        avg_amount_freq = df_filtered.groupby('Frequency of Purchases')['Purchase Amount (USD)'].mean().reset_index()
-        avg_amount_freq.columns = ['Fréquence', 'Montant Moyen']
-        fig_avg_freq = px.bar(
-            avg_amount_freq,
-            x='Fréquence',
-            y='Montant Moyen',
-            title='Montant Moyen par Fréquence d\'Achat',
-            color='Fréquence',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_avg_freq.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_avg_freq():
+            avg_amount_freq = aggregates['avg_basket_by_frequency']
+            avg_amount_freq.columns = ['Fréquence', 'Montant Moyen']
+            fig_avg_freq = px.bar(
+                avg_amount_freq,
+                x='Fréquence',
+                y='Montant Moyen',
+                title='Montant Moyen par Fréquence d\'Achat',
+                color='Fréquence',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_avg_freq.update_layout(
+                showlegend=False,
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_avg_freq
+
+        st.plotly_chart(
+            cached_figure('04_Analyse_Panier/fig_avg_freq', selections, build_avg_freq),
+            use_container_width=True
         )
-        st.plotly_chart(fig_avg_freq, use_container_width=True)
 
 # Analyse des modes de paiement
 styled_subheader("💳 Modes de Paiement")
@@ -149,36 +169,48 @@ with styled_container():
     
     with col1:
         # Distribution des modes de paiement
-        payment_dist = df_filtered['Payment Method'].value_counts().reset_index()
-        payment_dist.columns = ['Mode de Paiement', 'Nombre']
-        fig_payment = px.pie(
-            payment_dist,
-            values='Nombre',
-            names='Mode de Paiement',
-            title='Répartition des Modes de Paiement',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_payment.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.2),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_payment():
+            payment_dist = aggregates['sales_by_payment_method']
+            payment_dist.columns = ['Mode de Paiement', 'Nombre']
+            fig_payment = px.pie(
+                payment_dist,
+                values='Nombre',
+                names='Mode de Paiement',
+                title='Répartition des Modes de Paiement',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_payment.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.2),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_payment
+
+        st.plotly_chart(
+            cached_figure('04_Analyse_Panier/fig_payment', selections, build_payment),
+            use_container_width=True
         )
-        st.plotly_chart(fig_payment, use_container_width=True)
 
     with col2:
         # Montant moyen par mode de paiement
-        avg_amount_payment = df_filtered.groupby('Payment Method')['Purchase Amount (USD)'].mean().reset_index()
-        avg_amount_payment.columns = ['Mode de Paiement', 'Montant Moyen']
-        fig_avg_payment = px.bar(
-            avg_amount_payment,
-            x='Mode de Paiement',
-            y='Montant Moyen',
-            title='Montant Moyen par Mode de Paiement',
-            color='Mode de Paiement',
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_avg_payment.update_layout(
-            showlegend=False,
-            margin=dict(t=30, l=0, r=0, b=0)
-        )
-        st.plotly_chart(fig_avg_payment, use_container_width=True)
\ No newline at end of file
+        def build_avg_payment():
+            avg_amount_payment = aggregates['avg_basket_by_payment_method']
+            avg_amount_payment.columns = ['Mode de Paiement', 'Montant Moyen']
+            fig_avg_payment = px.bar(
+                avg_amount_payment,
+                x='Mode de Paiement',
+                y='Montant Moyen',
+                title='Montant Moyen par Mode de Paiement',
+                color='Mode de Paiement',
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_avg_payment.update_layout(
+                showlegend=False,
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_avg_payment
+
+        st.plotly_chart(
+            cached_figure('04_Analyse_Panier/fig_avg_payment', selections, build_avg_payment),
+            use_container_width=True
+        )
\ No newline at end of file
@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from utils import load_css, styled_container, styled_title, styled_subheader
+from filters import load_filter_index, sidebar_filters
+from kpis import get_kpis
+from aggregates import get_aggregates
+from figures import cached_figure
 
 # Configuration de la page
 st.set_page_config(page_title="Paiement et Livraison", page_icon="💳", layout="wide")
@@ -9,13 +12,8 @@ st.set_page_config(page_title="Paiement et Livraison", page_icon="💳", layout=
 # Chargement du CSS
 load_css()
 
-# Chargement des données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('shopping_trends.csv')
-    return df
-
-df = load_data()
+# Index des filtres (la page ne lit que des agrégats du cube)
+filter_index = load_filter_index()
 
 # Titre de la page
 styled_title("💳 Analyse des Paiements et Livraisons")
@@ -28,32 +26,27 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    selected_category = st.multiselect(
-        "Catégorie de Produits",
-        options=df['Category'].unique(),
-        default=df['Category'].unique()
-    )
+    selections = sidebar_filters(filter_index)
 
-    selected_season = st.multiselect(
-        "Saison",
-        options=df['Season'].unique(),
-        default=df['Season'].unique()
-    )
+# Indicateurs clés, calculés en un passage sur le cube
+kpis = get_kpis(selections)
 
-# Filtrage des données
-df_filtered = df[
-    (df['Category'].isin(selected_category)) &
-    (df['Season'].isin(selected_season))
-]
+# Agrégats affichés par la page, calculés ensemble avant les graphiques
+aggregates = get_aggregates([
+    'sales_by_payment_method',
+    'sales_by_shipping_type',
+    'avg_basket_by_shipping_type',
+    'avg_basket_by_payment_method'
+], selections)
 
 # Métriques clés
 with styled_container():
     col1, col2 = st.columns(2)
     with col1:
-        payment_method = df_filtered['Payment Method'].mode().iloc[0] if not df_filtered.empty else "N/A"
+        payment_method = kpis.top_payment_method or "N/A"
         st.metric("Moyen de Paiement Préféré", payment_method)
     with col2:
-        shipping_type = df_filtered['Shipping Type'].mode().iloc[0] if not df_filtered.empty else "N/A"
+        shipping_type = kpis.top_shipping_type or "N/A"
         st.metric("Type de Livraison Préféré", shipping_type)
 
 # Analyse des modes de paiement
@@ -62,76 +55,100 @@ with styled_container():
     col1, col2 = st.columns(2)
 
     with col1:
-        payment_dist = df_filtered['Payment Method'].value_counts().reset_index()
-        payment_dist.columns = ['Payment Method', 'Count']
-        fig_payment = px.pie(
-            payment_dist,
-            values='Count',
-            names='Payment Method',
-            title='Répartition des Moyens de Paiement',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_payment.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_payment():
+            payment_dist = aggregates['sales_by_payment_method']
+            payment_dist.columns = ['Payment Method', 'Count']
+            fig_payment = px.pie(
+                payment_dist,
+                values='Count',
+                names='Payment Method',
+                title='Répartition des Moyens de Paiement',
+                hole=0.6,
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_payment.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_payment
+
+        st.plotly_chart(
+            cached_figure('05_Paiements_Livraisons/fig_payment', selections, build_payment),
+            use_container_width=True, key="payment_pie"
         )
-        st.plotly_chart(fig_payment, use_container_width=True, key="payment_pie")
 
     with col2:
-        shipping_dist = df_filtered['Shipping Type'].value_counts().reset_index()
-        shipping_dist.columns = ['Shipping Type', 'Count']
-        fig_shipping = px.pie(
-            shipping_dist,
-            values='Count',
-            names='Shipping Type',
-            title='Répartition des Types de Livraison',
-            hole=0.6,
-            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-        )
-        fig_shipping.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", y=-0.1),
-            margin=dict(t=30, l=0, r=0, b=0)
+        def build_shipping():
+            shipping_dist = aggregates['sales_by_shipping_type']
+            shipping_dist.columns = ['Shipping Type', 'Count']
+            fig_shipping = px.pie(
+                shipping_dist,
+                values='Count',
+                names='Shipping Type',
+                title='Répartition des Types de Livraison',
+                hole=0.6,
+                color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+            )
+            fig_shipping.update_layout(
+                showlegend=True,
+                legend=dict(orientation="h", y=-0.1),
+                margin=dict(t=30, l=0, r=0, b=0)
+            )
+            return fig_shipping
+
+        st.plotly_chart(
+            cached_figure('05_Paiements_Livraisons/fig_shipping', selections, build_shipping),
+            use_container_width=True, key="shipping_pie"
         )
-        st.plotly_chart(fig_shipping, use_container_width=True, key="shipping_pie")
 
 # Analyse des montants d'achat
 styled_subheader("💵 Analyse des Montants d'Achat")
 with styled_container():
     # Relation entre montant d'achat et mode de livraison
-    shipping_purchase = df_filtered.groupby('Shipping Type')['Purchase Amount (USD)'].mean().reset_index()
-    fig_shipping_purchase = px.bar(
-        shipping_purchase,
-        x='Shipping Type',
-        y='Purchase Amount (USD)',
-        title='Montant Moyen d\'Achat par Type de Livraison',
-        color='Shipping Type',
-        color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-    )
-    fig_shipping_purchase.update_layout(
-        showlegend=False,
-        margin=dict(t=30, l=0, r=0, b=0),
-        xaxis_title="Type de Livraison",
-        yaxis_title="Montant Moyen d'Achat (USD)"
+    def build_shipping_purchase():
+        shipping_purchase = aggregates['avg_basket_by_shipping_type']
+        fig_shipping_purchase = px.bar(
+            shipping_purchase,
+            x='Shipping Type',
+            y='Purchase Amount (USD)',
+            title='Montant Moyen d\'Achat par Type de Livraison',
+            color='Shipping Type',
+            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+        )
+        fig_shipping_purchase.update_layout(
+            showlegend=False,
+            margin=dict(t=30, l=0, r=0, b=0),
+            xaxis_title="Type de Livraison",
+            yaxis_title="Montant Moyen d'Achat (USD)"
+        )
+        return fig_shipping_purchase
+
+    st.plotly_chart(
+        cached_figure('05_Paiements_Livraisons/fig_shipping_purchase', selections, build_shipping_purchase),
+        use_container_width=True, key="shipping_purchase_bar"
     )
-    st.plotly_chart(fig_shipping_purchase, use_container_width=True, key="shipping_purchase_bar")
 
     # Relation entre montant d'achat et moyen de paiement
-    payment_purchase = df_filtered.groupby('Payment Method')['Purchase Amount (USD)'].mean().reset_index()
-    fig_payment_purchase = px.bar(
-        payment_purchase,
-        x='Payment Method',
-        y='Purchase Amount (USD)',
-        title='Montant Moyen d\'Achat par Moyen de Paiement',
-        color='Payment Method',
-        color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
-    )
-    fig_payment_purchase.update_layout(
-        showlegend=False,
-        margin=dict(t=30, l=0, r=0, b=0),
-        xaxis_title="Moyen de Paiement",
-        yaxis_title="Montant Moyen d'Achat (USD)"
-    )
-    st.plotly_chart(fig_payment_purchase, use_container_width=True, key="payment_purchase_bar")
\ No newline at end of file
+    def build_payment_purchase():
+        payment_purchase = aggregates['avg_basket_by_payment_method']
+        fig_payment_purchase = px.bar(
+            payment_purchase,
+            x='Payment Method',
+            y='Purchase Amount (USD)',
+            title='Montant Moyen d\'Achat par Moyen de Paiement',
+            color='Payment Method',
+            color_discrete_sequence=['#1E88E5', '#5E35B1', '#43A047', '#FB8C00']
+        )
+        fig_payment_purchase.update_layout(
+            showlegend=False,
+            margin=dict(t=30, l=0, r=0, b=0),
+            xaxis_title="Moyen de Paiement",
+            yaxis_title="Montant Moyen d'Achat (USD)"
+        )
+        return fig_payment_purchase
+
+    st.plotly_chart(
+        cached_figure('05_Paiements_Livraisons/fig_payment_purchase', selections, build_payment_purchase),
+        use_container_width=True, key="payment_purchase_bar"
+    )
\ No newline at end of file
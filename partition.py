@@ -0,0 +1,124 @@
+"""
+Découpage du CSV en un répertoire de partitions par saison et/ou catégorie.
+
+Usage :
+    python partition.py
+    python partition.py shopping_trends.csv shopping_trends --by Season Category
+    python partition.py shopping_trends.csv shopping_trends --by Season --format csv
+
+Chaque combinaison de valeurs des colonnes de `--by` est écrite dans son propre
+fichier (Season=Winter/Category=Clothing/part.parquet), avec le numéro de
+chaque ligne dans le CSV (data.SOURCE_ROW), puis le manifeste
+(data.PARTITION_MANIFEST) est réécrit en dernier : il liste les fichiers, leurs
+valeurs de partition et leur nombre de lignes, ainsi que les catégories de
+chaque colonne. Le tableau de bord lancé avec DASHBOARD_DATA=<répertoire> ne lit
+alors que les partitions retenues par les filtres de saison et de catégorie.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from urllib.parse import quote
+
+from data import CATEGORICAL_COLUMNS, DATA_PATH, PARTITION_MANIFEST, SOURCE_ROW, file_digest, read_csv
+
+# Colonnes de partition proposées : celles des filtres principaux de la sidebar
+PARTITION_COLUMNS = ['Season', 'Category']
+
+# Formats de fichier d'une partition
+FORMATS = ('parquet', 'csv')
+
+
+# Répertoire d'une partition, au format colonne=valeur (une valeur par niveau)
+def partition_dir(by, values):
+    return os.path.join(*(f'{column}={quote(str(value), safe=" ")}' for column, value in zip(by, values)))
+
+
+def write_partitions(path=DATA_PATH, directory=None, by=PARTITION_COLUMNS, fmt='parquet'):
+    """
+    Écrit le jeu de données en partitions et retourne leur manifeste.
+
+    Les partitions sont rangées dans l'ordre trié de leurs valeurs ; au sein
+    d'une partition, les lignes gardent l'ordre du CSV, et chacune porte son
+    numéro de ligne dans le CSV (SOURCE_ROW), qui permet au tableau de bord de
+    retrouver cet ordre. Toutes les lignes sont écrites, y compris celles dont
+    une colonne de partition est vide. Chaque fichier est écrit
+    sous un nom temporaire puis renommé, et le manifeste en dernier, de sorte
+    qu'un tableau de bord en cours d'exécution ne voie jamais un répertoire à
+    moitié écrit.
+
+    Args:
+        path (str): CSV source
+        directory (str, optional): Répertoire des partitions (par défaut le
+            chemin du CSV sans son extension)
+        by (list[str]): Colonnes de partition, parmi PARTITION_COLUMNS
+        fmt (str): 'parquet' ou 'csv'
+
+    Returns:
+        dict: Le manifeste écrit
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu : {fmt} (attendu : {', '.join(FORMATS)})")
+    unknown = [column for column in by if column not in PARTITION_COLUMNS]
+    if unknown or not by:
+        raise ValueError(f"Colonnes de partition attendues parmi : {', '.join(PARTITION_COLUMNS)}")
+    directory = os.path.splitext(path)[0] if directory is None else directory
+    by = list(by)
+
+    df = read_csv(path)
+    partitions = []
+    for values, group in df.groupby(by, observed=True, sort=True, dropna=False):
+        values = values if isinstance(values, tuple) else (values,)
+        group = group.assign(**{SOURCE_ROW: group.index.to_numpy(dtype='int64')})
+        file = os.path.join(partition_dir(by, values), f'part.{fmt}')
+        target = os.path.join(directory, file)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f'{target}.{os.getpid()}.tmp'
+        if fmt == 'parquet':
+            group.to_parquet(tmp, index=False)
+        else:
+            group.to_csv(tmp, index=False)
+        os.replace(tmp, target)
+        partitions.append({
+            'file': file,
+            'values': dict(zip(by, values)),
+            'rows': len(group),
+            'sha256': file_digest(target)
+        })
+
+    manifest = {
+        'format': fmt,
+        'by': by,
+        'categories': {column: list(df[column].cat.categories) for column in CATEGORICAL_COLUMNS},
+        'partitions': partitions,
+        # Chaque fichier porte la colonne SOURCE_ROW
+        'source_rows': True,
+        # Version du répertoire : empreinte de la liste des partitions et de leur contenu
+        'sha256': hashlib.sha256(json.dumps(partitions, sort_keys=True).encode()).hexdigest()
+    }
+    tmp = os.path.join(directory, f'{PARTITION_MANIFEST}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(directory, PARTITION_MANIFEST))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', nargs='?', default=DATA_PATH)
+    parser.add_argument('directory', nargs='?')
+    parser.add_argument('--by', nargs='+', default=PARTITION_COLUMNS, choices=PARTITION_COLUMNS)
+    parser.add_argument('--format', choices=FORMATS, default='parquet')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = write_partitions(args.path, args.directory, args.by, args.format)
+    directory = os.path.splitext(args.path)[0] if args.directory is None else args.directory
+    rows = sum(partition['rows'] for partition in manifest['partitions'])
+    print(f"{rows:,} lignes en {len(manifest['partitions'])} partitions ({args.format}) "
+          f"en {time.perf_counter() - start:.1f} s -> {directory}")
+
+
+if __name__ == '__main__':
+    main()
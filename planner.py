@@ -0,0 +1,131 @@
+from typing import NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from backend import QUERY_BACKEND, load_categories
+from contingency import ContingencyTable
+from cube import CUBE_DIMENSIONS, CUBE_MEASURES, build_cube, load_cube_view
+from data import DATA_PATH, load_column_categories
+from filters import load_filter_index
+
+# Nombre maximal de cellules d'un lot évalué en un seul passage sur les lignes
+MAX_BATCH_CELLS = 1_000_000
+
+
+class AggregateSpec(NamedTuple):
+    """
+    Agrégat déclaré par ses dimensions, sa mesure et sa statistique, sans dire
+    comment le calculer : c'est le planificateur qui choisit la source (cube ou
+    lignes) et regroupe les calculs.
+
+    Attributes:
+        by (tuple[str]): Dimensions de regroupement
+        measure (str, optional): Mesure agrégée (inutile pour 'count')
+        stat (str | tuple[str]): Statistique(s), comme pour CubeView.rollup
+        output (str): 'rollup' (une ligne par groupe), 'counts' (effectifs
+            triés par ordre décroissant, comme value_counts) ou 'crosstab'
+            (ContingencyTable des deux dimensions de `by`, avec le test du χ²)
+    """
+    by: Tuple[str, ...]
+    measure: Optional[str] = None
+    stat: Union[str, Tuple[str, ...]] = 'count'
+    output: str = 'rollup'
+
+    @property
+    def on_cube(self):
+        return set(self.by) <= set(CUBE_DIMENSIONS) and self.measure in (None, *CUBE_MEASURES)
+
+    def evaluate(self, view):
+        """
+        Calcule l'agrégat sur une CubeView (tranche du cube global ou cube
+        construit pour un lot).
+        """
+        if self.output == 'crosstab':
+            return ContingencyTable(view.crosstab(*self.by))
+        stat = self.stat if isinstance(self.stat, str) else list(self.stat)
+        result = view.rollup(list(self.by), self.measure, stat)
+        if self.output == 'counts':
+            result = result.sort_values('count', ascending=False, kind='stable')
+        return result
+
+
+class Batch(NamedTuple):
+    """
+    Lot d'agrégats évalués ensemble. `dimensions` vaut None pour le lot servi
+    par le cube global ; sinon un cube est construit pour le lot à partir des
+    lignes sélectionnées, sur `dimensions` et `measures`.
+    """
+    dimensions: Optional[Tuple[str, ...]]
+    measures: Tuple[str, ...]
+    names: Tuple[str, ...]
+
+
+def plan(specs, cardinality, max_cells=MAX_BATCH_CELLS):
+    """
+    Répartit les agrégats en lots évalués chacun en un seul passage.
+
+    Les agrégats dont les dimensions et la mesure font partie du cube forment
+    un seul lot : la tranche du cube est découpée une fois pour tous. Les
+    autres sont regroupés tant que le produit des cardinalités de leurs
+    dimensions reste sous MAX_BATCH_CELLS : les codes de toutes ces dimensions
+    sont combinés en une seule clé et comptés par un seul np.bincount, chaque
+    agrégat étant ensuite une marginale de ce comptage.
+
+    Args:
+        specs (dict[str, AggregateSpec]): Agrégats à calculer, par nom
+        cardinality (callable): Nombre de modalités d'une colonne
+        max_cells (int): Nombre maximal de cellules d'un lot
+
+    Returns:
+        list[Batch]: Les lots, dans l'ordre d'évaluation
+    """
+    cube_names = tuple(name for name, spec in specs.items() if spec.on_cube)
+    batches = [Batch(None, (), cube_names)] if cube_names else []
+
+    dimensions, measures, names = [], [], []
+    for name, spec in specs.items():
+        if spec.on_cube:
+            continue
+        merged = dimensions + [d for d in spec.by if d not in dimensions]
+        if names and np.prod([cardinality(d) for d in merged]) > max_cells:
+            batches.append(Batch(tuple(dimensions), tuple(measures), tuple(names)))
+            dimensions, measures, names = [], [], []
+            merged = list(spec.by)
+        dimensions = merged
+        if spec.measure is not None and spec.measure not in measures:
+            measures.append(spec.measure)
+        names.append(name)
+    if names:
+        batches.append(Batch(tuple(dimensions), tuple(measures), tuple(names)))
+    return batches
+
+
+def execute(specs, selections, path=DATA_PATH):
+    """
+    Évalue un ensemble d'agrégats nommés pour les filtres de la sidebar.
+
+    Args:
+        specs (dict[str, AggregateSpec]): Agrégats à calculer, par nom
+        selections (dict): Filtres retournés par filters.sidebar_filters
+
+    Returns:
+        dict: Résultat de chaque agrégat, par nom
+    """
+    def cardinality(column):
+        if QUERY_BACKEND != 'pandas':
+            return len(load_categories(column, path))
+        return len(load_column_categories(column, path))
+
+    # Les vues d'ingest.py ne croisent pas les dimensions hors du cube entre
+    # elles : avec le moteur 'aggregates', chaque agrégat forme son propre lot
+    max_cells = 0 if QUERY_BACKEND == 'aggregates' else MAX_BATCH_CELLS
+    results = {}
+    active = load_filter_index(path).normalize(selections)
+    for batch in plan(specs, cardinality, max_cells):
+        if batch.dimensions is None:
+            view = load_cube_view(selections, path)
+        else:
+            view = build_cube(batch.dimensions, batch.measures, active, path).view()
+        for name in batch.names:
+            results[name] = specs[name].evaluate(view)
+    return results
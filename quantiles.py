@@ -0,0 +1,268 @@
+import numpy as np
+import pandas as pd
+
+# Colonnes numériques résumées par des sketches de quantiles
+QUANTILE_COLUMNS = ['Purchase Amount (USD)', 'Review Rating']
+
+# Jusqu'à ce nombre de valeurs distinctes, l'effectif de chaque valeur est
+# conservé tel quel et les quantiles sont exacts
+MAX_EXACT_VALUES = 256
+
+# Au-delà, précision relative des intervalles logarithmiques : chaque valeur
+# est représentée à 1 % près
+RELATIVE_ACCURACY = 0.01
+
+# Nombre maximal d'intervalles : au-delà, les plus petits sont regroupés
+MAX_BUCKETS = 2048
+
+# Rapport entre les bornes d'un intervalle
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+# Première ligne d'une cellule vide
+_NO_ROW = np.iinfo(np.int64).max
+
+
+def representative(values, scale=1):
+    """
+    Valeur représentant l'intervalle de chaque valeur : ]gamma^(k-1), gamma^k]
+    pour une valeur positive, son symétrique pour une valeur négative (comme
+    DDSketch) ; zéro (article offert) garde sa propre valeur exacte. Le
+    représentant est à moins de RELATIVE_ACCURACY (en relatif) de toutes les
+    valeurs de son intervalle, croît avec elles et se représente lui-même.
+
+    Avec `scale`, les intervalles sont ceux de gamma^scale : chacun réunit
+    `scale` intervalles consécutifs de gamma, si bien que le représentant d'un
+    représentant plus fin est celui de la valeur d'origine.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.abs(values)
+    nonzero = magnitude > 0
+    keys = np.ceil(np.log(magnitude, out=np.zeros_like(magnitude), where=nonzero) / np.log(_GAMMA))
+    gamma = _GAMMA ** scale
+    keys = np.ceil(keys / scale) * scale
+    return np.where(nonzero, np.sign(values) * 2 * _GAMMA ** keys / (gamma + 1), 0.0)
+
+
+# Effectifs des valeurs exactes (triées) regroupés par intervalle
+def _to_buckets(values, counts):
+    if not len(values):
+        return values, counts
+    representatives, starts = np.unique(representative(values), return_index=True)
+    return representatives, np.add.reduceat(counts, starts, axis=-1)
+
+
+# Au-delà de MAX_BUCKETS intervalles, les plus petits sont versés dans le
+# premier conservé : seuls les quantiles les plus bas perdent en précision
+def _limit(values, counts):
+    cut = len(values) - MAX_BUCKETS
+    if cut <= 0:
+        return values, counts
+    kept = counts[..., cut:].copy()
+    kept[..., 0] += counts[..., :cut].sum(axis=-1)
+    return values[cut:], kept
+
+
+def weighted_quantile(values, weights, p):
+    """
+    Quantile `p` de valeurs pondérées par leur effectif, par interpolation
+    linéaire comme Series.quantile (position p x (n - 1) dans les valeurs
+    développées) ; NaN sans valeur.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.int64)
+    order = np.argsort(values, kind='stable')
+    values, ends = values[order], np.cumsum(weights[order])
+    n = int(ends[-1]) if len(ends) else 0
+    if not n:
+        return float('nan')
+    position = p * (n - 1)
+    low, high = int(np.floor(position)), int(np.ceil(position))
+    at = values[np.searchsorted(ends, [low, high], side='right')]
+    return float(at[0] + (at[1] - at[0]) * (position - low))
+
+
+class QuantileSketch:
+    """
+    Sketches de quantiles d'une colonne numérique, un par cellule
+    (combinaison de modalités des dimensions), comme le cube.
+
+    Chaque cellule garde l'effectif de chaque valeur tant que la colonne a au
+    plus MAX_EXACT_VALUES valeurs distinctes (montants et notes : les
+    quantiles sont alors exacts). Au-delà, les valeurs sont réparties en
+    intervalles logarithmiques ]gamma^(k-1), gamma^k] (DDSketch), symétriques
+    pour les valeurs négatives, zéro étant compté à part : chaque quantile
+    est restitué à RELATIVE_ACCURACY près en relatif, avec au plus
+    MAX_BUCKETS intervalles par cellule quel que soit le nombre de lignes.
+    Les valeurs manquantes sont ignorées.
+
+    Deux sketches se fusionnent en additionnant leurs effectifs, cellule par
+    cellule : ceux des blocs lus par ingest.py donnent le sketch de tout le
+    fichier. Une sélection réunit les seules cellules retenues. La première
+    ligne de chaque cellule est aussi conservée, pour ordonner les groupes
+    par première apparition comme px.box.
+
+    Attributes:
+        column (str): Colonne résumée
+        dimensions (list[str]): Dimensions des cellules
+        categories (list[list]): Modalités de chaque dimension
+        exact (bool): Effectifs par valeur exacte (sinon par intervalle)
+        values (numpy.ndarray): Valeurs, ou représentants des intervalles, triés
+        counts (numpy.ndarray): Effectifs, de forme (modalités..., valeurs)
+        first (numpy.ndarray): Numéro de la première ligne de chaque cellule
+    """
+
+    def __init__(self, df, column, dimensions, rows=None):
+        self.column = column
+        self.dimensions = list(dimensions)
+        self.categories = [list(df[d].cat.categories) for d in self.dimensions]
+        shape = tuple(len(c) for c in self.categories)
+        size = int(np.prod(shape))
+
+        if self.dimensions:
+            cells = np.ravel_multi_index([df[d].cat.codes.to_numpy() for d in self.dimensions], shape)
+        else:
+            cells = np.zeros(len(df), dtype=np.intp)
+        data = df[column].to_numpy(dtype=np.float64)
+        rows = np.arange(len(df), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        present = ~np.isnan(data)
+        if not present.all():
+            data, cells, rows = data[present], cells[present], rows[present]
+        values, inverse = np.unique(data, return_inverse=True)
+        self.exact = len(values) <= MAX_EXACT_VALUES
+        if not self.exact:
+            values, inverse = np.unique(representative(data), return_inverse=True)
+        counts = np.bincount(cells * len(values) + inverse, minlength=size * len(values))
+        self.values, self.counts = _limit(values, counts.reshape(*shape, len(values)))
+
+        first = np.full(size, _NO_ROW, dtype=np.int64)
+        np.minimum.at(first, cells, rows)
+        self.first = first.reshape(shape)
+
+    @classmethod
+    def _from_arrays(cls, column, dimensions, categories, exact, values, counts, first):
+        sketch = cls.__new__(cls)
+        sketch.column = column
+        sketch.dimensions = list(dimensions)
+        sketch.categories = categories
+        sketch.exact = exact
+        sketch.values = values
+        sketch.counts = counts
+        sketch.first = first
+        return sketch
+
+    # Erreur relative maximale des quantiles restitués (0 s'ils sont exacts)
+    @property
+    def error(self):
+        return 0.0 if self.exact else RELATIVE_ACCURACY
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.counts.nbytes + self.first.nbytes
+
+    # Effectifs et premières lignes réindexés sur des modalités plus larges
+    # (cellules ajoutées vides)
+    def _aligned(self, categories):
+        if categories == self.categories:
+            return self.counts, self.first
+        shape = tuple(len(c) for c in categories)
+        positions = []
+        for old, new in zip(self.categories, categories):
+            lookup = {value: i for i, value in enumerate(new)}
+            positions.append(np.array([lookup[value] for value in old], dtype=np.intp))
+        cells = np.ix_(*positions)
+        counts = np.zeros((*shape, len(self.values)), dtype=self.counts.dtype)
+        counts[cells] = self.counts
+        first = np.full(shape, _NO_ROW, dtype=np.int64)
+        first[cells] = self.first
+        return counts, first
+
+    def merge(self, other):
+        """
+        Réunit deux sketches de mêmes colonne et dimensions, par exemple ceux
+        de deux blocs de lignes (numéros de ligne absolus) : effectifs
+        additionnés, premières lignes combinées. Le résultat passe aux
+        intervalles dès que les valeurs exactes réunies dépassent
+        MAX_EXACT_VALUES.
+
+        Returns:
+            QuantileSketch: Le sketch fusionné (les deux d'origine sont inchangés)
+        """
+        categories = [sorted(set(a) | set(b)) for a, b in zip(self.categories, other.categories)]
+        (left, left_first), (right, right_first) = self._aligned(categories), other._aligned(categories)
+        left_values, right_values = self.values, other.values
+        exact = self.exact and other.exact and len(np.union1d(left_values, right_values)) <= MAX_EXACT_VALUES
+        if not exact:
+            if self.exact:
+                left_values, left = _to_buckets(left_values, left)
+            if other.exact:
+                right_values, right = _to_buckets(right_values, right)
+        values = np.union1d(left_values, right_values)
+        counts = np.zeros((*left_first.shape, len(values)), dtype=np.int64)
+        counts[..., np.searchsorted(values, left_values)] += left
+        counts[..., np.searchsorted(values, right_values)] += right
+        values, counts = _limit(values, counts)
+        return QuantileSketch._from_arrays(
+            self.column, self.dimensions, categories, exact, values, counts, np.minimum(left_first, right_first)
+        )
+
+    # Effectifs et premières lignes des cellules retenues, et positions retenues
+    # de chaque dimension
+    def _slice(self, selections):
+        index = []
+        for dimension, categories in zip(self.dimensions, self.categories):
+            values = selections.get(dimension)
+            if values is None:
+                index.append(np.arange(len(categories)))
+            else:
+                values = set(values)
+                index.append(np.array([i for i, c in enumerate(categories) if c in values], dtype=np.intp))
+        if not self.dimensions:
+            return self.counts, self.first, index
+        cells = np.ravel_multi_index(np.ix_(*index), self.first.shape)
+        return self.counts.reshape(-1, len(self.values))[cells], self.first.ravel()[cells], index
+
+    def quantile(self, p, selections=None):
+        """
+        Quantile `p` des lignes des cellules retenues (NaN si elles sont vides).
+
+        Args:
+            p (float): Entre 0 et 1, par exemple 0.5 pour la médiane
+            selections (dict, optional): Dimension -> valeurs retenues
+        """
+        counts, _, _ = self._slice(selections or {})
+        return weighted_quantile(self.values, counts.reshape(-1, len(self.values)).sum(axis=0), p)
+
+    def value_counts(self, by, selections=None):
+        """
+        Effectif de chaque valeur par modalité de `by` parmi les cellules
+        retenues, comme backend.query_value_counts : les groupes dans l'ordre
+        de première apparition, puis les valeurs croissantes.
+
+        Returns:
+            tuple: (valeurs, groupes (pandas.Series catégorielle), effectifs),
+            à passer à BoxStats(values, groups, weights=...)
+        """
+        counts, first, index = self._slice(selections or {})
+        position = self.dimensions.index(by)
+        axes = tuple(i for i in range(len(self.dimensions)) if i != position)
+        if counts.size:
+            by_group = counts.sum(axis=axes)
+            group_first = first.min(axis=axes)
+        else:
+            by_group = np.zeros((len(index[position]), len(self.values)), dtype=np.int64)
+            group_first = np.full(len(index[position]), _NO_ROW, dtype=np.int64)
+        labels = np.array(self.categories[position], dtype=object)[index[position]]
+        order = [g for g in np.argsort(group_first, kind='stable') if by_group[g].any()]
+        groups, values, weights = [], [], []
+        for g in order:
+            kept = np.flatnonzero(by_group[g])
+            groups.append(np.repeat(labels[g], len(kept)))
+            values.append(self.values[kept])
+            weights.append(by_group[g, kept])
+        if not order:
+            return np.empty(0), pd.Series([], dtype='category'), np.empty(0, dtype=np.int64)
+        return (
+            np.concatenate(values),
+            pd.Series(np.concatenate(groups), dtype='category'),
+            np.concatenate(weights)
+        )
@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+# Au-delà de ce nombre de points, le nuage est dessiné en WebGL (Scattergl)
+# (variable d'environnement DASHBOARD_SCATTER_WEBGL_ROWS)
+SCATTER_WEBGL_ROWS = os.environ.get('DASHBOARD_SCATTER_WEBGL_ROWS', '5000')
+
+# Au-delà de ce nombre de points, le nuage est remplacé par une carte de
+# densité (variable d'environnement DASHBOARD_SCATTER_DENSITY_ROWS). Mesuré
+# sur 20 000 lignes tirées de shopping_trends.csv : 32 Ko de JSON avec
+# Plotly 7 (16 Ko avec Plotly 5), contre 164 Ko (144 Ko) pour px.scatter sans
+# tendance, les couples distincts n'étant dessinés qu'une fois ; sur des
+# valeurs toutes distinctes, la figure a la taille de px.scatter
+SCATTER_DENSITY_ROWS = os.environ.get('DASHBOARD_SCATTER_DENSITY_ROWS', '20000')
+
+if not (SCATTER_WEBGL_ROWS.isdigit() and SCATTER_DENSITY_ROWS.isdigit()):
+    raise ValueError(
+        f"Seuils du nuage de points invalides : {SCATTER_WEBGL_ROWS}, {SCATTER_DENSITY_ROWS} "
+        f"(attendu : des nombres entiers de points)"
+    )
+SCATTER_WEBGL_ROWS, SCATTER_DENSITY_ROWS = int(SCATTER_WEBGL_ROWS), int(SCATTER_DENSITY_ROWS)
+
+# Nombre de cellules par axe de la carte de densité
+DENSITY_BINS = 60
+
+
+class LinearFit:
+    """
+    Régression linéaire y = slope * x + intercept par moindres carrés ordinaires,
+    en forme fermée à partir des sommes des valeurs et des produits croisés.
+    Avec `weights`, chaque point compte pour son effectif.
+
+    Attributes:
+        n (int): Nombre de points
+        slope, intercept (float): Coefficients de la droite
+        r2 (float): Coefficient de détermination
+        slope_stderr (float): Erreur type de la pente
+    """
+
+    def __init__(self, x, y, weights=None):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.n = len(x) if weights is None else int(w.sum())
+        self.slope = self.intercept = self.r2 = self.slope_stderr = float('nan')
+        if self.n < 2:
+            return
+        if weights is None:
+            x_mean, y_mean = x.mean(), y.mean()
+        else:
+            x_mean, y_mean = (w @ x) / self.n, (w @ y) / self.n
+        dx, dy = x - x_mean, y - y_mean
+        if weights is None:
+            sxx, syy, sxy = dx @ dx, dy @ dy, dx @ dy
+        else:
+            sxx, syy, sxy = (w * dx) @ dx, (w * dy) @ dy, (w * dx) @ dy
+        if sxx == 0:
+            return
+        self.slope = float(sxy / sxx)
+        self.intercept = float(y_mean - self.slope * x_mean)
+        residual = max(syy - self.slope * sxy, 0.0)
+        self.r2 = float(1 - residual / syy) if syy else 1.0
+        if self.n > 2:
+            self.slope_stderr = float(np.sqrt(residual / (self.n - 2) / sxx))
+
+    def predict(self, x):
+        return self.intercept + self.slope * np.asarray(x, dtype=np.float64)
+
+    def describe(self):
+        if np.isnan(self.slope):
+            return "Tendance indisponible (pas assez de points)"
+        return (
+            f"Tendance : y = {self.slope:.3f}·x + {self.intercept:.2f} "
+            f"(± {self.slope_stderr:.3f} sur la pente) — R² = {self.r2:.4f}, n = {self.n:,}"
+        )
+
+
+def _compact(values):
+    # Entiers en int32, autres valeurs sous leur écriture décimale la plus
+    # courte : une note lue en float32 (data.py) s'écrirait sinon en JSON
+    # 3.0999999046325684 au lieu de 3.1
+    if not len(values):
+        return values
+    if np.all(np.mod(values, 1) == 0) and np.abs(values).max() < 2 ** 31:
+        return values.astype(np.int32)
+    narrow = values.astype(np.float32)
+    if np.array_equal(narrow, values):
+        return narrow.astype(str).astype(np.float64)
+    return values
+
+
+class ScatterSummary:
+    """
+    Nuage de points prêt à afficher, avec sa droite de tendance.
+
+    Jusqu'à SCATTER_DENSITY_ROWS points, les couples (x, y) distincts sont
+    conservés, un seul point par couple ; au-delà, seule une grille de densité DENSITY_BINS x DENSITY_BINS
+    est calculée avec np.histogram2d, si bien que la figure garde une taille
+    constante quel que soit le nombre de lignes.
+
+    Avec `weights`, les points sont déjà les couples (x, y) distincts et leurs
+    effectifs (backend.py) : la tendance et la densité sont celles des lignes.
+
+    Args:
+        x, y (array-like): Coordonnées des points
+        weights (array-like, optional): Effectif de chaque point
+    """
+
+    def __init__(self, x, y, weights=None):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.fit = LinearFit(x, y, weights)
+        self.n = self.fit.n if weights is not None else len(x)
+        self.x_range = (x.min(), x.max()) if len(x) else (0.0, 0.0)
+        if self.n <= SCATTER_DENSITY_ROWS:
+            # Un point par couple (x, y) distinct : les doublons se superposent
+            points = np.unique(np.column_stack([x, y]), axis=0) if len(x) else np.empty((0, 2))
+            self.x = _compact(points[:, 0])
+            self.y = _compact(points[:, 1])
+            self.density = None
+        else:
+            self.x = self.y = None
+            self.density = np.histogram2d(x, y, bins=DENSITY_BINS, weights=weights)
+
+    @property
+    def nbytes(self):
+        if self.density is None:
+            return self.x.nbytes + self.y.nbytes
+        return sum(a.nbytes for a in self.density)
+
+    def figure(self, title=None, labels=None, x=None, y=None):
+        """
+        Construit le nuage (SVG, WebGL ou densité selon le nombre de points)
+        et sa droite de tendance.
+
+        Args:
+            title (str, optional): Titre du graphique
+            labels (dict, optional): Libellés des axes, comme pour Plotly Express
+            x, y (str, optional): Noms des colonnes représentées
+
+        Returns:
+            plotly.graph_objects.Figure: Le graphique créé
+        """
+        labels = labels or {}
+        fig = go.Figure()
+        if self.density is not None:
+            counts, x_edges, y_edges = self.density
+            fig.add_trace(go.Heatmap(
+                x=(x_edges[:-1] + x_edges[1:]) / 2,
+                y=(y_edges[:-1] + y_edges[1:]) / 2,
+                z=np.where(counts.T > 0, counts.T, np.nan),
+                colorscale='Blues',
+                colorbar=dict(title='Points'),
+                name='Densité'
+            ))
+        else:
+            trace = go.Scattergl if self.n > SCATTER_WEBGL_ROWS else go.Scatter
+            fig.add_trace(trace(x=self.x, y=self.y, mode='markers', name='Achats', showlegend=False))
+        if not np.isnan(self.fit.slope):
+            line_x = np.array(self.x_range)
+            fig.add_trace(go.Scatter(
+                x=line_x,
+                y=self.fit.predict(line_x),
+                mode='lines',
+                name='Tendance (MCO)',
+                showlegend=False,
+                hovertemplate=f'{self.fit.describe()}<extra></extra>'
+            ))
+        fig.update_layout(
+            title=title,
+            xaxis_title=labels.get(x, x),
+            yaxis_title=labels.get(y, y)
+        )
+        return fig
@@ -0,0 +1,61 @@
+import functools
+import time
+
+import streamlit as st
+
+from data import DATA_PATH
+from filters import FILTER_COLUMNS, RANGE_FILTERS, SET_FILTERS, load_selection
+
+# Tous les filtres de la sidebar
+ALL_FILTERS = [*FILTER_COLUMNS, *SET_FILTERS, *RANGE_FILTERS]
+
+# Sections déclarées : nom -> (filtres dont elles dépendent, colonnes lues)
+SECTIONS = {}
+
+
+def section(name, filters, columns=None, path=DATA_PATH):
+    """
+    Déclare une section du tableau de bord.
+
+    Le découpage organise la page et mesure le coût de chaque section ; il ne
+    réexécute pas les sections séparément. Les filtres étant dans la sidebar,
+    chacun de leurs changements réexécute toute la page, donc toutes les
+    sections affichées. Ce que la section déclare :
+
+    - `filters` : filtres de la sidebar qu'elle applique (ALL_FILTERS, ou une
+      partie quand la section en ignore). La section ne reçoit que ceux-là, et
+      ses agrégats et figures sont mis en cache sous cette sélection : après un
+      changement d'un filtre qu'elle ignore, elle est réexécutée mais servie par
+      les caches.
+    - `columns` : colonnes brutes lues par la section. Elles ne sont chargées et
+      filtrées que lorsque la section est affichée, et passées en second
+      argument (`df_filtered`). Sans `columns`, la section ne lit que des
+      agrégats.
+
+    Une section qui n'est pas appelée (onglet non sélectionné) ne calcule rien.
+    La durée du dernier rendu de chaque section est conservée dans
+    st.session_state['section_timings'] (en millisecondes).
+
+    Args:
+        name (str): Nom de la section
+        filters (list[str]): Colonnes de filtres appliquées par la section
+        columns (list[str], optional): Colonnes brutes lues par la section
+    """
+    def decorator(func):
+        SECTIONS[name] = (filters, columns)
+
+        @functools.wraps(func)
+        def render(selections):
+            start = time.perf_counter()
+            selections = {c: v for c, v in selections.items() if c in filters}
+            if columns is None:
+                result = func(selections)
+            else:
+                result = func(selections, load_selection(columns, selections, path))
+            timings = st.session_state.setdefault('section_timings', {})
+            timings[name] = (time.perf_counter() - start) * 1000
+            return result
+
+        return render
+
+    return decorator
@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+# Précision des sketches : 2^p registres d'un octet par cellule, pour une
+# erreur relative type de 1,04 / sqrt(2^p) (1,6 % avec p = 12)
+HLL_PRECISION = 12
+
+# Constante de l'estimateur de Ertl (limite de alpha_m quand m tend vers l'infini)
+_ALPHA = 0.5 / np.log(2)
+
+
+# Numéro de registre (p premiers bits du hachage) et rang (position du
+# premier bit à 1 parmi les 64 - p suivants) de chaque valeur
+def _hash_ranks(values, precision):
+    hashes = pd.util.hash_array(np.asarray(values), categorize=False)
+    register = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Longueur en bits de `rest`, calculée sur ses deux moitiés de 32 bits
+    # (exactes en float64, contrairement à un entier de 64 bits)
+    high = np.frexp((rest >> np.uint64(32)).astype(np.float64))[1]
+    low = np.frexp((rest & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+    length = np.where(high > 0, high + 32, low)
+    return register, (64 - precision - length + 1).astype(np.uint8)
+
+
+def estimate(registers):
+    """
+    Nombre de valeurs distinctes estimé à partir des registres d'un sketch
+    (dernier axe), par l'estimateur corrigé de Ertl (2017) : sans biais de
+    quelques unités à plusieurs milliards, sans table de correction.
+
+    Args:
+        registers (numpy.ndarray): Registres, un sketch par ligne
+
+    Returns:
+        numpy.ndarray: Estimations (0 pour un sketch vide)
+    """
+    registers = np.asarray(registers)
+    m = registers.shape[-1]
+    q = 64 - int(np.log2(m))
+    groups = registers.reshape(-1, m)
+    # Histogramme des valeurs de registres de chaque sketch
+    histogram = np.bincount(
+        (np.arange(len(groups))[:, None] * (q + 2) + groups).ravel(), minlength=len(groups) * (q + 2)
+    ).reshape(len(groups), q + 2).astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # tau(1 - C[q+1] / m), nul quand aucun registre n'est saturé
+        x = 1 - histogram[:, q + 1] / m
+        z = 1 - x
+        y = 1.0
+        for _ in range(64):
+            x = np.sqrt(x)
+            y *= 0.5
+            step = (1 - x) ** 2 * y
+            z -= step
+            if not (step > np.spacing(z)).any():
+                break
+        total = m * np.where(histogram[:, q + 1] == 0, 0.0, z / 3)
+        for k in range(q, 0, -1):
+            total = (total + histogram[:, k]) * 0.5
+        # sigma(C[0] / m)
+        x = histogram[:, 0] / m
+        z = x.copy()
+        y = 1.0
+        for _ in range(64):
+            x = x * x
+            z += x * y
+            y *= 2
+            if not x.any():
+                break
+        total += m * z
+        result = np.where(histogram[:, 0] == m, 0.0, _ALPHA * m * m / total)
+    return result.reshape(registers.shape[:-1])
+
+
+class DistinctSketch:
+    """
+    Sketches HyperLogLog des valeurs distinctes d'une colonne (Customer ID),
+    un par cellule : une cellule est une combinaison de modalités des
+    dimensions, comme dans le cube.
+
+    Chaque valeur est hachée sur 64 bits ; ses p premiers bits désignent un
+    registre de sa cellule, qui retient la plus grande position de premier bit
+    à 1 observée sur les bits suivants. L'union de sketches est le maximum
+    registre par registre : les sketches de deux blocs de lignes se fusionnent
+    sans relire les lignes, et le nombre de valeurs distinctes d'une sélection
+    s'estime en réunissant les seules cellules retenues, en O(cellules x 2^p)
+    quel que soit le nombre de lignes.
+
+    L'erreur relative type de l'estimation est 1,04 / sqrt(2^p) (propriété
+    `error`) : environ 95 % des estimations s'écartent de la valeur exacte de
+    moins de deux erreurs types.
+
+    Attributes:
+        column (str): Colonne dont les valeurs distinctes sont comptées
+        dimensions (list[str]): Dimensions des cellules
+        categories (list[list]): Modalités de chaque dimension
+        precision (int): p, nombre de bits qui désignent le registre
+        registers (numpy.ndarray): Registres (uint8), de forme
+            (modalités de chaque dimension..., 2^p)
+    """
+
+    def __init__(self, df, column, dimensions, precision=HLL_PRECISION):
+        self.column = column
+        self.dimensions = list(dimensions)
+        self.categories = [list(df[d].cat.categories) for d in self.dimensions]
+        self.precision = precision
+        shape = tuple(len(c) for c in self.categories)
+        m = 1 << precision
+
+        if self.dimensions:
+            cells = np.ravel_multi_index([df[d].cat.codes.to_numpy() for d in self.dimensions], shape)
+        else:
+            cells = np.zeros(len(df), dtype=np.intp)
+        register, rank = _hash_ranks(df[column].to_numpy(), precision)
+        registers = np.zeros(int(np.prod(shape)) * m, dtype=np.uint8)
+        np.maximum.at(registers, cells * m + register, rank)
+        self.registers = registers.reshape(*shape, m)
+
+    @classmethod
+    def _from_registers(cls, column, dimensions, categories, precision, registers):
+        sketch = cls.__new__(cls)
+        sketch.column = column
+        sketch.dimensions = list(dimensions)
+        sketch.categories = categories
+        sketch.precision = precision
+        sketch.registers = registers
+        return sketch
+
+    # Erreur relative type des estimations
+    @property
+    def error(self):
+        return 1.04 / np.sqrt(1 << self.precision)
+
+    # Sketches réindexés sur des modalités plus larges (cellules ajoutées vides)
+    def _aligned(self, categories):
+        if categories == self.categories:
+            return self.registers
+        shape = tuple(len(c) for c in categories)
+        positions = []
+        for old, new in zip(self.categories, categories):
+            lookup = {value: i for i, value in enumerate(new)}
+            positions.append(np.array([lookup[value] for value in old], dtype=np.intp))
+        registers = np.zeros((*shape, self.registers.shape[-1]), dtype=np.uint8)
+        registers[np.ix_(*positions, np.arange(self.registers.shape[-1]))] = self.registers
+        return registers
+
+    def merge(self, other):
+        """
+        Réunit deux sketches de mêmes colonne, dimensions et précision, par
+        exemple ceux de deux blocs de lignes : le résultat est le sketch qu'on
+        aurait construit sur toutes les lignes.
+
+        Returns:
+            DistinctSketch: Le sketch fusionné (les deux d'origine sont inchangés)
+        """
+        categories = [sorted(set(a) | set(b)) for a, b in zip(self.categories, other.categories)]
+        return DistinctSketch._from_registers(
+            self.column, self.dimensions, categories, self.precision,
+            np.maximum(self._aligned(categories), other._aligned(categories))
+        )
+
+    # Union des sketches des cellules retenues, en gardant les dimensions `keep`
+    def _union(self, selections, keep=()):
+        index = []
+        for dimension, categories in zip(self.dimensions, self.categories):
+            values = selections.get(dimension)
+            if values is None:
+                index.append(np.arange(len(categories)))
+            else:
+                values = set(values)
+                index.append(np.array([i for i, c in enumerate(categories) if c in values], dtype=np.intp))
+        # Les registres de chaque cellule sont contigus : les cellules retenues
+        # sont recopiées ligne à ligne, sans indexer l'axe des registres
+        m = self.registers.shape[-1]
+        if self.dimensions:
+            cells = np.ravel_multi_index(np.ix_(*index), self.registers.shape[:-1])
+            registers = self.registers.reshape(-1, m)[cells]
+        else:
+            registers = self.registers
+        axes = tuple(i for i, d in enumerate(self.dimensions) if d not in keep)
+        if registers.size == 0:
+            shape = [s for i, s in enumerate(registers.shape) if i not in axes]
+            return np.zeros(shape, dtype=np.uint8), index
+        return registers.max(axis=axes), index
+
+    def count(self, selections=None):
+        """
+        Nombre estimé de valeurs distinctes parmi les cellules retenues.
+
+        Args:
+            selections (dict, optional): Dimension -> valeurs retenues
+
+        Returns:
+            int: L'estimation
+        """
+        registers, _ = self._union(selections or {})
+        return int(np.rint(estimate(registers)))
+
+    def count_by(self, by, selections=None):
+        """
+        Nombre estimé de valeurs distinctes par modalité de la dimension `by`.
+
+        Returns:
+            tuple: (modalités observées, estimations)
+        """
+        registers, index = self._union(selections or {}, keep=(by,))
+        position = self.dimensions.index(by)
+        counts = np.rint(estimate(registers)).astype(np.int64)
+        observed = registers.any(axis=-1)
+        labels = np.array(self.categories[position], dtype=object)[index[position]]
+        return labels[observed], counts[observed]
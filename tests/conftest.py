@@ -0,0 +1,54 @@
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+# Les modules du tableau de bord sont à la racine du dépôt
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data import read_csv  # noqa: E402
+from filters import RANGE_FILTERS  # noqa: E402
+
+SAMPLE_CSV = os.path.join(ROOT, 'shopping_trends.csv')
+
+AMOUNT = 'Purchase Amount (USD)'
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    """
+    Copie de shopping_trends.csv dans un répertoire temporaire, partagée par
+    les tests qui ne la modifient pas : instantané Parquet et agrégats sont
+    écrits à côté, jamais dans le dépôt.
+    """
+    path = tmp_path_factory.mktemp('data') / 'shopping_trends.csv'
+    shutil.copyfile(SAMPLE_CSV, path)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def frame(dataset):
+    """Lignes de la copie, typées comme à la lecture du CSV par les pages."""
+    return read_csv(dataset)
+
+
+def filter_rows(df, selections):
+    """
+    Lignes retenues par une sélection, calculées directement avec pandas.
+
+    Args:
+        df (pd.DataFrame): Lignes à filtrer
+        selections (dict | tuple): Colonne -> valeurs retenues, ou bornes
+            (min, max) incluses pour les filtres d'intervalle (RANGE_FILTERS)
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in dict(selections).items():
+        if column in RANGE_FILTERS:
+            low, high = np.asarray(values, dtype=df[column].dtype)
+            mask &= df[column].between(low, high).to_numpy()
+        else:
+            mask &= df[column].isin(values).to_numpy()
+    return df[mask]
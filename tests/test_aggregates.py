@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def _budget(**env):
+    output = subprocess.run(
+        [sys.executable, '-c', 'import aggregates; print(aggregates.aggregate_cache.max_bytes)'],
+        cwd=ROOT, env={**os.environ, **env}, capture_output=True, text=True
+    )
+    return output.returncode, output.stdout.split(), output.stderr
+
+
+def test_budget_from_environment():
+    assert _budget(DASHBOARD_AGGREGATE_CACHE_BYTES='1048576')[1] == ['1048576']
+    code, _, error = _budget(DASHBOARD_AGGREGATE_CACHE_BYTES='-1')
+    assert code != 0 and "Budget du cache d'agrégats invalide" in error
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import BACKENDS, ENGINES
+from conftest import AMOUNT, filter_rows
+from ingest import STATE_FILTERS, ingest
+
+RATING = 'Review Rating'
+
+# Filtres actifs, sous la forme retournée par FilterIndex.normalize
+SELECTIONS = [
+    (),
+    (('Season', ('Winter',)),),
+    (('Category', ('Clothing',)), ('Season', ('Fall', 'Winter'))),
+    (('Gender', ('Female',)), ('Payment Method', ('Cash', 'PayPal'))),
+    (('Age', (20, 40)), ('Category', ('Footwear',))),
+    ((RATING, (3.0, 4.5)),),
+    (('Season', ()),),
+]
+
+# Moteurs comparés à pandas : les moteurs optionnels seulement s'ils sont
+# installés
+ENGINE_PARAMS = [
+    pytest.param(name, marks=pytest.mark.skipif(
+        name in ('duckdb', 'polars') and BACKENDS[name] is None, reason=f'{name} non installé'
+    ))
+    for name in ('duckdb', 'polars', 'aggregates')
+]
+
+
+def _cases(engine):
+    # Le moteur 'aggregates' ne sert que les filtres de ingest.STATE_FILTERS
+    return [
+        active for active in SELECTIONS
+        if engine != 'aggregates' or all(column in STATE_FILTERS for column, _ in active)
+    ]
+
+
+@pytest.fixture(scope='module')
+def source(dataset):
+    ingest(dataset)
+    return dataset
+
+
+@pytest.mark.parametrize('engine', ENGINE_PARAMS)
+def test_cells_match_pandas(engine, frame, source):
+    for active in _cases(engine):
+        result = ENGINES[engine].cells(['Location'], [AMOUNT, RATING], active, source)
+        result = result[result['count'] > 0].assign(Location=lambda r: r['Location'].astype(str))
+        result = result.sort_values('Location').reset_index(drop=True)
+
+        rows = filter_rows(frame, active)
+        expected = rows.groupby(rows['Location'].astype(str)).agg(count=(AMOUNT, 'size')).reset_index()
+        for measure in (AMOUNT, RATING):
+            values = rows[measure].astype(np.float64).groupby(rows['Location'].astype(str))
+            expected[f'sum({measure})'] = values.sum().to_numpy()
+            expected[f'sumsq({measure})'] = (values.apply(lambda v: (v * v).sum())).to_numpy()
+            expected[f'min({measure})'] = values.min().to_numpy()
+            expected[f'max({measure})'] = values.max().to_numpy()
+
+        assert result['Location'].tolist() == expected['Location'].tolist(), active
+        assert result['count'].to_numpy().tolist() == expected['count'].tolist(), active
+        for column in expected.columns[2:]:
+            if column.startswith('sumsq('):
+                # Seule la somme des carrés peut différer au dernier bit près
+                # (ordre des additions parallèles)
+                np.testing.assert_allclose(
+                    result[column].to_numpy(np.float64), expected[column].to_numpy(), rtol=1e-12,
+                    err_msg=str(active)
+                )
+            else:
+                np.testing.assert_array_equal(
+                    result[column].to_numpy(np.float64), expected[column].to_numpy(), err_msg=str(active)
+                )
+
+
+@pytest.mark.parametrize('engine', ENGINE_PARAMS)
+def test_distinct_by_matches_pandas(engine, frame, source):
+    for active in _cases(engine):
+        groups, counts = ENGINES[engine].distinct_by('Customer ID', 'Location', active, source)
+        result = {str(g): int(n) for g, n in zip(groups, counts) if n}
+
+        rows = filter_rows(frame, active)
+        expected = rows.groupby(rows['Location'].astype(str))['Customer ID'].nunique()
+        assert result == expected[expected > 0].to_dict(), active
+
+
+@pytest.mark.parametrize('engine', ENGINE_PARAMS)
+def test_value_counts_match_pandas(engine, frame, source):
+    for active in _cases(engine):
+        values, groups, counts = ENGINES[engine].value_counts('Age', 'Gender', active, source)
+        result = pd.DataFrame({'value': values.astype(np.int64), 'group': np.asarray(groups, dtype=str), 'n': counts})
+        result = result[result['n'] > 0]
+
+        rows = filter_rows(frame, active)
+        expected = rows.groupby(['Age', rows['Gender'].astype(str)], observed=True).size()
+        assert result.set_index(['value', 'group'])['n'].sort_index().to_dict() == expected.sort_index().to_dict(), active
+        # Légende dans l'ordre de première apparition, comme avec pandas
+        assert list(dict.fromkeys(result['group'])) == list(dict.fromkeys(rows['Gender'].astype(str))), active
+
+
+@pytest.mark.parametrize('engine', ENGINE_PARAMS)
+def test_categories_match_pandas(engine, frame, source):
+    for column in ('Season', 'Payment Method'):
+        assert list(ENGINES[engine].categories(column, source)) == sorted(frame[column].dropna().unique())
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from boxplots import BoxStats
+from conftest import AMOUNT
+
+
+# Méthode 'linear' de Plotly (Lib.interp) : position p * n - 0.5 dans les
+# valeurs triées, soit la méthode 'hazen' de np.quantile
+def _plotly_quantile(values, p):
+    return np.quantile(values, p, method='hazen')
+
+
+def _expected(values):
+    q1, median, q3 = (_plotly_quantile(values, p) for p in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outside = np.sort(values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)])
+    return q1, median, q3, inside.min(), inside.max(), outside
+
+
+@pytest.mark.parametrize('column, by', [
+    (AMOUNT, 'Category'),
+    (AMOUNT, 'Season'),
+    ('Review Rating', 'Payment Method'),
+])
+def test_quartiles_match_plotly_linear_method(frame, column, by):
+    stats = BoxStats(frame[column], frame[by].astype('category'))
+    # Boîtes dans l'ordre d'apparition, comme l'axe de px.box
+    assert stats.groups == list(pd.unique(frame[by]))
+    for i, group in enumerate(stats.groups):
+        values = frame.loc[frame[by] == group, column].to_numpy(np.float64)
+        q1, median, q3, low, high, outliers = _expected(values)
+        assert stats.count[i] == len(values)
+        assert stats.q1[i] == pytest.approx(q1)
+        assert stats.median[i] == pytest.approx(median)
+        assert stats.q3[i] == pytest.approx(q3)
+        assert (stats.lowerfence[i], stats.upperfence[i]) == (low, high)
+        np.testing.assert_array_equal(np.sort(stats.outliers[i]), outliers)
+
+
+def test_outliers_and_fences_on_skewed_values():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(50, 5, 1_000), [1, 2, 150, 160, 170]])
+    groups = pd.Series(np.where(np.arange(len(values)) % 2, 'a', 'b'), dtype='category')
+    stats = BoxStats(values, groups, max_outliers=1_000)
+    for i, group in enumerate(stats.groups):
+        q1, median, q3, low, high, outliers = _expected(values[groups == group])
+        assert (stats.q1[i], stats.median[i], stats.q3[i]) == pytest.approx((q1, median, q3))
+        assert (stats.lowerfence[i], stats.upperfence[i]) == (low, high)
+        np.testing.assert_array_equal(np.sort(stats.outliers[i]), outliers)
+
+
+def test_outliers_sample_is_bounded():
+    values = np.concatenate([np.linspace(0, 1, 1_000), np.arange(1, 101) * 1e3])
+    stats = BoxStats(values, pd.Series(['a'] * len(values), dtype='category'), max_outliers=20)
+    # Moitié du budget de chaque côté : 100 valeurs hautes, 10 transmises
+    assert len(stats.outliers[0]) == 10
+    # Extrêmes toujours conservés
+    assert stats.outliers[0].max() == values.max()
+
+
+def test_weighted_matches_rows(frame):
+    counts = frame.groupby(['Category', AMOUNT]).size().reset_index(name='n')
+    weighted = BoxStats(counts[AMOUNT], counts['Category'].astype('category'), weights=counts['n'])
+    rows = BoxStats(frame[AMOUNT], frame['Category'].astype('category'))
+    order = [rows.groups.index(g) for g in weighted.groups]
+    for stat in ('count', 'q1', 'median', 'q3', 'lowerfence', 'upperfence'):
+        np.testing.assert_array_equal(getattr(weighted, stat), getattr(rows, stat)[order])
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from contingency import ContingencyTable
+
+
+@pytest.mark.parametrize('index, columns', [
+    ('Category', 'Season'),
+    ('Size', 'Color'),
+    ('Payment Method', 'Preferred Payment Method'),
+])
+def test_chi2_matches_scipy_on_crosstab(frame, index, columns):
+    counts = pd.crosstab(frame[index], frame[columns])
+    table = ContingencyTable(counts)
+    chi2, p_value, dof, expected = stats.chi2_contingency(counts.to_numpy(), correction=False)
+    assert table.chi2 == chi2
+    assert table.p_value == p_value
+    assert table.dof == dof
+
+    # Résidus standardisés ajustés (Agresti) : (O - E) / sqrt(E (1 - r/n) (1 - c/n))
+    observed = counts.to_numpy(dtype=np.float64)
+    n = observed.sum()
+    rows = observed.sum(axis=1, keepdims=True) / n
+    cols = observed.sum(axis=0, keepdims=True) / n
+    np.testing.assert_allclose(
+        table.residuals, (observed - expected) / np.sqrt(expected * (1 - rows) * (1 - cols)), rtol=1e-12
+    )
+
+
+def test_independent_table_has_no_significant_cells():
+    rng = np.random.default_rng(0)
+    counts = pd.crosstab(rng.integers(0, 10, 50_000), rng.integers(0, 10, 50_000))
+    table = ContingencyTable(counts)
+    # Avec la correction de Bonferroni sur 100 cellules
+    assert not table.significant.any()
+    assert table.p_value > 0.01
+
+
+def test_dependent_cells_are_flagged_with_their_sign():
+    counts = pd.DataFrame([[200, 100], [100, 200]], index=['a', 'b'], columns=['x', 'y'])
+    table = ContingencyTable(counts)
+    assert table.p_value < 1e-10
+    assert table.significant.all()
+    np.testing.assert_array_equal(np.sign(table.residuals), [[1, -1], [-1, 1]])
+    assert '4 sur 4' in table.describe()
+
+
+def test_single_row_has_no_test():
+    table = ContingencyTable(pd.DataFrame([[3, 4, 5]], index=['a'], columns=['x', 'y', 'z']))
+    assert np.isnan(table.chi2) and np.isnan(table.p_value)
+    assert table.dof == 0 and not table.significant.any()
+    assert 'indisponible' in table.describe()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import AMOUNT, filter_rows
+from cube import CUBE_DIMENSIONS, CUBE_MEASURES, Cube
+
+SELECTIONS = [
+    {},
+    {'Season': ['Winter']},
+    {'Category': ['Clothing', 'Footwear'], 'Gender': ['Female']},
+    {'Payment Method': ['Cash'], 'Subscription Status': ['Yes']},
+    {'Season': []},
+]
+
+
+@pytest.fixture(scope='module')
+def cube(frame):
+    return Cube(frame)
+
+
+@pytest.mark.parametrize('selections', SELECTIONS)
+@pytest.mark.parametrize('by', [['Category'], ['Season', 'Gender'], ['Shipping Type', 'Category']])
+def test_rollup_matches_groupby(cube, frame, selections, by):
+    view = cube.view(selections)
+    rows = filter_rows(frame, selections)
+    expected = rows.groupby(by, observed=True)[AMOUNT].agg(['size', 'sum', 'mean', 'min', 'max', 'std', 'var'])
+
+    result = view.rollup(by, AMOUNT, ['count', 'sum', 'mean', 'min', 'max', 'std', 'var']).set_index(by)
+    result = result.reindex(expected.index)
+    np.testing.assert_array_equal(result['count'], expected['size'])
+    np.testing.assert_array_equal(result['sum'], expected['sum'])
+    np.testing.assert_array_equal(result['min'], expected['min'])
+    np.testing.assert_array_equal(result['max'], expected['max'])
+    np.testing.assert_allclose(result['mean'], expected['mean'], rtol=1e-12)
+    np.testing.assert_allclose(result['std'], expected['std'], rtol=1e-9)
+    np.testing.assert_allclose(result['var'], expected['var'], rtol=1e-9)
+
+
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_crosstab_matches_pandas(cube, frame, selections):
+    rows = filter_rows(frame, selections)
+    result = cube.view(selections).crosstab('Category', 'Season')
+    expected = pd.crosstab(rows['Category'].astype(str), rows['Season'].astype(str))
+    np.testing.assert_array_equal(result.index.astype(str), expected.index)
+    np.testing.assert_array_equal(result.columns.astype(str), expected.columns)
+    np.testing.assert_array_equal(result.to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize('selections', SELECTIONS[:4])
+def test_totals_match_pandas(cube, frame, selections):
+    view = cube.view(selections)
+    rows = filter_rows(frame, selections)
+    assert view.total() == len(rows)
+    assert view.total(AMOUNT, 'sum') == rows[AMOUNT].sum()
+    assert view.total('Age', 'mean') == pytest.approx(rows['Age'].mean())
+    assert view.total('Review Rating', 'max') == rows['Review Rating'].max()
+    assert view.share('Gender', 'Male') == pytest.approx((rows['Gender'] == 'Male').mean())
+    assert view.mode('Payment Method') == rows['Payment Method'].value_counts().idxmax()
+
+
+def test_where_narrows_selection(cube, frame):
+    view = cube.view({'Season': ['Winter', 'Summer']}).where('Season', ['Winter', 'Fall'])
+    assert view.total() == (frame['Season'] == 'Winter').sum()
+
+
+def test_empty_selection(cube):
+    view = cube.view({'Season': []})
+    assert view.total() == 0
+    assert np.isnan(view.total(AMOUNT, 'mean'))
+    assert view.rollup(['Category']).empty
+
+
+def test_merge_of_halves_matches_whole(cube, frame):
+    half = len(frame) // 2
+    merged = Cube(frame.iloc[:half]).merge(Cube(frame.iloc[half:]))
+    assert merged.categories == cube.categories
+    np.testing.assert_array_equal(merged.count, cube.count)
+    for measure in CUBE_MEASURES:
+        for stat in ('min', 'max'):
+            np.testing.assert_array_equal(merged.stats[measure][stat], cube.stats[measure][stat])
+        np.testing.assert_allclose(merged.stats[measure]['sum'], cube.stats[measure]['sum'], rtol=1e-12)
+
+
+def test_rows_subset_matches_filtered_frame(frame):
+    rows = np.flatnonzero(frame['Season'].eq('Spring').to_numpy())
+    subset = Cube(frame, CUBE_DIMENSIONS, CUBE_MEASURES, rows=rows)
+    expected = Cube(frame.iloc[rows])
+    np.testing.assert_array_equal(subset.count, expected.count)
+    np.testing.assert_array_equal(subset.stats[AMOUNT]['sum'], expected.stats[AMOUNT]['sum'])
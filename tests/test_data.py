@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import SCHEMA, memory_per_row, narrow, read_csv
+
+
+@pytest.mark.parametrize('values, dtype, expected', [
+    ([12, 100, 20], 'int16', 'int16'),
+    ([12, 40_000], 'int16', 'int32'),
+    ([-5, 3_000_000_000], 'int16', 'int64'),
+    ([18, 70], 'int8', 'int8'),
+    ([18, 200], 'int8', 'int16'),
+    ([12.0, 40.0], 'int16', 'int16'),
+    ([12.0, 19.99], 'int16', 'float64'),
+    ([12.0, np.nan], 'int16', 'float64'),
+    ([3.1, 4.5], 'float32', 'float32'),
+    ([], 'int16', 'int16'),
+])
+def test_narrow_keeps_every_value(values, dtype, expected):
+    series = pd.Series(values, dtype='float64' if any(isinstance(v, float) for v in values) else 'int64')
+    result = narrow(series, dtype)
+    assert str(result.dtype) == expected
+    np.testing.assert_array_equal(result.to_numpy(np.float64), series.to_numpy(np.float64).astype(expected))
+
+
+def test_wide_csv_values_are_not_wrapped(tmp_path, dataset):
+    df = pd.read_csv(dataset, nrows=3)
+    df.loc[0, 'Purchase Amount (USD)'] = 40_000
+    df.loc[1, 'Age'] = 200
+    df.loc[2, 'Previous Purchases'] = 70_000
+    path = tmp_path / 'wide.csv'
+    df.to_csv(path, index=False)
+
+    result = read_csv(str(path))
+    assert result['Purchase Amount (USD)'].tolist() == df['Purchase Amount (USD)'].tolist()
+    assert result['Age'].tolist() == df['Age'].tolist()
+    assert result['Previous Purchases'].tolist() == df['Previous Purchases'].tolist()
+
+
+def test_sample_uses_schema_types(dataset):
+    df = read_csv(dataset)
+    for column, dtype in SCHEMA.items():
+        assert str(df[column].dtype) == dtype, column
+    assert memory_per_row(df)['Purchase Amount (USD)'] == 2
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from data import read_csv
+from filters import RANGE_FILTERS, SET_FILTERS, FilterIndex
+
+
+@pytest.fixture(scope='module')
+def frame(dataset):
+    # Nombre de lignes qui n'est pas multiple de 8 : dernier octet incomplet
+    return read_csv(dataset).iloc[:3_893]
+
+
+@pytest.fixture(scope='module')
+def index(frame):
+    return FilterIndex(frame, list(SET_FILTERS), RANGE_FILTERS)
+
+
+# Intervalles étroits (lignes de l'intervalle) et larges (lignes du complément)
+@pytest.mark.parametrize('column, low, high', [
+    ('Age', 30, 32),
+    ('Age', 20, 68),
+    ('Age', 0, 18),
+    ('Review Rating', 3.0, 4.5),
+    ('Review Rating', 2.6, 2.6),
+    ('Review Rating', 5.5, 6.0),
+])
+def test_range_matches_pandas(frame, index, column, low, high):
+    low_, high_ = np.asarray([low, high], dtype=frame[column].dtype)
+    expected = frame[column].between(low_, high_).to_numpy()
+    selection = index.select({column: (low, high)})
+    np.testing.assert_array_equal(selection.mask(), expected)
+    assert len(selection) == expected.sum()
+
+
+def test_ranges_and_sets_combine(frame, index):
+    selection = index.select({'Age': (25, 45), 'Gender': ['Female'], 'Review Rating': (2.5, 4.0)})
+    expected = (
+        frame['Age'].between(25, 45) & (frame['Gender'] == 'Female')
+        & frame['Review Rating'].between(2.5, np.float32(4.0))
+    )
+    np.testing.assert_array_equal(selection.rows(), np.flatnonzero(expected.to_numpy()))
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import AMOUNT
+from histograms import Histogram
+
+RATING = 'Review Rating'
+
+# Classes calculées par Plotly.js pour px.histogram(x=..., nbins=...) :
+# xbins (start, size, end) de px.histogram(...).full_figure_for_development()
+PLOTLY_BINS = [
+    ('Age', None, (17.5, 2, 71.5)),
+    ('Age', 13, (14.5, 5, 74.5)),
+    ('Age', 26, (14.5, 5, 74.5)),
+    ('Age', 30, (17.5, 2, 71.5)),
+    ('Age', 52, (17.5, 2, 71.5)),
+    (AMOUNT, None, (19.5, 2, 101.5)),
+    (AMOUNT, 20, (19.5, 5, 104.5)),
+    (AMOUNT, 40, (19.5, 5, 104.5)),
+    (AMOUNT, 80, (19.5, 2, 101.5)),
+    (RATING, None, (2.45, 0.1, 5.05)),
+    (RATING, 10, (2.25, 0.5, 5.25)),
+    (RATING, 25, (2.4, 0.2, 5.2)),
+    ('Previous Purchases', None, (-0.5, 2, 51.5)),
+    ('Previous Purchases', 30, (-0.5, 2, 51.5)),
+]
+
+PLOTLY_BINS_SYNTHETIC = [
+    ([0.3, 0.7, 1.1], None, (0, 0.5, 1.5)),
+    ([0.3, 0.7, 1.1], 15, (0.25, 0.1, 1.15)),
+    ([0, 3, 6, 9, 30, 33], None, (-0.5, 20, 39.5)),
+    ([1.5, 2.5, 2.5, 7.25], None, (0, 5, 10)),
+    ([4, 4], None, (3.5, 1, 4.5)),
+    ([0, 1000, 2000, 5000, 10000], 10, (-0.5, 1000, 10999.5)),
+    ([0.001, 0.002, 0.0035], None, (0, 0.002, 0.004)),
+]
+
+
+def _check(histogram, values, expected):
+    start, size, end = expected
+    assert histogram.edges[0] == pytest.approx(start)
+    assert histogram.size == pytest.approx(size)
+    assert histogram.edges[-1] == pytest.approx(end)
+    # Classes fermées à gauche, comme Plotly et np.histogram ; l'arrondi
+    # range une valeur égale à une borne (2.6 = 2.4 + 0.2) dans la classe
+    # qui commence à cette borne
+    counts, _ = np.histogram(np.round(values, 9), bins=np.round(histogram.edges, 9))
+    np.testing.assert_array_equal(histogram.counts.sum(axis=0), counts)
+
+
+@pytest.mark.parametrize('column, nbins, expected', PLOTLY_BINS)
+def test_bins_match_plotly(frame, column, nbins, expected):
+    _check(Histogram(frame[column], nbins), frame[column].to_numpy(), expected)
+
+
+@pytest.mark.parametrize('values, nbins, expected', PLOTLY_BINS_SYNTHETIC)
+def test_bins_match_plotly_synthetic(values, nbins, expected):
+    _check(Histogram(values, nbins), np.asarray(values, dtype=np.float64), expected)
+
+
+def test_weighted_matches_rows(frame):
+    counts = frame[AMOUNT].value_counts()
+    weighted = Histogram(counts.index.to_numpy(), weights=counts.to_numpy())
+    rows = Histogram(frame[AMOUNT])
+    np.testing.assert_array_equal(weighted.edges, rows.edges)
+    np.testing.assert_array_equal(weighted.counts, rows.counts)
+
+
+def test_groups_in_order_of_appearance(frame):
+    groups = frame['Gender'].astype('category')
+    histogram = Histogram(frame['Age'], 30, groups)
+    assert histogram.groups == list(pd.unique(frame['Gender']))
+    for i, group in enumerate(histogram.groups):
+        counts, _ = np.histogram(frame.loc[frame['Gender'] == group, 'Age'], bins=histogram.edges)
+        np.testing.assert_array_equal(histogram.counts[i], counts)
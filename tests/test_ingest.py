@@ -0,0 +1,185 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest as ingest_module
+from conftest import AMOUNT, SAMPLE_CSV
+from ingest import MAX_AXIS_VALUES, MAX_GRID_VALUES, _numeric_axes, _previous, ingest
+
+RATING = 'Review Rating'
+
+# Filtres actifs servis par les agrégats
+SELECTIONS = [
+    (),
+    (('Season', ('Winter',)),),
+    (('Category', ('Clothing', 'Footwear')), ('Gender', ('Female',))),
+    (('Payment Method', ('Cash',)), ('Subscription Status', ('Yes',))),
+]
+
+
+# Lignes d'un DataFrame triées, les flottants arrondis (l'ordre des additions
+# dépend du découpage en blocs)
+def _records(df):
+    df = df.round(6).astype(str)
+    return sorted(map(tuple, df.to_numpy().tolist()))
+
+
+# Réponses de l'état à toutes les requêtes du moteur 'aggregates'
+def _answers(state):
+    answers = {'rows': state.n_rows, 'options': state.filter_options()}
+    for active in SELECTIONS:
+        cells = state.cells(['Location'], [AMOUNT, RATING], active)
+        values, groups, counts = state.value_counts('Age', 'Gender', active)
+        quantiles = state.quantiles[AMOUNT]
+        answers[active] = (
+            _records(cells[cells['count'] > 0]),
+            state.distinct('Customer ID', active),
+            list(zip(values.tolist(), np.asarray(groups, dtype=str).tolist(), counts.tolist())),
+            quantiles.quantile(0.5, dict(active)),
+            [a.tolist() for a in quantiles.value_counts('Category', dict(active))],
+        )
+    return answers
+
+
+def _copy(directory, name, rows=None):
+    path = str(directory / name)
+    if rows is None:
+        shutil.copyfile(SAMPLE_CSV, path)
+    else:
+        pd.read_csv(SAMPLE_CSV).iloc[rows].to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope='module')
+def whole(tmp_path_factory):
+    return ingest(_copy(tmp_path_factory.mktemp('whole'), 'data.csv'), chunk_rows=10_000)
+
+
+def test_chunked_ingest_matches_single_pass(tmp_path, whole):
+    chunked = ingest(_copy(tmp_path, 'data.csv'), chunk_rows=700)
+    assert _answers(chunked) == _answers(whole)
+
+
+def test_numeric_axes_stay_bounded(tmp_path):
+    # Montants et notes continus : une valeur distincte par ligne ou presque
+    rng = np.random.default_rng(0)
+    df = pd.concat([pd.read_csv(SAMPLE_CSV)] * 3, ignore_index=True)
+    df[AMOUNT] = np.round(rng.lognormal(4, 1, len(df)), 2)
+    df[RATING] = np.round(rng.uniform(1, 5, len(df)), 3)
+    path = str(tmp_path / 'continuous.csv')
+    df.to_csv(path, index=False)
+
+    state = ingest(path, chunk_rows=2_000)
+    for cube in state.views.values():
+        numeric, limit = _numeric_axes(cube.dimensions)
+        assert limit in (MAX_AXIS_VALUES, MAX_GRID_VALUES)
+        for dimension in numeric:
+            assert len(cube.categories[cube.dimensions.index(dimension)]) <= limit
+        assert cube.view().total() == len(df)
+    # Les mesures restent exactes, seuls les axes sont regroupés
+    cells = state.cells(['Location'], [AMOUNT], ())
+    assert cells[f'sum({AMOUNT})'].sum() == pytest.approx(df[AMOUNT].sum())
+    assert cells[f'max({AMOUNT})'].max() == df[AMOUNT].max()
+
+
+def test_bounded_axis_keeps_low_quantiles(tmp_path):
+    # Montants de 1 à 10 000 : bien plus de MAX_AXIS_VALUES intervalles à 1 %
+    rng = np.random.default_rng(1)
+    df = pd.concat([pd.read_csv(SAMPLE_CSV)] * 2, ignore_index=True)
+    df[AMOUNT] = np.round(np.exp(rng.uniform(0, np.log(10_000), len(df))), 2)
+    assert df[AMOUNT].nunique() > MAX_AXIS_VALUES
+    path = str(tmp_path / 'wide.csv')
+    df.to_csv(path, index=False)
+
+    values, _, counts = ingest(path, chunk_rows=2_000).value_counts(AMOUNT, None, ())
+    assert len(values) <= MAX_AXIS_VALUES
+    # Les intervalles sont élargis sur toute l'échelle : les quantiles bas
+    # restent à quelques pourcents près, comme les hauts
+    cumulative = np.cumsum(counts) / counts.sum()
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.99):
+        estimate = values[np.searchsorted(cumulative, q)]
+        assert estimate == pytest.approx(df[AMOUNT].quantile(q), rel=0.05)
+
+
+def test_append_matches_full_ingest(tmp_path, whole, monkeypatch):
+    path = _copy(tmp_path, 'data.csv', slice(0, 2_500))
+    ingest(path, chunk_rows=1_000)
+    with open(SAMPLE_CSV, 'rb') as f:
+        appended = f.read().splitlines(keepends=True)[2_501:]
+    with open(path, 'ab') as f:
+        f.writelines(appended)
+
+    # Seules les lignes ajoutées sont lues, à partir de l'état enregistré
+    assert _previous(path, os.path.getsize(path)) is not None
+    parsed = []
+    update = ingest_module.AggregateState.update
+    monkeypatch.setattr(ingest_module.AggregateState, 'update',
+                        lambda state, chunk: parsed.append(len(chunk)) or update(state, chunk))
+    assert _answers(ingest(path, chunk_rows=1_000)) == _answers(whole)
+    assert sum(parsed) == len(appended)
+
+
+def test_rewritten_file_is_read_again(tmp_path):
+    path = _copy(tmp_path, 'data.csv', slice(0, 2_500))
+    ingest(path)
+    # Début du fichier modifié : tout est relu
+    rewritten = pd.read_csv(SAMPLE_CSV).iloc[::-1]
+    rewritten.to_csv(path, index=False)
+    assert _previous(path, os.path.getsize(path)) is None
+
+    expected = str(tmp_path / 'expected.csv')
+    rewritten.to_csv(expected, index=False)
+    assert _answers(ingest(path)) == _answers(ingest(expected))
+
+
+def _with_ids(tmp_path, ids):
+    df = pd.read_csv(SAMPLE_CSV)
+    df['Customer ID'] = ids(len(df))
+    path = str(tmp_path / 'ids.csv')
+    df.to_csv(path, index=False)
+    return df, path
+
+
+def test_sparse_customer_ids_keep_state_small(tmp_path):
+    # Identifiants négatifs ou de l'ordre de 10^15 : l'ensemble des clients
+    # dépend de leur nombre, pas de leur valeur
+    df, path = _with_ids(tmp_path, lambda n: (np.arange(n, dtype=np.int64) - 100) * 10**12)
+    state = ingest(path, chunk_rows=700)
+    assert state.customers.nbytes == 8 * len(df)
+    assert not state.repeated_customers
+    assert state.distinct('Customer ID', ()) == len(df)
+    assert state.distinct_error(()) == 0
+
+
+def test_repeated_customers_across_blocks(tmp_path):
+    df, path = _with_ids(tmp_path, lambda n: np.arange(n) % 1_000 - 300)
+    state = ingest(path, chunk_rows=1_000)
+    assert state.repeated_customers
+    assert state.distinct('Customer ID', ()) == 1_000
+    winter = (('Season', ('Winter',)),)
+    exact = df.loc[df['Season'] == 'Winter', 'Customer ID'].nunique()
+    assert abs(state.distinct('Customer ID', winter) - exact) <= 4 * state.distinct_error(winter) * exact
+
+
+def test_customer_set_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_module, 'MAX_EXACT_CUSTOMERS', 2_000)
+    df, path = _with_ids(tmp_path, lambda n: np.arange(n) * 7)
+    state = ingest(path, chunk_rows=1_000)
+    # Au-delà du plafond, le compte est estimé par le sketch des clients
+    assert state.customers is None
+    assert state.distinct_error(()) > 0
+    exact = df['Customer ID'].nunique()
+    assert abs(state.distinct('Customer ID', ()) - exact) <= 4 * state.distinct_error(()) * exact
+
+
+@pytest.mark.parametrize('value', ['', '12.5'])
+def test_invalid_customer_ids_are_rejected(tmp_path, value):
+    df = pd.read_csv(SAMPLE_CSV, dtype={'Customer ID': str})
+    df.loc[10, 'Customer ID'] = value
+    path = str(tmp_path / 'invalid.csv')
+    df.to_csv(path, index=False)
+    with pytest.raises(ValueError, match='Customer ID'):
+        ingest(path, chunk_rows=1_000)
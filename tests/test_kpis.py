@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from conftest import AMOUNT, filter_rows
+from cube import Cube
+from filters import FilterIndex
+from kpis import DistinctIndex, compute_kpis, compute_row_kpis
+
+SELECTIONS = [
+    {},
+    {'Season': ['Winter']},
+    {'Category': ['Clothing', 'Footwear'], 'Gender': ['Female']},
+    {'Payment Method': ['Cash'], 'Subscription Status': ['No']},
+]
+
+
+@pytest.fixture(scope='module')
+def cube(frame):
+    return Cube(frame)
+
+
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_kpis_match_pandas(cube, frame, selections):
+    rows = filter_rows(frame, selections)
+    kpis = compute_kpis(cube.view(selections), rows['Customer ID'].nunique())
+
+    subscribers = rows['Subscription Status'] == 'Yes'
+    assert kpis.purchases == len(rows)
+    assert kpis.customers == rows['Customer ID'].nunique()
+    assert kpis.revenue == rows[AMOUNT].sum()
+    assert kpis.avg_basket == pytest.approx(rows[AMOUNT].mean())
+    assert kpis.max_basket == rows[AMOUNT].max()
+    assert kpis.avg_age == pytest.approx(rows['Age'].mean())
+    assert kpis.avg_rating == pytest.approx(rows['Review Rating'].mean())
+    assert kpis.subscription_rate == pytest.approx(subscribers.mean() * 100)
+    assert kpis.no_promo_rate == pytest.approx((rows['Promo Code Used'] == 'No').mean() * 100)
+    np.testing.assert_allclose(
+        [kpis.subscriber_basket, kpis.non_subscriber_basket],
+        [rows.loc[subscribers, AMOUNT].mean(), rows.loc[~subscribers, AMOUNT].mean()]
+    )
+    assert kpis.n_categories == rows['Category'].nunique()
+    assert kpis.top_category == rows['Category'].value_counts().idxmax()
+    assert kpis.top_payment_method == rows['Payment Method'].value_counts().idxmax()
+    assert kpis.top_shipping_type == rows['Shipping Type'].value_counts().idxmax()
+
+
+def test_empty_selection_kpis(cube):
+    kpis = compute_kpis(cube.view({'Season': []}), 0)
+    assert (kpis.purchases, kpis.customers, kpis.revenue) == (0, 0, 0.0)
+    assert np.isnan(kpis.avg_basket) and np.isnan(kpis.subscription_rate)
+    assert kpis.top_category is None
+
+
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_row_kpis_match_pandas(frame, selections):
+    rows = filter_rows(frame, selections)
+    kpis = compute_row_kpis(rows)
+    assert kpis.distinct_items == rows['Item Purchased'].nunique()
+    assert kpis.top_color == rows['Color'].value_counts().idxmax()
+    assert kpis.discount_rate == pytest.approx((rows['Discount Applied'] == 'Yes').mean() * 100)
+    assert kpis.avg_previous_purchases == pytest.approx(rows['Previous Purchases'].mean())
+    assert kpis.returning_rate == pytest.approx((rows['Previous Purchases'] > 0).mean() * 100)
+
+
+@pytest.mark.parametrize('ids', [
+    lambda n: np.arange(n),
+    lambda n: np.arange(n) % 500,
+])
+def test_distinct_index_matches_nunique(frame, ids):
+    customers = ids(len(frame))
+    index = DistinctIndex(customers)
+    filter_index = FilterIndex(frame, ['Season', 'Gender'])
+    for selections in ({}, {'Season': ['Winter']}, {'Season': ['Fall'], 'Gender': ['Male']}):
+        expected = len(np.unique(customers[filter_rows(frame, selections).index]))
+        assert index.count(filter_index.select(selections)) == expected
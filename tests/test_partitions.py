@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+import data
+from backend import BACKENDS, ENGINES
+from data import load_data, load_partitions, select_partitions
+from filters import load_selection
+from partition import write_partitions
+
+COLUMNS = ['Age', 'Season', 'Category', 'Color', 'Purchase Amount (USD)', 'Review Rating', 'State_Code']
+
+SELECTIONS = [
+    {},
+    {'Season': ['Winter']},
+    {'Season': ['Winter', 'Fall'], 'Category': ['Clothing']},
+    {'Category': ['Footwear'], 'Age': (20, 40), 'Gender': ['Male']},
+    {'Season': ['Spring'], 'Review Rating': (3.0, 4.5)},
+    {'Category': []},
+]
+
+
+@pytest.fixture(scope='module', params=[(['Season', 'Category'], 'parquet'), (['Season'], 'csv')])
+def directory(request, dataset, tmp_path_factory):
+    by, fmt = request.param
+    path = str(tmp_path_factory.mktemp('partitions') / f"{'_'.join(by)}_{fmt}")
+    write_partitions(dataset, path, by, fmt)
+    return path
+
+
+def test_excluded_partitions_are_not_selected(directory):
+    manifest = load_partitions(directory)
+    assert select_partitions(directory, ()) == list(range(len(manifest['partitions'])))
+    for active in [(('Season', ('Winter',)),), (('Category', ('Clothing',)), ('Season', ('Fall', 'Winter')))]:
+        kept = select_partitions(directory, active)
+        assert kept
+        for i, partition in enumerate(manifest['partitions']):
+            selected = all(
+                value in dict(active)[column] for column, value in partition['values'].items() if column in dict(active)
+            )
+            assert (i in kept) == selected
+    assert select_partitions(directory, (('Season', ()),)) == []
+
+
+def test_partitions_keep_csv_row_order(dataset, directory):
+    pd.testing.assert_frame_equal(load_data(COLUMNS, directory), load_data(COLUMNS, dataset), check_categorical=False)
+
+
+def test_load_selection_matches_csv(dataset, directory):
+    for selections in SELECTIONS:
+        pd.testing.assert_frame_equal(
+            load_selection(COLUMNS, selections, directory).reset_index(drop=True),
+            load_selection(COLUMNS, selections, dataset).reset_index(drop=True),
+            check_categorical=False, obj=str(selections)
+        )
+
+
+def test_empty_selection_reads_no_partition(dataset, directory, monkeypatch):
+    def read_partition(*args):
+        raise AssertionError('partition lue')
+
+    monkeypatch.setattr(data, 'read_partition', read_partition)
+    empty = load_data(COLUMNS, directory, partitions=[])
+    assert empty.empty
+    # Mêmes colonnes et mêmes types que le jeu complet
+    pd.testing.assert_frame_equal(empty, load_data(COLUMNS, dataset).head(0), check_categorical=False)
+
+
+@pytest.mark.parametrize('engine', [
+    pytest.param(name, marks=pytest.mark.skipif(BACKENDS[name] is None, reason=f'{name} non installé'))
+    for name in ('duckdb', 'polars')
+])
+def test_engines_read_only_selected_partitions(engine, dataset, directory):
+    for active in [(), (('Season', ('Winter',)),), (('Category', ('Clothing',)), ('Season', ('Fall', 'Winter'))),
+                   (('Season', ()),)]:
+        assert (
+            [a.tolist() for a in ENGINES[engine].value_counts('Age', 'Category', active, directory)]
+            == [a.tolist() for a in ENGINES[engine].value_counts('Age', 'Category', active, dataset)]
+        ), active
+        left = ENGINES[engine].cells(['Season'], ['Purchase Amount (USD)'], active, directory)
+        right = ENGINES[engine].cells(['Season'], ['Purchase Amount (USD)'], active, dataset)
+        pd.testing.assert_frame_equal(
+            left.astype({'Season': str}).sort_values('Season').reset_index(drop=True),
+            right.astype({'Season': str}).sort_values('Season').reset_index(drop=True),
+            check_dtype=False, obj=str(active)
+        )
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import AGGREGATES
+from conftest import AMOUNT, filter_rows
+from contingency import ContingencyTable
+from planner import AggregateSpec, Batch, execute, plan
+
+NAMES = [
+    'sales_by_category', 'revenue_by_season', 'avg_basket_by_gender', 'promo_impact',
+    'category_season_matrix', 'sales_by_size', 'sales_by_color', 'sales_by_item', 'size_color_matrix',
+    'payment_preference_matrix',
+]
+
+SELECTIONS = [
+    {},
+    {'Season': ['Winter', 'Spring']},
+    # Filtres hors du cube : cube construit sur les lignes retenues
+    {'Location': ['California', 'Texas', 'New York'], 'Age': (25, 50)},
+]
+
+
+def test_plan_batches_cube_specs_together():
+    specs = {name: AGGREGATES[name] for name in NAMES}
+    batches = plan(specs, lambda column: 10)
+    assert batches[0] == Batch(None, (), (
+        'sales_by_category', 'revenue_by_season', 'avg_basket_by_gender', 'promo_impact', 'category_season_matrix'
+    ))
+    # Hors du cube : un seul lot, une dimension par colonne
+    assert batches[1:] == [Batch(
+        ('Size', 'Color', 'Item Purchased', 'Payment Method', 'Preferred Payment Method'), (),
+        ('sales_by_size', 'sales_by_color', 'sales_by_item', 'size_color_matrix', 'payment_preference_matrix')
+    )]
+
+
+def test_plan_splits_batches_over_max_cells():
+    specs = {
+        'a': AggregateSpec(('Size',)),
+        'b': AggregateSpec(('Color',), 'Previous Purchases', 'mean'),
+        'c': AggregateSpec(('Item Purchased',)),
+    }
+    batches = plan(specs, lambda column: 10, max_cells=100)
+    assert batches == [
+        Batch(('Size', 'Color'), ('Previous Purchases',), ('a', 'b')),
+        Batch(('Item Purchased',), (), ('c',)),
+    ]
+    # Sans plafond atteignable, chaque agrégat forme son lot
+    assert len(plan(specs, lambda column: 10, max_cells=0)) == 3
+
+
+def _assert_same(result, expected):
+    if isinstance(result, ContingencyTable):
+        pd.testing.assert_frame_equal(result.counts, expected.counts)
+    else:
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_batched_results_match_single_evaluation(dataset, selections):
+    specs = {name: AGGREGATES[name] for name in NAMES}
+    batched = execute(specs, selections, dataset)
+    for name in NAMES:
+        _assert_same(batched[name], execute({name: specs[name]}, selections, dataset)[name])
+
+
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_results_match_pandas(dataset, frame, selections):
+    results = execute({name: AGGREGATES[name] for name in NAMES}, selections, dataset)
+    rows = filter_rows(frame, selections)
+
+    for name, column in [('sales_by_category', 'Category'), ('sales_by_size', 'Size'),
+                         ('sales_by_color', 'Color'), ('sales_by_item', 'Item Purchased')]:
+        counts = results[name]
+        # Effectifs décroissants, comme value_counts()
+        assert counts['count'].is_monotonic_decreasing
+        assert dict(zip(counts[column].astype(str), counts['count'])) == \
+            rows[column].astype(str).value_counts().to_dict()
+
+    revenue = results['revenue_by_season'].set_index('Season')[AMOUNT]
+    expected = rows.groupby('Season', observed=True)[AMOUNT].sum()
+    assert revenue.to_dict() == expected.to_dict()
+
+    basket = results['avg_basket_by_gender'].set_index('Gender')[AMOUNT]
+    expected = rows.groupby('Gender', observed=True)[AMOUNT].mean()
+    np.testing.assert_allclose(basket.reindex(expected.index), expected)
+
+    promo = results['promo_impact'].set_index('Promo Code Used')
+    expected = rows.groupby('Promo Code Used', observed=True)[AMOUNT].agg(['mean', 'count'])
+    np.testing.assert_allclose(promo.reindex(expected.index)[['mean', 'count']], expected)
+
+    for name, (index, columns) in [('category_season_matrix', ('Category', 'Season')),
+                                   ('size_color_matrix', ('Size', 'Color')),
+                                   ('payment_preference_matrix', ('Payment Method', 'Preferred Payment Method'))]:
+        table = results[name].counts
+        expected = pd.crosstab(rows[index].astype(str), rows[columns].astype(str))
+        assert table.index.astype(str).tolist() == expected.index.tolist()
+        assert table.columns.astype(str).tolist() == expected.columns.tolist()
+        np.testing.assert_array_equal(table.to_numpy(), expected.to_numpy())
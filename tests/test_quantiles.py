@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import AMOUNT
+from data import read_csv
+from quantiles import MAX_EXACT_VALUES, RELATIVE_ACCURACY, QuantileSketch, representative
+
+QUANTILES = [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]
+
+
+# Montants continus, dont des articles offerts (zéro) et des remboursements
+# (négatifs) : bien plus de MAX_EXACT_VALUES valeurs distinctes
+def _frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = np.round(rng.lognormal(3, 1.5, n_rows), 2)
+    amounts[rng.random(n_rows) < 0.3] = 0
+    refunds = rng.random(n_rows) < 0.1
+    amounts[refunds] = -amounts[refunds]
+    return pd.DataFrame({
+        AMOUNT: amounts,
+        'Season': pd.Categorical(rng.choice(['Fall', 'Spring', 'Summer', 'Winter'], n_rows)),
+        'Category': pd.Categorical(rng.choice(['Accessories', 'Clothing', 'Footwear'], n_rows)),
+    })
+
+
+def _chunk(df, rows):
+    chunk = df.iloc[rows]
+    return chunk.assign(**{c: chunk[c].cat.remove_unused_categories() for c in ('Season', 'Category')})
+
+
+def _assert_same(left, right):
+    assert left.exact == right.exact
+    assert left.categories == right.categories
+    np.testing.assert_array_equal(left.values, right.values)
+    np.testing.assert_array_equal(left.counts, right.counts)
+    np.testing.assert_array_equal(left.first, right.first)
+
+
+def test_exact_quantiles_match_pandas(dataset):
+    df = read_csv(dataset, [AMOUNT, 'Season', 'Category'])
+    sketch = QuantileSketch(df, AMOUNT, ['Season', 'Category'])
+    assert sketch.exact and sketch.error == 0
+    for selections in [{}, {'Season': ['Winter']}, {'Season': ['Fall', 'Spring'], 'Category': ['Clothing']}]:
+        rows = df[np.logical_and.reduce([df[c].isin(v) for c, v in selections.items()] or [np.ones(len(df), bool)])]
+        for p in QUANTILES:
+            assert sketch.quantile(p, selections) == pytest.approx(rows[AMOUNT].quantile(p))
+    assert np.isnan(sketch.quantile(0.5, {'Season': []}))
+
+
+def test_bucketed_quantiles_within_relative_accuracy():
+    # Nombre impair de lignes : chaque quantile testé tombe sur une valeur
+    df = _frame(40_001)
+    sketch = QuantileSketch(df, AMOUNT, ['Season', 'Category'])
+    assert not sketch.exact and sketch.error == RELATIVE_ACCURACY
+    for p in QUANTILES:
+        expected = np.quantile(df[AMOUNT], p)
+        assert abs(sketch.quantile(p) - expected) <= RELATIVE_ACCURACY * abs(expected), p
+
+
+def test_zero_and_negative_values_keep_their_sign():
+    df = _frame(20_000)
+    sketch = QuantileSketch(df, AMOUNT, [])
+    assert 0.0 in sketch.values
+    # Le zéro est compté à part, les valeurs négatives ont des représentants négatifs
+    assert sketch.counts[sketch.values == 0].sum() == (df[AMOUNT] == 0).sum()
+    assert sketch.counts[sketch.values < 0].sum() == (df[AMOUNT] < 0).sum()
+    values = df[AMOUNT].to_numpy()
+    labels = representative(values)
+    assert (np.sign(labels) == np.sign(values)).all()
+    assert (np.abs(labels - values) <= RELATIVE_ACCURACY * np.abs(values)).all()
+    np.testing.assert_array_equal(representative(labels), labels)
+
+
+@pytest.mark.parametrize('n_rows', [3_000, 40_000])
+def test_merge_equals_single_sketch(n_rows):
+    # 3 000 lignes : des blocs exacts fusionnés en intervalles ; 40 000 : des
+    # blocs exacts et d'autres déjà en intervalles
+    df = _frame(n_rows)
+    whole = QuantileSketch(df, AMOUNT, ['Season', 'Category'])
+    bounds = [0, 150, n_rows // 3, n_rows]
+    parts = [
+        QuantileSketch(_chunk(df, slice(start, stop)), AMOUNT, ['Season', 'Category'], np.arange(start, stop))
+        for start, stop in zip(bounds, bounds[1:])
+    ]
+    assert parts[0].exact and not whole.exact
+    _assert_same(parts[0].merge(parts[1]).merge(parts[2]), whole)
+    _assert_same(parts[2].merge(parts[0].merge(parts[1])), whole)
+
+
+def test_exact_merge_stays_exact(dataset):
+    df = read_csv(dataset, [AMOUNT, 'Season', 'Category'])
+    whole = QuantileSketch(df, AMOUNT, ['Season', 'Category'])
+    half = len(df) // 2
+    left = QuantileSketch(_chunk(df, slice(0, half)), AMOUNT, ['Season', 'Category'])
+    right = QuantileSketch(_chunk(df, slice(half, None)), AMOUNT, ['Season', 'Category'], np.arange(half, len(df)))
+    assert len(whole.values) <= MAX_EXACT_VALUES
+    _assert_same(left.merge(right), whole)
+
+
+def test_missing_values_are_ignored():
+    df = _frame(1_000).astype({AMOUNT: 'float64'})
+    df.loc[::7, AMOUNT] = np.nan
+    sketch = QuantileSketch(df, AMOUNT, ['Season'])
+    assert sketch.counts.sum() == df[AMOUNT].notna().sum()
+    assert sketch.quantile(0.5) == pytest.approx(df[AMOUNT].quantile(0.5), rel=RELATIVE_ACCURACY)
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import plotly.express as px
+import pytest
+
+from conftest import ROOT
+from data import load_data
+from scatter import SCATTER_DENSITY_ROWS, SCATTER_WEBGL_ROWS, LinearFit, ScatterSummary
+
+
+def _points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.round(rng.uniform(2.5, 5, n), 1)
+    return x, np.round(20 + 10 * x + rng.normal(0, 5, n))
+
+
+@pytest.mark.parametrize('n, trace', [
+    (SCATTER_WEBGL_ROWS, 'scatter'),
+    (SCATTER_WEBGL_ROWS + 1, 'scattergl'),
+    (SCATTER_DENSITY_ROWS, 'scattergl'),
+    (SCATTER_DENSITY_ROWS + 1, 'heatmap'),
+])
+def test_rendering_switches_at_thresholds(n, trace):
+    figure = ScatterSummary(*_points(n)).figure()
+    assert figure.data[0].type == trace
+
+
+def test_density_payload_is_bounded():
+    small = len(ScatterSummary(*_points(SCATTER_DENSITY_ROWS + 1)).figure().to_json())
+    large = len(ScatterSummary(*_points(20 * SCATTER_DENSITY_ROWS)).figure().to_json())
+    points = len(ScatterSummary(*_points(SCATTER_DENSITY_ROWS)).figure().to_json())
+    assert large < 1.1 * small
+    # Sous le seuil, le nuage reste de l'ordre de quelques centaines de Ko
+    assert points < 300 * 1024
+
+
+def test_points_payload_not_larger_than_px_scatter(dataset):
+    x, y = 'Review Rating', 'Purchase Amount (USD)'
+    # Colonnes typées comme dans le tableau de bord (note en float32)
+    df = load_data([x, y], dataset).sample(SCATTER_DENSITY_ROWS, replace=True, random_state=0)
+    summary = ScatterSummary(df[x], df[y])
+    assert len(summary.figure(x=x, y=y).to_json()) <= len(px.scatter(df, x=x, y=y).to_json())
+    # Un point par couple distinct
+    assert len(summary.x) == len(df[[x, y]].drop_duplicates())
+    assert summary.x[0] == 2.5
+
+
+def test_weighted_points_switch_on_row_count():
+    # Couples distincts et effectifs (moteurs de requêtes) : le seuil porte
+    # sur le nombre de lignes représentées
+    x, y = _points(100)
+    summary = ScatterSummary(x, y, weights=np.full(100, SCATTER_DENSITY_ROWS // 50))
+    assert summary.density is not None
+    assert summary.density[0].sum() == summary.n
+
+
+def test_fit_matches_polyfit():
+    x, y = _points(5_000)
+    fit = LinearFit(x, y)
+    slope, intercept = np.polyfit(x, y, 1)
+    assert fit.slope == pytest.approx(slope)
+    assert fit.intercept == pytest.approx(intercept)
+
+
+def _thresholds(**env):
+    output = subprocess.run(
+        [sys.executable, '-c', 'import scatter; print(scatter.SCATTER_WEBGL_ROWS, scatter.SCATTER_DENSITY_ROWS)'],
+        cwd=ROOT, env={**os.environ, **env}, capture_output=True, text=True
+    )
+    return output.returncode, output.stdout.split(), output.stderr
+
+
+def test_thresholds_from_environment():
+    assert _thresholds(DASHBOARD_SCATTER_WEBGL_ROWS='100', DASHBOARD_SCATTER_DENSITY_ROWS='1000')[1] == ['100', '1000']
+    code, _, error = _thresholds(DASHBOARD_SCATTER_DENSITY_ROWS='beaucoup')
+    assert code != 0 and 'Seuils du nuage de points invalides' in error
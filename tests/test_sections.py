@@ -0,0 +1,33 @@
+import pandas as pd
+import streamlit as st
+
+from sections import ALL_FILTERS, SECTIONS, section
+
+SELECTIONS = {'Season': ['Winter'], 'Subscription Status': ['Yes'], 'Age': (20, 40)}
+
+
+def test_section_receives_declared_filters_only():
+    received = []
+
+    @section('test/filters', [c for c in ALL_FILTERS if c != 'Subscription Status'])
+    def render(selections):
+        received.append(selections)
+
+    render(SELECTIONS)
+    assert received == [{'Season': ['Winter'], 'Age': (20, 40)}]
+    assert SECTIONS['test/filters'][1] is None
+    assert st.session_state['section_timings']['test/filters'] >= 0
+
+
+def test_section_loads_declared_columns(dataset):
+    received = []
+
+    @section('test/columns', ALL_FILTERS, columns=['Age', 'Season'], path=dataset)
+    def render(selections, df_filtered):
+        received.append(df_filtered)
+
+    render({'Season': ['Winter']})
+    df = pd.read_csv(dataset)
+    expected = df.loc[df['Season'] == 'Winter', ['Age', 'Season']]
+    assert received[0]['Age'].tolist() == expected['Age'].tolist()
+    assert list(received[0].columns) == ['Age', 'Season']
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import DistinctSketch
+
+
+def _frame(n_rows, n_distinct, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Customer ID': rng.integers(0, n_distinct, n_rows),
+        'Season': pd.Categorical(rng.choice(['Fall', 'Spring', 'Summer', 'Winter'], n_rows)),
+        'Category': pd.Categorical(rng.choice(['Accessories', 'Clothing', 'Footwear'], n_rows)),
+    })
+
+
+# Bloc de lignes avec ses seules modalités observées, comme un bloc lu par ingest.py
+def _chunk(df, rows):
+    chunk = df.iloc[rows]
+    return chunk.assign(**{c: chunk[c].cat.remove_unused_categories() for c in ('Season', 'Category')})
+
+
+def test_merge_equals_single_sketch():
+    df = _frame(20_000, 5_000)
+    whole = DistinctSketch(df, 'Customer ID', ['Season', 'Category'])
+    parts = [DistinctSketch(_chunk(df, rows), 'Customer ID', ['Season', 'Category'])
+             for rows in (slice(0, 7), slice(7, 12_000), slice(12_000, None))]
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    assert merged.categories == whole.categories
+    np.testing.assert_array_equal(merged.registers, whole.registers)
+    np.testing.assert_array_equal(parts[2].merge(parts[0]).merge(parts[1]).registers, whole.registers)
+
+
+@pytest.mark.parametrize('n_distinct', [1, 50, 3_000, 200_000])
+def test_estimate_within_error(n_distinct):
+    df = _frame(max(4 * n_distinct, 1_000), n_distinct, seed=n_distinct)
+    sketch = DistinctSketch(df, 'Customer ID', ['Season', 'Category'])
+    exact = df['Customer ID'].nunique()
+    # Quatre erreurs types : un échec sur plusieurs milliers de tirages
+    assert abs(sketch.count() - exact) <= max(4 * sketch.error * exact, 1)
+
+
+def test_selection_and_groups():
+    df = _frame(40_000, 20_000)
+    sketch = DistinctSketch(df, 'Customer ID', ['Season', 'Category'])
+    selections = {'Season': ['Winter', 'Fall'], 'Category': ['Clothing']}
+    rows = df[df['Season'].isin(selections['Season']) & df['Category'].isin(selections['Category'])]
+    exact = rows['Customer ID'].nunique()
+    assert abs(sketch.count(selections) - exact) <= 4 * sketch.error * exact
+
+    groups, counts = sketch.count_by('Season', {'Category': ['Clothing']})
+    expected = df[df['Category'] == 'Clothing'].groupby('Season', observed=True)['Customer ID'].nunique()
+    assert sorted(groups) == sorted(expected.index)
+    for group, count in zip(groups, counts):
+        assert abs(count - expected[group]) <= 4 * sketch.error * expected[group]
+
+
+def test_empty_selection_counts_zero():
+    sketch = DistinctSketch(_frame(1_000, 100), 'Customer ID', ['Season'])
+    assert sketch.count({'Season': []}) == 0
+    assert sketch.count({'Season': ['Autumn']}) == 0
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from data import ensure_snapshot, read_csv, read_zone_map
+from zonemaps import MAX_ZONE_VALUES, ZONE_COLUMNS, ZoneMap
+
+RANGES = [
+    {},
+    {'Age': (20, 40)},
+    {'Age': (30, 30), 'Review Rating': (3.0, 4.5)},
+    {'Previous Purchases': (10, 25), 'Purchase Amount (USD)': (40, 80)},
+    {'Age': (90, 99)},
+]
+
+
+@pytest.fixture(scope='module')
+def frame(dataset):
+    # Lignes triées par âge : la plupart des zones sont alors sautées ou
+    # entièrement contenues dans un filtre sur l'âge
+    return read_csv(dataset, ZONE_COLUMNS).sort_values('Age', kind='stable').reset_index(drop=True)
+
+
+def _expected(frame, column, ranges):
+    mask = np.ones(len(frame), dtype=bool)
+    for other, (low, high) in ranges.items():
+        low, high = np.asarray([low, high], dtype=frame[other].dtype)
+        mask &= frame[other].between(low, high).to_numpy()
+    return frame.loc[mask, column].value_counts()
+
+
+@pytest.mark.parametrize('column', ['Age', 'Purchase Amount (USD)'])
+def test_zone_counts_match_rows(frame, column):
+    zone_map = ZoneMap.from_frame(frame, zone_rows=250)
+    for ranges in RANGES:
+        values, counts, partial, skipped = zone_map.value_counts(column, ranges)
+        counts = counts + zone_map.scan(column, ranges, partial, frame)
+        expected = _expected(frame, column, ranges)
+        assert dict(zip(values[counts > 0].tolist(), counts[counts > 0].tolist())) == expected.to_dict(), ranges
+        # Les zones sautées n'ont aucune ligne retenue
+        for zone in skipped:
+            start, stop = zone_map.bounds(zone)
+            assert _expected(frame.iloc[start:stop], column, ranges).sum() == 0
+
+
+def test_zones_are_pruned(frame):
+    zone_map = ZoneMap.from_frame(frame, zone_rows=250)
+    _, _, partial, skipped = zone_map.value_counts('Purchase Amount (USD)', {'Age': (20, 40)})
+    # Seules les zones à cheval sur les bornes de l'intervalle sont parcourues
+    assert len(skipped) > zone_map.n_zones // 2
+    assert len(partial) <= 2
+
+
+def test_json_round_trip(frame):
+    zone_map = ZoneMap.from_frame(frame, zone_rows=1_000)
+    restored = ZoneMap.from_json(zone_map.to_json())
+    assert (restored.n_rows, restored.zone_rows) == (zone_map.n_rows, zone_map.zone_rows)
+    for name in ('minimum', 'maximum', 'values', 'counts'):
+        left, right = getattr(zone_map, name), getattr(restored, name)
+        assert left.keys() == right.keys()
+        for column in left:
+            np.testing.assert_array_equal(left[column], right[column])
+            assert left[column].dtype == right[column].dtype
+
+
+def test_many_values_keep_only_bounds(frame):
+    wide = frame.assign(**{'Purchase Amount (USD)': np.arange(len(frame)) / 100})
+    zone_map = ZoneMap.from_frame(wide, zone_rows=1_000)
+    assert wide['Purchase Amount (USD)'].nunique() > MAX_ZONE_VALUES
+    assert 'Purchase Amount (USD)' not in zone_map.counts
+    assert zone_map.maximum['Purchase Amount (USD)'][-1] == wide['Purchase Amount (USD)'].max()
+
+
+def test_snapshot_stores_zone_map(dataset):
+    zone_map = read_zone_map(ensure_snapshot(dataset))
+    frame = read_csv(dataset, ZONE_COLUMNS)
+    assert zone_map.n_rows == len(frame)
+    for column in ZONE_COLUMNS:
+        assert zone_map.minimum[column].min() == frame[column].min()
+        assert zone_map.maximum[column].max() == frame[column].max()
@@ -0,0 +1,211 @@
+import json
+import threading
+
+import numpy as np
+
+# Lignes par groupe : c'est aussi la taille des groupes de lignes (row groups)
+# de l'instantané Parquet, dont DuckDB et Polars lisent les min/max
+ZONE_ROWS = 65_536
+
+# Colonnes numériques décrites par groupe de lignes
+ZONE_COLUMNS = ['Age', 'Purchase Amount (USD)', 'Review Rating', 'Previous Purchases']
+
+# Au-delà de ce nombre de valeurs distinctes, une colonne n'a que ses min/max
+MAX_ZONE_VALUES = 256
+
+
+class ZoneMap:
+    """
+    Statistiques par groupe de lignes (zone) des colonnes numériques : minimum,
+    maximum et effectif de chaque valeur.
+
+    Ces colonnes n'ont que quelques dizaines de valeurs distinctes (âge,
+    montant, note, achats précédents) : l'histogramme d'une zone est donc
+    exact. Pour des filtres d'intervalle, une zone est sautée si ses min/max
+    sont hors de l'intervalle, lue dans les statistiques si elle y est tout
+    entière, et parcourue sinon.
+
+    Attributes:
+        n_rows (int): Nombre de lignes du jeu de données
+        zone_rows (int): Lignes par zone (la dernière peut être incomplète)
+        minimum, maximum (dict): Colonne -> min et max de chaque zone
+        values (dict): Colonne -> valeurs distinctes triées
+        counts (dict): Colonne -> effectifs (zones x valeurs) ; absente si la
+            colonne a plus de MAX_ZONE_VALUES valeurs distinctes
+    """
+
+    def __init__(self, n_rows, zone_rows, minimum, maximum, values, counts):
+        self.n_rows = n_rows
+        self.zone_rows = zone_rows
+        self.minimum = minimum
+        self.maximum = maximum
+        self.values = values
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, df, columns=ZONE_COLUMNS, zone_rows=ZONE_ROWS):
+        n_rows = len(df)
+        n_zones = -(-n_rows // zone_rows)
+        zones = np.arange(n_rows) // zone_rows
+        minimum, maximum, values, counts = {}, {}, {}, {}
+        for column in columns:
+            data = df[column].to_numpy()
+            if not n_rows:
+                minimum[column] = maximum[column] = data[:0]
+                continue
+            starts = np.arange(0, n_rows, zone_rows)
+            minimum[column] = np.minimum.reduceat(data, starts)
+            maximum[column] = np.maximum.reduceat(data, starts)
+            distinct, codes = np.unique(data, return_inverse=True)
+            if len(distinct) > MAX_ZONE_VALUES:
+                continue
+            values[column] = distinct
+            counts[column] = np.bincount(
+                zones * len(distinct) + codes, minlength=n_zones * len(distinct)
+            ).reshape(n_zones, len(distinct)).astype(np.int32)
+        return cls(n_rows, zone_rows, minimum, maximum, values, counts)
+
+    def to_json(self):
+        """Sérialisation compacte, rangée dans les métadonnées de l'instantané."""
+        return json.dumps({
+            'n_rows': self.n_rows,
+            'zone_rows': self.zone_rows,
+            'dtypes': {column: array.dtype.str for column, array in self.minimum.items()},
+            'minimum': {column: array.tolist() for column, array in self.minimum.items()},
+            'maximum': {column: array.tolist() for column, array in self.maximum.items()},
+            'values': {column: array.tolist() for column, array in self.values.items()},
+            'counts': {column: array.tolist() for column, array in self.counts.items()},
+        })
+
+    @classmethod
+    def from_json(cls, payload):
+        state = json.loads(payload)
+        dtypes = state['dtypes']
+
+        def arrays(name, dtype=None):
+            return {c: np.asarray(v, dtype=dtype or dtypes[c]) for c, v in state[name].items()}
+
+        return cls(
+            state['n_rows'], state['zone_rows'], arrays('minimum'), arrays('maximum'),
+            arrays('values'), {c: a.reshape(-1, len(state['values'][c])) for c, a in arrays('counts', np.int32).items()}
+        )
+
+    @property
+    def n_zones(self):
+        return len(next(iter(self.minimum.values()), ()))
+
+    # Lignes [start, stop) d'une zone
+    def bounds(self, zone):
+        return zone * self.zone_rows, min((zone + 1) * self.zone_rows, self.n_rows)
+
+    # Nombre de lignes d'un ensemble de zones
+    def size(self, zones):
+        return sum(stop - start for start, stop in map(self.bounds, zones))
+
+    def covers(self, ranges):
+        """Les filtres ne portent que sur des colonnes décrites par les zones."""
+        return all(column in self.minimum for column in ranges)
+
+    def _classify(self, ranges):
+        skipped = np.zeros(self.n_zones, dtype=bool)
+        inside = {}
+        for column, (low, high) in ranges.items():
+            # Bornes converties au type de la colonne, comme FilterIndex
+            low, high = np.asarray([low, high], dtype=self.minimum[column].dtype)
+            skipped |= (self.maximum[column] < low) | (self.minimum[column] > high)
+            inside[column] = (self.minimum[column] >= low) & (self.maximum[column] <= high)
+        return skipped, inside
+
+    def value_counts(self, column, ranges):
+        """
+        Effectif de chaque valeur de `column` parmi les lignes qui satisfont
+        des filtres d'intervalle, tiré des statistiques des zones.
+
+        Une zone est lue dans les statistiques quand les filtres sur les autres
+        colonnes la contiennent tout entière : un filtre sur `column` elle-même
+        se résout sur son histogramme. Les zones restantes sont à parcourir.
+
+        Args:
+            column (str): Colonne dont l'histogramme est décrit (dans counts)
+            ranges (dict): Colonne -> (min, max) inclusif
+
+        Returns:
+            tuple: (valeurs, effectifs des zones lues dans les statistiques,
+            numéros des zones à parcourir, numéros des zones sautées)
+        """
+        values = self.values[column]
+        skipped, inside = self._classify(ranges)
+        answered = ~skipped
+        for other, contained in inside.items():
+            if other != column:
+                answered &= contained
+        counts = self.counts[column][answered].sum(axis=0, dtype=np.int64)
+        if column in ranges:
+            low, high = np.asarray(ranges[column], dtype=values.dtype)
+            counts[(values < low) | (values > high)] = 0
+        partial = np.flatnonzero(~skipped & ~answered)
+        return values, counts, partial, np.flatnonzero(skipped)
+
+    def scan(self, column, ranges, zones, df):
+        """
+        Effectif de chaque valeur de `column` parmi les lignes des zones
+        `zones` qui satisfont les filtres, en parcourant ces seules lignes.
+
+        Args:
+            df (pandas.DataFrame): Colonnes `column` et celles des filtres,
+                dans l'ordre des lignes de l'instantané
+
+        Returns:
+            numpy.ndarray: Effectifs, alignés sur self.values[column]
+        """
+        values = self.values[column]
+        counts = np.zeros(len(values), dtype=np.int64)
+        for start, stop in map(self.bounds, zones):
+            mask = np.ones(stop - start, dtype=bool)
+            for other, (low, high) in ranges.items():
+                low, high = np.asarray([low, high], dtype=self.minimum[other].dtype)
+                data = df[other].to_numpy()[start:stop]
+                mask &= (data >= low) & (data <= high)
+            counts += np.bincount(
+                np.searchsorted(values, df[column].to_numpy()[start:stop][mask]), minlength=len(values)
+            )
+        return counts
+
+
+class ScanStats:
+    """
+    Compteurs des requêtes servies par les zones : lignes du jeu de données,
+    lignes réellement parcourues, zones sautées et zones lues dans les
+    statistiques.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def record(self, rows, scanned, skipped=0, from_stats=0):
+        with self._lock:
+            self.queries += 1
+            self.rows += rows
+            self.rows_scanned += scanned
+            self.zones_skipped += skipped
+            self.zones_from_stats += from_stats
+
+    def clear(self):
+        self.queries = self.rows = self.rows_scanned = 0
+        self.zones_skipped = self.zones_from_stats = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queries': self.queries,
+                'rows': self.rows,
+                'rows_scanned': self.rows_scanned,
+                'scanned_share': self.rows_scanned / self.rows if self.rows else 0.0,
+                'zones_skipped': self.zones_skipped,
+                'zones_from_stats': self.zones_from_stats
+            }
+
+
+# Compteurs du processus, affichés dans la sidebar de Home.py
+scan_stats = ScanStats()